@@ -3,6 +3,22 @@ K-pop Knowledge Graph Chatbot
 
 Modules:
 - knowledge_graph: Build and manage knowledge graph
+- csr_graph: Array-backed CSR storage engine for the knowledge graph
+- graph_snapshot: Binary warm-start snapshots of the built knowledge graph
+- mapped_graph: Read-only memory-mapped graph store shared across processes
+- search_index: Exact / n-gram / prefix index behind entity search
+- name_index: Shared normalized name / alias index for entity lookups
+- gazetteer: Aho-Corasick automaton finding entity name mentions in queries
+- path_search: Bounded path search shared by the graph engines
+- derived_relations: Materialized company / labelmate / genre relations
+- graph_changes: Change events emitted by the graph mutation API
+- attribute_columns: Parsed year / member-count columns with range queries
+- attribute_store: Interned, columnar node attributes (infobox, url, ...) with optional spill to disk
+- node_features: Precomputed degree / typed degree / PageRank arrays for context ranking
+- embedding_backends: Pluggable embedding encoders (PyTorch, ONNX Runtime int8)
+- vector_index: Persistent Flat / HNSW / IVF-PQ vector indexes for semantic search
+- result_cache: LRU / TTL cache (optionally on disk) of GraphRAG retrieval results
+- context_packer: Token-budgeted packing of retrieved context into LLM prompts
 - graph_rag: GraphRAG implementation for retrieval
 - multi_hop_reasoning: Multi-hop reasoning engine
 - small_llm: Integration with small language model
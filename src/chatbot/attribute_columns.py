@@ -0,0 +1,242 @@
+"""
+Attribute Columns
+
+Infobox fields of the K-pop knowledge graph parsed once into typed columns:
+
+- year strings per entity for extract_year_from_infobox (activity, release,
+  founding, birth), both as written ("2016–nay") and first year only
+- numeric columns: debut_year, release_year, founding_year, birth_year and
+  member_count (groups), each kept as a sorted (value, entity) array so that
+  equality, range and group-by queries are a bisect instead of a full scan
+
+Columns are built on first use; after a mutation only the rows of the changed
+entities (and of groups whose members changed) are re-parsed. The graph's
+state_lock covers builds, lookups and updates (retrieval runs on worker threads).
+"""
+
+import bisect
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# year_type -> infobox key
+YEAR_FIELDS = {
+    'activity': 'Năm hoạt động',
+    'release': 'Phát hành',
+    'founding': 'Năm thành lập',
+    'birth': 'Sinh'
+}
+
+# Numeric column -> year_type it is parsed from (member_count comes from the graph)
+YEAR_COLUMNS = {
+    'debut_year': 'activity',
+    'release_year': 'release',
+    'founding_year': 'founding',
+    'birth_year': 'birth'
+}
+COLUMNS = tuple(YEAR_COLUMNS) + ('member_count',)
+
+_YEAR_RE = re.compile(r'(\d{4})')
+_YEARS_RE = re.compile(r'\d{4}')
+
+
+def parse_year(year_str: Optional[str], extract_first_year: bool = False) -> Optional[str]:
+    """
+    Year text of an infobox value.
+
+    Args:
+        year_str: Raw infobox value (e.g., "2016–nay", "10 tháng 9 năm 2021")
+        extract_first_year: Return only the first year of a range ("2016–nay" -> "2016")
+
+    Returns:
+        Year string, or None for an empty value
+    """
+    if not year_str:
+        return None
+
+    # Try to extract year from date format like "10 tháng 9 năm 2021"
+    year_match = _YEAR_RE.search(year_str)
+    if year_match:
+        # If it's a date format, return just the year
+        if 'tháng' in year_str or 'năm' in year_str:
+            return year_match.group(1)
+
+        # If extract_first_year is True, return only the first year from range
+        if extract_first_year:
+            # Xử lý trường hợp có nhiều năm dính liền (ví dụ: "20122016–nay")
+            # Tìm tất cả các năm 4 chữ số
+            years_found = _YEARS_RE.findall(year_str)
+            if len(years_found) > 1:
+                # Kiểm tra xem có năm dính liền không
+                first_year_pos = year_str.find(years_found[0])
+                second_year_pos = year_str.find(years_found[1])
+                distance = second_year_pos - first_year_pos
+                # Nếu hai năm dính liền (khoảng cách 4 ký tự) và có dấu nối sau
+                if 4 <= distance <= 5 and ('–' in year_str or '-' in year_str):
+                    # Với "ra mắt/debut", lấy năm cuối cùng trước dấu nối (thường là năm debut chính thức)
+                    # Ví dụ: "20122016–nay" → lấy "2016" (năm debut), không phải "2012"
+                    return years_found[-1] if years_found[-1] in year_str[:year_str.find('–' if '–' in year_str else '-')] else years_found[0]
+            # Trường hợp thông thường: lấy năm đầu tiên
+            return year_match.group(1)
+
+        # Otherwise return the full range
+        return year_str
+
+    return year_str
+
+
+class NumericColumn:
+    """Integer column sorted by value for bisect lookups."""
+
+    def __init__(self, values: Dict[str, int]):
+        """
+        Args:
+            values: entity -> value (entities without a value are left out)
+        """
+        self.values = values
+        self._rows: List[Tuple[int, str]] = sorted((value, entity) for entity, value in values.items())
+        self._keys = [value for value, _ in self._rows]
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def get(self, entity_id: str) -> Optional[int]:
+        return self.values.get(entity_id)
+
+    def set(self, entity_id: str, value: Optional[int]):
+        """Replace the value of one entity (None: no value); keeps rows sorted."""
+        old = self.values.pop(entity_id, None)
+        if old is not None:
+            at = bisect.bisect_left(self._rows, (old, entity_id))
+            del self._rows[at]
+            del self._keys[at]
+        if value is not None:
+            self.values[entity_id] = value
+            at = bisect.bisect_left(self._rows, (value, entity_id))
+            self._rows.insert(at, (value, entity_id))
+            self._keys.insert(at, value)
+
+    def range(self, low: Optional[int] = None, high: Optional[int] = None) -> List[Tuple[int, str]]:
+        """(value, entity) rows with low <= value <= high (None = unbounded), by value."""
+        start = 0 if low is None else bisect.bisect_left(self._keys, low)
+        end = len(self._keys) if high is None else bisect.bisect_right(self._keys, high)
+        return self._rows[start:end]
+
+    def group_by(self) -> Dict[int, List[str]]:
+        """value -> entities, in ascending value order."""
+        groups: Dict[int, List[str]] = {}
+        for value, entity in self._rows:
+            groups.setdefault(value, []).append(entity)
+        return groups
+
+
+class AttributeColumns:
+    """Parsed infobox / graph attributes of a KpopKnowledgeGraph."""
+
+    def __init__(self, kg):
+        """
+        Args:
+            kg: KpopKnowledgeGraph providing node data and get_group_members
+        """
+        self.kg = kg
+        self.labels: Dict[str, Optional[str]] = {}
+        # year_type -> entity -> (year as written, first year)
+        self.year_texts: Dict[str, Dict[str, Tuple[Optional[str], Optional[str]]]] = {}
+        self.columns: Dict[str, NumericColumn] = {}
+        self._lock = kg.state_lock  # Same lock as mutations: builds never see a half-applied change
+
+    def invalidate(self):
+        """Drop all columns; they are rebuilt on the next lookup."""
+        with self._lock:
+            self.labels = {}
+            self.year_texts = {}
+            self.columns = {}
+
+    def update(self, entity_ids: Iterable[str], member_groups: Iterable[str] = ()):
+        """
+        Re-parse rows after a mutation (no-op for parts not built yet).
+
+        Args:
+            entity_ids: Entities added, updated or removed
+            member_groups: Groups whose member list may have changed
+        """
+        with self._lock:
+            if not self.labels:
+                return
+            kg = self.kg
+            entity_ids = list(entity_ids)
+            for entity_id in entity_ids:
+                for year_type in YEAR_FIELDS:
+                    self.year_texts[year_type].pop(entity_id, None)
+                if kg._has_node(entity_id):
+                    self.labels[entity_id] = kg.graph.nodes[entity_id].get('label')
+                    self._parse_years(entity_id, self.year_texts)
+                else:
+                    self.labels.pop(entity_id, None)
+            for name, column in self.columns.items():
+                if name == 'member_count':
+                    for group in set(member_groups).union(entity_ids):
+                        column.set(group, len(kg.get_group_members(group)) if self.labels.get(group) == 'Group' else None)
+                else:
+                    for entity_id in entity_ids:
+                        column.set(entity_id, self._year_value(entity_id, YEAR_COLUMNS[name]))
+
+    def _parse_years(self, entity_id: str, year_texts: Dict[str, Dict[str, Tuple[Optional[str], Optional[str]]]]):
+        infobox = self.kg._node_data(entity_id).get('infobox') or {}
+        for year_type, key in YEAR_FIELDS.items():
+            year_str = infobox.get(key)
+            if year_str:
+                year_texts[year_type][entity_id] = (parse_year(year_str), parse_year(year_str, extract_first_year=True))
+
+    def _year_value(self, entity_id: str, year_type: str) -> Optional[int]:
+        _, first_year = self.year_texts[year_type].get(entity_id, (None, None))
+        if first_year and first_year.isdigit() and len(first_year) == 4:
+            return int(first_year)
+        return None
+
+    def _build_years(self):
+        """Parse every year field of every infobox in one pass."""
+        year_texts = {year_type: {} for year_type in YEAR_FIELDS}
+        labels = {}
+        for entity_id, label, _ in self.kg._iter_nodes():
+            labels[entity_id] = label
+            self._parse_years(entity_id, year_texts)
+        self.labels = labels
+        self.year_texts = year_texts
+
+    def year_text(self, entity_id: str, year_type: str, extract_first_year: bool = False) -> Optional[str]:
+        """Parsed year string (see parse_year) of an entity as stored in graph."""
+        with self._lock:
+            if not self.year_texts:
+                self._build_years()
+            # Unknown year types read the activity field, like before
+            texts = self.year_texts.get(year_type if year_type in YEAR_FIELDS else 'activity', {}).get(entity_id)
+        if texts is None:
+            return None
+        return texts[1] if extract_first_year else texts[0]
+
+    def label(self, entity_id: str) -> Optional[str]:
+        with self._lock:
+            if not self.labels:
+                self._build_years()
+            return self.labels.get(entity_id)
+
+    def column(self, name: str) -> NumericColumn:
+        """Numeric column by name (see COLUMNS), built on first use."""
+        if name not in COLUMNS:
+            raise ValueError(f"Unknown attribute column: {name} (expected one of {COLUMNS})")
+        with self._lock:
+            if name not in self.columns:
+                if not self.year_texts:
+                    self._build_years()
+                values = {}
+                if name == 'member_count':
+                    for entity_id, label in self.labels.items():
+                        if label == 'Group':
+                            values[entity_id] = len(self.kg.get_group_members(entity_id))
+                else:
+                    for entity_id in self.year_texts[YEAR_COLUMNS[name]]:
+                        value = self._year_value(entity_id, YEAR_COLUMNS[name])
+                        if value is not None:
+                            values[entity_id] = value
+                self.columns[name] = NumericColumn(values)
+            return self.columns[name]
@@ -0,0 +1,249 @@
+"""
+Compact Node Attribute Store
+
+Node attributes of the K-pop knowledge graph other than label and title
+(which stay on the NetworkX nodes for traversal filters), kept in columns
+instead of one dict per node:
+
+- string table: every distinct string (infobox values, URLs, original IDs)
+  is stored once and shared by all rows that use it
+- infobox schemas: the tuple of infobox keys is interned, so entities with
+  the same fields share one key tuple and each row only holds a values tuple
+- optional spill to disk: infobox rows are written as UTF-8 JSON blobs to a
+  memory-mapped string table (see mapped_graph.StringTable) and decoded on
+  access, so infoboxes do not stay in process memory at all
+
+Directory layout of a spilled store (default: data/<name>.kgattrs/):
+- meta.json: format version, source JSON hash
+- entity_ids.offsets.npy + entity_ids.blob.npy: row -> entity ID
+- infobox.offsets.npy + infobox.blob.npy: row -> JSON-encoded infobox
+"""
+
+import json
+import os
+import shutil
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    from .mapped_graph import GRAPH_ATTRS, StringTable
+except ImportError:  # Fallback for no-package context
+    from mapped_graph import GRAPH_ATTRS, StringTable
+
+# Bump when the spilled file layout changes
+ATTRIBUTES_VERSION = 1
+
+# Node attributes kept in the store (GRAPH_ATTRS stay on graph nodes)
+STORE_ATTRS = ('infobox', 'url', 'depth', 'original_id')
+
+_ON_DISK = -1  # Schema ID of rows whose infobox is read from the spilled table
+
+
+def default_attributes_path(data_path: str) -> str:
+    """Spilled store directory for a source JSON (data/x.json -> data/x.kgattrs)."""
+    return os.path.splitext(data_path)[0] + '.kgattrs'
+
+
+class AttributeStore:
+    """Interned, columnar infobox / url / depth / original_id per entity."""
+
+    def __init__(self):
+        self._strings: Dict[str, str] = {}  # String table: value -> the shared copy
+        self._schemas: List[Tuple[str, ...]] = []  # Distinct infobox key tuples
+        self._schema_ids: Dict[Tuple[str, ...], int] = {}
+        self.rows: Dict[str, int] = {}  # entity -> row
+        self._free_rows: List[int] = []
+        # Columns (row -> value)
+        self.schema_ids: List[int] = []
+        self.values: List[Optional[Tuple[Any, ...]]] = []
+        self.urls: List[str] = []
+        self.depths: List[Optional[int]] = []
+        self.original_ids: List[str] = []
+        self._disk: Optional[StringTable] = None  # Spilled infobox rows
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def __contains__(self, entity_id: str) -> bool:
+        return entity_id in self.rows
+
+    def __getstate__(self) -> Dict:
+        """Pickle (snapshot) state: spilled rows are read back, memory maps are not pickled."""
+        state = self.__dict__.copy()
+        if self._disk is not None:
+            state['schema_ids'] = list(self.schema_ids)
+            state['values'] = list(self.values)
+            for row, schema_id in enumerate(self.schema_ids):
+                if schema_id == _ON_DISK:
+                    state['schema_ids'][row], state['values'][row] = self._encode_infobox(json.loads(self._disk[row]))
+            state['_disk'] = None
+        return state
+
+    def _intern(self, value: Any) -> Any:
+        if isinstance(value, str):
+            return self._strings.setdefault(value, value)
+        return value
+
+    def _encode_infobox(self, infobox: Dict) -> Tuple[int, Tuple[Any, ...]]:
+        """(schema ID, values tuple) of an infobox dict."""
+        keys = tuple(self._intern(key) for key in infobox)
+        schema_id = self._schema_ids.get(keys)
+        if schema_id is None:
+            schema_id = self._schema_ids[keys] = len(self._schemas)
+            self._schemas.append(keys)
+        return schema_id, tuple(self._intern(value) for value in infobox.values())
+
+    def put(self, entity_id: str, attributes: Dict):
+        """Store (or replace) the STORE_ATTRS of an entity."""
+        row = self.rows.get(entity_id)
+        if row is None:
+            row = self._free_rows.pop() if self._free_rows else len(self.schema_ids)
+            if row == len(self.schema_ids):
+                for column in (self.schema_ids, self.values, self.urls, self.depths, self.original_ids):
+                    column.append(None)
+            self.rows[entity_id] = row
+        self.schema_ids[row], self.values[row] = self._encode_infobox(attributes.get('infobox') or {})
+        self.urls[row] = self._intern(attributes.get('url', ''))
+        self.depths[row] = attributes.get('depth', 0)
+        self.original_ids[row] = self._intern(attributes.get('original_id', entity_id))
+
+    def update(self, entity_id: str, updates: Dict):
+        """Replace some STORE_ATTRS of a stored entity (other keys are ignored)."""
+        attributes = self.attributes(entity_id)
+        attributes.update((key, value) for key, value in updates.items() if key in STORE_ATTRS)
+        self.put(entity_id, attributes)
+
+    def remove(self, entity_id: str):
+        row = self.rows.pop(entity_id, None)
+        if row is None:
+            return
+        self.schema_ids[row], self.values[row] = None, None
+        self.urls[row] = self.depths[row] = self.original_ids[row] = None
+        self._free_rows.append(row)
+
+    def infobox(self, entity_id: str) -> Dict:
+        """Fresh infobox dict of an entity ({} if it has none)."""
+        row = self.rows.get(entity_id)
+        if row is None:
+            return {}
+        schema_id = self.schema_ids[row]
+        if schema_id == _ON_DISK:
+            return json.loads(self._disk[row])
+        return dict(zip(self._schemas[schema_id], self.values[row]))
+
+    def original_id(self, entity_id: str) -> str:
+        row = self.rows.get(entity_id)
+        return entity_id if row is None else self.original_ids[row]
+
+    def attributes(self, entity_id: str) -> Dict:
+        """STORE_ATTRS of an entity as a fresh dict (same keys / order as the build)."""
+        row = self.rows[entity_id]
+        return {
+            'infobox': self.infobox(entity_id),
+            'url': self.urls[row],
+            'depth': self.depths[row],
+            'original_id': self.original_ids[row]
+        }
+
+    def stats(self) -> Dict[str, int]:
+        """Row / string table / schema counts."""
+        return {
+            'rows': len(self.rows),
+            'strings': len(self._strings),
+            'schemas': len(self._schemas),
+            'spilled_rows': sum(1 for schema_id in self.schema_ids if schema_id == _ON_DISK)
+        }
+
+    def spill(self, directory: str, source_hash: str):
+        """
+        Move infobox rows to a memory-mapped table on disk.
+
+        A current table (same source hash and rows) is reused; otherwise it is
+        (re)written first. Rows changed later are kept in memory again.
+
+        Args:
+            directory: Spilled store directory
+            source_hash: Content hash of the source JSON
+        """
+        disk = self._open_spilled(directory, source_hash)
+        if disk is None:
+            self._write_spilled(directory, source_hash)
+            disk = self._open_spilled(directory, source_hash)
+            if disk is None:
+                raise OSError(f"Could not open spilled attributes in {directory}")
+        self._disk = disk
+        for row, schema_id in enumerate(self.schema_ids):
+            if schema_id is not None:
+                self.schema_ids[row], self.values[row] = _ON_DISK, None
+        # Only keep strings still referenced from memory
+        self._strings = {}
+        self._schemas, self._schema_ids = [], {}
+        for column in (self.urls, self.original_ids):
+            for value in column:
+                self._intern(value)
+
+    def _row_entities(self) -> List[str]:
+        entities = [''] * len(self.schema_ids)
+        for entity_id, row in self.rows.items():
+            entities[row] = entity_id
+        return entities
+
+    def _write_spilled(self, directory: str, source_hash: str):
+        # Same write-to-temp-and-replace scheme as mapped_graph.write_mapped_graph
+        tmp_dir = f"{directory}.tmp{os.getpid()}"
+        if os.path.exists(tmp_dir):
+            shutil.rmtree(tmp_dir)
+        os.makedirs(tmp_dir)
+        try:
+            entities = self._row_entities()
+            blobs = [json.dumps(self.infobox(entity_id), ensure_ascii=False) for entity_id in entities]
+            for name, strings in (('entity_ids', entities), ('infobox', blobs)):
+                offsets, blob = StringTable.encode(strings)
+                np.save(os.path.join(tmp_dir, f"{name}.offsets.npy"), offsets)
+                np.save(os.path.join(tmp_dir, f"{name}.blob.npy"), blob)
+            with open(os.path.join(tmp_dir, 'meta.json'), 'w', encoding='utf-8') as f:
+                json.dump({'version': ATTRIBUTES_VERSION, 'source_hash': source_hash}, f)
+
+            if os.path.exists(directory):
+                old_dir = f"{directory}.old{os.getpid()}"
+                os.replace(directory, old_dir)
+                os.replace(tmp_dir, directory)
+                shutil.rmtree(old_dir, ignore_errors=True)
+            else:
+                os.replace(tmp_dir, directory)
+        finally:
+            if os.path.exists(tmp_dir):
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    def _open_spilled(self, directory: str, source_hash: str) -> Optional[StringTable]:
+        """Infobox table of a current spilled store, or None if missing / stale."""
+        meta_path = os.path.join(directory, 'meta.json')
+        if not os.path.exists(meta_path):
+            return None
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            if meta.get('version') != ATTRIBUTES_VERSION or meta.get('source_hash') != source_hash:
+                return None
+            tables = {
+                name: StringTable(
+                    np.load(os.path.join(directory, f"{name}.offsets.npy"), mmap_mode='r'),
+                    np.load(os.path.join(directory, f"{name}.blob.npy"), mmap_mode='r')
+                )
+                for name in ('entity_ids', 'infobox')
+            }
+        except (OSError, ValueError):
+            return None
+        # Rows must line up with this process' build
+        if list(tables['entity_ids']) != self._row_entities():
+            return None
+        return tables['infobox']
+
+    @classmethod
+    def from_mapped(cls, node_ids, node_store) -> 'AttributeStore':
+        """Build a store from the node attribute blobs of a mapped store (see mapped_graph)."""
+        store = cls()
+        for i, node_id in enumerate(node_ids):
+            store.put(node_id, node_store.attributes(i))
+        return store
@@ -10,6 +10,7 @@ This module integrates all components:
 Provides a unified interface for the K-pop chatbot.
 """
 
+import itertools
 import json
 from typing import Dict, List, Optional, Tuple, Any
 from dataclasses import dataclass, field
@@ -22,12 +23,14 @@ try:
     from .graph_rag import GraphRAG
     from .multi_hop_reasoning import MultiHopReasoner, ReasoningResult, ReasoningStep, ReasoningType
     from .small_llm import SmallLLM, get_llm, TRANSFORMERS_AVAILABLE
+    from .name_index import NAME_ALIASES, normalize_company, strip_name_suffix
 except ImportError:  # Fallback for no-package context
     from knowledge_graph import KpopKnowledgeGraph
     from knowledge_graph_neo4j import KpopKnowledgeGraphNeo4j
     from graph_rag import GraphRAG
     from multi_hop_reasoning import MultiHopReasoner, ReasoningResult, ReasoningStep, ReasoningType
     from small_llm import SmallLLM, get_llm, TRANSFORMERS_AVAILABLE
+    from name_index import NAME_ALIASES, normalize_company, strip_name_suffix
 
 
 @dataclass
@@ -73,12 +76,23 @@ class KpopChatbot:
     and small LLM generation for answering K-pop questions.
     """
     
+    # Entity types matched by name in membership queries, with the score of a
+    # match on part of a multi-word name (see _lookup_name_candidates)
+    NAME_WORD_SCORES = {
+        'Artist': 1.5, 'Group': 1.5, 'Company': 1.4,
+        'Song': 1.3, 'Album': 1.3, 'Genre': 1.2, 'Occupation': 1.2
+    }
+    
     def __init__(
         self,
         data_path: str = "data/korean_artists_graph_bfs.json",
         llm_model: str = "qwen2-0.5b",
         use_embeddings: bool = True,
-        verbose: bool = True
+        verbose: bool = True,
+        graph_engine: str = "networkx",
+        encoder_backend: str = "torch",
+        index_type: str = "flat",
+        concurrent_retrieval: bool = False
     ):
         """
         Initialize the chatbot.
@@ -88,6 +102,10 @@ class KpopChatbot:
             llm_model: Model key for small LLM
             use_embeddings: Whether to use semantic embeddings
             verbose: Print initialization progress
+            graph_engine: Knowledge graph storage engine ('networkx', 'csr' or 'mmap')
+            encoder_backend: GraphRAG embedding encoder ('torch' or 'onnx')
+            index_type: GraphRAG vector index ('flat', 'hnsw' or 'ivfpq')
+            concurrent_retrieval: Run independent GraphRAG retrieval stages in parallel (with deadlines)
         """
         self.verbose = verbose
         self.sessions: Dict[str, ChatSession] = {}
@@ -99,7 +117,7 @@ class KpopChatbot:
         # 1. Knowledge Graph
         if verbose:
             print("  📊 Loading Knowledge Graph...")
-        self.kg = KpopKnowledgeGraph(data_path)
+        self.kg = KpopKnowledgeGraph(data_path, engine=graph_engine)
         
         # 2. GraphRAG
         if verbose:
@@ -109,7 +127,10 @@ class KpopChatbot:
         self.rag = GraphRAG(
             knowledge_graph=self.kg,
             use_cache=True,
-            llm_for_understanding=None  # Sẽ set sau khi LLM load xong
+            llm_for_understanding=None,  # Sẽ set sau khi LLM load xong
+            encoder_backend=encoder_backend,
+            index_type=index_type,
+            concurrent_retrieval=concurrent_retrieval
         )
         
         # 3. Multi-hop Reasoner
@@ -127,6 +148,8 @@ class KpopChatbot:
                 self.llm = get_llm(llm_model)
                 # Set LLM cho GraphRAG để dùng cho understanding
                 self.rag.llm_for_understanding = self.llm
+                # Context budget theo tokenizer thật của LLM (fallback LLM: ước lượng)
+                self.rag.set_token_counter(getattr(self.llm, 'count_tokens', None))
             except Exception as e:
                 if verbose:
                     print(f"  ⚠️ LLM loading failed: {e}")
@@ -892,10 +915,10 @@ class KpopChatbot:
         # QUAN TRỌNG: Giảm context size để tránh LLM bị nhiễu (1969 entities → quá nhiều!)
         if reasoning_result and reasoning_result.confidence >= 0.6:
             # Có reasoning result tốt → giảm context size (chỉ lấy essentials)
-            formatted_context = self.rag.format_context_for_llm(context, max_tokens=5000)
+            formatted_context = self.rag.format_context_for_llm(context, max_tokens=self.rag.REASONED_CONTEXT_TOKEN_BUDGET)
         else:
             # Không có reasoning result hoặc confidence thấp → cần nhiều context hơn
-            formatted_context = self.rag.format_context_for_llm(context, max_tokens=10000)
+            formatted_context = self.rag.format_context_for_llm(context)
         
         # Add reasoning info to context (Multi-hop reasoning results từ đồ thị)
         # Reasoning results cũng được tạo từ ĐỒ THỊ TRI THỨC (graph traversal)
@@ -1198,50 +1221,8 @@ QUY TẮC NGHIÊM NGẶT:
         Normalize company id/name for robust matching.
         Handles common aliases / case / spacing.
         """
-        if not company_id:
-            return ""
-        
-        cid = company_id.strip()
-        # Remove prefix if present
-        cid = cid.replace("Company_", "")
-        cid_lower = cid.lower()
-        
-        alias_map = {
-            # Big 4
-            "yg entertainment": ["yg", "yg ent", "yg entertainment", "company_yg entertainment", "yg-ent"],
-            "jyp entertainment": ["jyp", "jyp ent", "jyp entertainment", "company_jyp entertainment", "j.y.p"],
-            "sm entertainment": ["sm", "sm ent", "sm entertainment", "company_sm entertainment"],
-            "hybe": ["hybe", "hybe corporation", "big hit", "big hit entertainment", "bighit", "company_hybe", "company_big hit entertainment"],
-            "big hit entertainment": ["big hit", "bighit", "hybe", "hybe corporation", "company_big hit entertainment"],
-
-            # Mid/other
-            "cube entertainment": ["cube", "cube ent", "company_cube", "company_cube entertainment"],
-            "woollim entertainment": ["woollim", "woollim ent", "company_woollim entertainment"],
-            "stone music entertainment": ["stone music", "stone", "company_stone music", "company_stone music entertainment"],
-            "ist entertainment": ["ist", "play m", "fave", "company_ist entertainment", "company_play m", "company_fave"],
-            "core contents media": ["mbk", "mbk entertainment", "core contents media", "company_core contents media", "company_mbk entertainment"],
-            "mbk entertainment": ["mbk", "mbk ent", "mbk entertainment", "company_mbk entertainment", "core contents media"],
-            "source music": ["source music", "company_source music", "source-music"],
-            "pledis entertainment": ["pledis", "pledis ent", "company_pledis entertainment"],
-            "starship entertainment": ["starship", "company_starship entertainment"],
-            "fnc entertainment": ["fnc", "company_fnc entertainment"],
-            "ymc entertainment": ["ymc", "company_ymc", "company_ymc entertainment", "ymc ent"],
-            "emi music japan": ["emi", "emi music japan", "company_emi music japan"],
-            "loen entertainment": ["loen", "kakao m", "kakao entertainment", "company_loen entertainment", "company_kakao m"],
-            "dsp media": ["dsp", "company_dsp media", "dspmedia"],
-            "ist": ["ist", "company_ist"],
-            "woollim": ["woollim", "company_woollim"],
-            "stone music": ["stone music", "company_stone music"],
-            "yuehua entertainment": ["yuehua", "company_yuehua", "company_yuehua entertainment"],
-            "wm entertainment": ["wm", "company_wm entertainment"],
-        }
-        
-        for norm, aliases in alias_map.items():
-            if cid_lower == norm:
-                return norm
-            if cid_lower in aliases:
-                return norm
-        return cid_lower
+        # Alias table dùng chung với name_index
+        return normalize_company(company_id)
 
     def _company_matches(self, company_a: str, company_b: str) -> bool:
         """
@@ -1420,19 +1401,9 @@ QUY TẮC NGHIÊM NGẶT:
                 
                 # Lấy công ty của entity
                 companies = set()
-                if entity_type == 'Group':
-                    company = self.kg.get_group_company(entity_id)
-                    if company:
-                        companies.add(company)
-                    # Also get all companies
-                    companies.update(self.kg.get_group_companies(entity_id))
-                elif entity_type == 'Artist':
-                    # Artist có thể thuộc công ty qua Group hoặc trực tiếp
-                    companies.update(self.kg.get_artist_companies(entity_id))
-                    # Thử qua Group
-                    groups = self.kg.get_artist_groups(entity_id)
-                    for group in groups:
-                        companies.update(self.kg.get_group_companies(group))
+                if entity_type in ('Group', 'Artist'):
+                    # Artist có thể thuộc công ty qua Group hoặc trực tiếp (bảng đã materialize)
+                    companies.update(self.kg.get_entity_companies(entity_id))
                 
                 # Kiểm tra công ty có trong query không
                 if companies and query_company:
@@ -1491,26 +1462,16 @@ QUY TẮC NGHIÊM NGẶT:
                         
                         # Lấy công ty của cả hai entity (xử lý cả Artist và Group)
                         companies_a = set()
-                        if a_type == 'Artist':
-                            companies_a.update(self.kg.get_artist_companies(a))
-                            # Thêm công ty qua Group
-                            for group in self.kg.get_artist_groups(a):
-                                group_companies = self.kg.get_group_companies(group)
-                                companies_a.update(group_companies)
-                        elif a_type == 'Group':
-                            companies_a.update(self.kg.get_group_companies(a))
+                        if a_type in ('Artist', 'Group'):
+                            # Artist: trực tiếp + qua Group; Group: của chính nó
+                            companies_a.update(self.kg.get_entity_companies(a))
                         elif a_type == 'Company':
                             companies_a.add(a)
                         
                         companies_b = set()
-                        if b_type == 'Artist':
-                            companies_b.update(self.kg.get_artist_companies(b))
-                            # Thêm công ty qua Group
-                            for group in self.kg.get_artist_groups(b):
-                                group_companies = self.kg.get_group_companies(group)
-                                companies_b.update(group_companies)
-                        elif b_type == 'Group':
-                            companies_b.update(self.kg.get_group_companies(b))
+                        if b_type in ('Artist', 'Group'):
+                            # Artist: trực tiếp + qua Group; Group: của chính nó
+                            companies_b.update(self.kg.get_entity_companies(b))
                         elif b_type == 'Company':
                             companies_b.add(b)
                         
@@ -1571,12 +1532,8 @@ QUY TẮC NGHIÊM NGẶT:
                     entity_type = self.kg.get_entity_type(entity_id) or entity.get('type', 'Unknown')
                     
                     companies = set()
-                    if entity_type == 'Artist':
-                        companies.update(self.kg.get_artist_companies(entity_id))
-                        for group in self.kg.get_artist_groups(entity_id):
-                            companies.update(self.kg.get_group_companies(group))
-                    elif entity_type == 'Group':
-                        companies.update(self.kg.get_group_companies(entity_id))
+                    if entity_type in ('Artist', 'Group'):
+                        companies.update(self.kg.get_entity_companies(entity_id))
                     
                     found = False
                     for comp in companies:
@@ -1726,26 +1683,16 @@ QUY TẮC NGHIÊM NGẶT:
                         
                         # Fallback: Thử giao tập công ty (xử lý cả Artist và Group)
                         companies_a = set()
-                        if a_type == 'Artist':
-                            companies_a.update(self.kg.get_artist_companies(a))
-                            # Thêm công ty qua Group
-                            for group in self.kg.get_artist_groups(a):
-                                group_companies = self.kg.get_group_companies(group)
-                                companies_a.update(group_companies)
-                        elif a_type == 'Group':
-                            companies_a.update(self.kg.get_group_companies(a))
+                        if a_type in ('Artist', 'Group'):
+                            # Artist: trực tiếp + qua Group; Group: của chính nó
+                            companies_a.update(self.kg.get_entity_companies(a))
                         elif a_type == 'Company':
                             companies_a.add(a)
                         
                         companies_b = set()
-                        if b_type == 'Artist':
-                            companies_b.update(self.kg.get_artist_companies(b))
-                            # Thêm công ty qua Group
-                            for group in self.kg.get_artist_groups(b):
-                                group_companies = self.kg.get_group_companies(group)
-                                companies_b.update(group_companies)
-                        elif b_type == 'Group':
-                            companies_b.update(self.kg.get_group_companies(b))
+                        if b_type in ('Artist', 'Group'):
+                            # Artist: trực tiếp + qua Group; Group: của chính nó
+                            companies_b.update(self.kg.get_entity_companies(b))
                         elif b_type == 'Company':
                             companies_b.add(b)
                         
@@ -1795,12 +1742,8 @@ QUY TẮC NGHIÊM NGẶT:
                     entity_type = self.kg.get_entity_type(entity_id) or entity.get('type', 'Unknown')
                     
                     companies = set()
-                    if entity_type == 'Artist':
-                        companies.update(self.kg.get_artist_companies(entity_id))
-                        for group in self.kg.get_artist_groups(entity_id):
-                            companies.update(self.kg.get_group_companies(group))
-                    elif entity_type == 'Group':
-                        companies.update(self.kg.get_group_companies(entity_id))
+                    if entity_type in ('Artist', 'Group'):
+                        companies.update(self.kg.get_entity_companies(entity_id))
                     
                     # Normalize company names for comparison
                     query_company_norm = query_company.lower().replace('company_', '').strip()
@@ -2206,32 +2149,23 @@ QUY TẮC NGHIÊM NGẶT:
         expected_labels: tập label ưu tiên (Artist, Group, Company, Song, Album, Genre, Occupation)
         Nếu provided, chỉ giữ thực thể có label trong tập này (để giảm nhiễu).
         """
-        # Đảm bảo có sẵn map biến thể từ graph
-        self._ensure_entity_variant_map()
-        variant_map = self._entity_variant_map
         expected_labels = expected_labels or set()
         
         entities = []
         query_lower = query.lower()
         
-        # Try to find group/artist/others (case-insensitive, filtered by expected_labels nếu có)
-        all_groups = [node for node, data in self.kg.graph.nodes(data=True) 
-                     if data.get('label') == 'Group' and (not expected_labels or 'Group' in expected_labels)]
-        
-        all_artists = [node for node, data in self.kg.graph.nodes(data=True) 
-                      if data.get('label') == 'Artist' and (not expected_labels or 'Artist' in expected_labels)]
-        
-        # Thêm các loại khác nếu cần cho intent (song/album/company/genre/occupation)
-        all_companies = [node for node, data in self.kg.graph.nodes(data=True)
-                        if data.get('label') == 'Company' and (not expected_labels or 'Company' in expected_labels)]
-        all_songs = [node for node, data in self.kg.graph.nodes(data=True)
-                    if data.get('label') == 'Song' and (not expected_labels or 'Song' in expected_labels)]
-        all_albums = [node for node, data in self.kg.graph.nodes(data=True)
-                     if data.get('label') == 'Album' and (not expected_labels or 'Album' in expected_labels)]
-        all_genres = [node for node, data in self.kg.graph.nodes(data=True)
-                     if data.get('label') == 'Genre' and (not expected_labels or 'Genre' in expected_labels)]
-        all_occupations = [node for node, data in self.kg.graph.nodes(data=True)
-                          if data.get('label') == 'Occupation' and (not expected_labels or 'Occupation' in expected_labels)]
+        # Các loại khác nếu cần cho intent (song/album/company/genre/occupation), lấy từ entity_index
+        # Artists và Groups đi qua name index; sort để thứ tự match ổn định giữa các lần chạy
+        def _entities_of(label: str) -> List[str]:
+            if expected_labels and label not in expected_labels:
+                return []
+            return sorted(self.kg.get_entities_by_type(label))
+        
+        all_companies = _entities_of('Company')
+        all_songs = _entities_of('Song')
+        all_albums = _entities_of('Album')
+        all_genres = _entities_of('Genre')
+        all_occupations = _entities_of('Occupation')
 
         # Helper: normalize và sinh variants cho một tên node
         def _variants(name: str) -> List[str]:
@@ -2362,6 +2296,7 @@ QUY TẮC NGHIÊM NGẶT:
                     potential_names.add(ngram.replace(" ", "-"))
                     potential_names.add(ngram.replace("-", " "))
         
+        album_nodes = sorted(self.kg.get_entities_by_type('Album')) if is_album_context else []
         for potential_name in potential_names:
             # Bước 1: Kiểm tra nếu entity tồn tại với suffix
             found_with_suffix = False
@@ -2370,13 +2305,13 @@ QUY TẮC NGHIÊM NGẶT:
             if is_album_context:
                 # Tìm tất cả albums trong KG có tên bắt đầu bằng potential_name
                 album_candidates = []
-                for node, data in self.kg.graph.nodes(data=True):
-                    if data.get('label') == 'Album':
-                        node_lower = node.lower()
-                        name_lower = potential_name.lower()
-                        # Match: "Alive (album của Big Bang)" với "alive"
-                        if node_lower.startswith(name_lower + " (") or node_lower == name_lower:
-                            album_candidates.append((node, data))
+                name_lower = potential_name.lower()
+                for node in album_nodes:
+                    node_lower = node.lower()
+                    # Match: "Alive (album của Big Bang)" với "alive"
+                    if node_lower.startswith(name_lower + " (") or node_lower == name_lower:
+                        # Infobox không nằm trên node của graph (xem attribute_store)
+                        album_candidates.append((node, self.kg.get_entity(node)))
                 
                 # Ưu tiên album có infobox đầy đủ
                 album_candidates.sort(key=lambda x: len(x[1].get('infobox', {})), reverse=True)
@@ -2437,10 +2372,10 @@ QUY TẮC NGHIÊM NGẶT:
                                 break
         
         # ============================================
-        # BƯỚC 1: LOOKUP TỪ VARIANT_MAP (ƯU TIÊN - NHANH VÀ CHÍNH XÁC)
+        # BƯỚC 1: LOOKUP TỪ NAME INDEX CỦA GRAPH (ƯU TIÊN - NHANH VÀ CHÍNH XÁC)
         # ============================================
-        # QUAN TRỌNG: Variant map đã được build với tất cả biến thể từ graph
-        # Ưu tiên lookup từ variant_map trước vì đã được index sẵn và có scoring chính xác
+        # QUAN TRỌNG: Name index (kg.lookup_name) đã chuẩn hóa mọi biến thể tên và alias
+        # Ưu tiên lookup từ name index trước vì đã được index sẵn và có scoring chính xác
         
         # Tạo thêm các biến thể n-gram từ query_cleaned (đã strip hậu tố)
         cleaned_ngrams = []
@@ -2457,8 +2392,11 @@ QUY TẮC NGHIÊM NGẶT:
         
         # Kết hợp cả ngrams từ query gốc và query đã cleaned
         all_ngrams = list(dict.fromkeys(ngrams + cleaned_ngrams))
+        # N-gram dài trước: tên đầy đủ ("park ye eun") phải match trước một từ của nó ("park")
+        all_ngrams.sort(key=len, reverse=True)
         
         seen_entities = set()  # Tránh trùng lặp
+        name_lookup_cache: Dict[str, List[Dict[str, Any]]] = {}  # Nhiều lookup key trùng nhau
         
         for ng in all_ngrams:
             if len(ng) < 2:
@@ -2484,14 +2422,15 @@ QUY TẮC NGHIÊM NGẶT:
             lookup_keys = list(dict.fromkeys(lookup_keys))
             
             for lookup_key in lookup_keys:
-                if lookup_key in variant_map:
-                    # Variant map đã được sort theo score (highest first)
+                name_matches = self._lookup_name_candidates(lookup_key, name_lookup_cache)
+                if name_matches:
+                    # Candidates đã được sort theo score (highest first)
                     # Ưu tiên lấy entity có score cao nhất (exact match)
                     # QUAN TRỌNG: Ưu tiên entities có suffix khớp với query
                     entities_with_suffix = []  # Entities có suffix khớp
                     entities_without_suffix = []  # Entities không có suffix hoặc không khớp
                     
-                    for ent in variant_map[lookup_key]:
+                    for ent in name_matches:
                         entity_name = ent["name"]
                         normalized = self._normalize_entity_name(entity_name).lower()
                         label = ent.get("label", "Unknown")
@@ -2577,11 +2516,11 @@ QUY TẮC NGHIÊM NGẶT:
         # ============================================
         # BƯỚC 2: FALLBACK - MATCH TRỰC TIẾP CHO CÁC ENTITY CHƯA TÌM THẤY
         # ============================================
-        # Chỉ match các entity chưa được tìm thấy qua variant_map
+        # Chỉ match các entity chưa được tìm thấy qua name index
         # Ưu tiên match đầy đủ tên (n-gram) trước single word
         
         def _match_list_fallback(nodes: List[str], score_val: float, label: str):
-            """Match trực tiếp cho các entity chưa có trong variant_map."""
+            """Match trực tiếp cho các entity chưa tìm thấy qua name index."""
             # Tạo n-grams từ query_cleaned (đã strip hậu tố) và query gốc để match tốt hơn
             query_ngrams_for_match = []
             # Sử dụng query_cleaned (đã strip hậu tố) để match tốt hơn
@@ -2608,7 +2547,7 @@ QUY TẮC NGHIÊM NGẶT:
             
             for node in nodes:
                 normalized = self._normalize_entity_name(node).lower()
-                # Check duplicate bằng normalized name (đã match qua variant_map)
+                # Check duplicate bằng normalized name (đã match qua name index)
                 if normalized in normalized_seen:
                     continue
                 
@@ -2693,8 +2632,8 @@ QUY TẮC NGHIÊM NGẶT:
                     normalized_seen.add(normalized)
                     # không break để có thể thêm nhiều thực thể, nhưng tránh trùng lặp
         
-        # Match các entity types chưa được cover trong variant_map (Company, Song, Album, Genre, Occupation)
-        # Artists và Groups đã được xử lý qua variant_map và logic riêng ở trên
+        # Match thêm các entity types Company, Song, Album, Genre, Occupation theo substring
+        # Artists và Groups đã được xử lý qua name index và logic riêng ở dưới
         _match_list_fallback(all_companies, 1.3, 'Company')
         _match_list_fallback(all_songs, 1.2, 'Song')
         _match_list_fallback(all_albums, 1.2, 'Album')
@@ -2702,148 +2641,60 @@ QUY TẮC NGHIÊM NGẶT:
         _match_list_fallback(all_occupations, 1.0, 'Occupation')
         
         # ============================================
-        # KEY STRATEGY: Match by length (longest first)
+        # KEY STRATEGY: Match by span length (longest first)
         # ============================================
-        # Sort ALL artists by name length (longest first)
-        # This ensures "Yoo Jeong-yeon" is checked before "Yoo", "Jeongyeon", "Ye-on"
-        all_artists_sorted = sorted(
-            all_artists,
-            key=lambda x: len(self._normalize_entity_name(x).lower().replace('-', ' ')),
-            reverse=True
-        )
+        # Query spans (4 → 1 words) are looked up in the graph's name index
+        # This ensures "Yoo Jeong-yeon" is matched before "Yoo", "Jeongyeon", "Ye-on"
         
         # Track which parts of query have been "consumed" by matched entities
         # This prevents matching "Yoo" after matching "Yoo Jeong-yeon"
         matched_query_spans = []  # List of (start_idx, end_idx) in query_words_list
         
-        # Create n-grams from query (for matching multi-word names)
-        query_ngrams_with_positions = []
-        for n in [4, 3, 2]:  # Longest first
-            for i in range(len(query_words_list) - n + 1):
-                ngram = " ".join(query_words_list[i:i+n])
-                query_ngrams_with_positions.append({
-                    'text': ngram,
-                    'start': i,
-                    'end': i + n,
-                    'variants': [
-                        v for v in [
-                            ngram,
-                            ngram.replace(" ", ""),
-                            ngram.replace(" ", "-"),
-                            ngram.replace("-", " ") if '-' in ngram else None,
-                            ngram.replace("-", "") if '-' in ngram else None,
-                        ] if v is not None
-                    ]
-                })
-        
         # ============================================
         # MATCH ARTISTS (longest to shortest)
         # ============================================
         found_artists = []
         
-        for artist in all_artists_sorted:
-            base_name = self._normalize_entity_name(artist).lower()
-            
-            if base_name in normalized_seen:
-                continue
-            
-            base_words = base_name.replace('-', ' ').split()
-            base_word_count = len(base_words)
-            
-            # Generate variants for this artist
-            artist_variants = self._generate_variants(base_name)
-            
-            matched = False
-            match_start = -1
-            match_end = -1
-            
-            # ============================================
-            # CASE 1: Multi-word names (≥2 words)
-            # ============================================
-            if base_word_count >= 2:
-                # Try to match with n-grams
-                for ngram_info in query_ngrams_with_positions:
-                    # Skip if this span was already matched
-                    span_start = ngram_info['start']
-                    span_end = ngram_info['end']
-                    
-                    # Check if this span overlaps with any matched span
-                    is_overlapping = any(
-                        not (span_end <= ms or span_start >= me)
-                        for ms, me in matched_query_spans
-                    )
-                    if is_overlapping:
+        if not expected_labels or 'Artist' in expected_labels:
+            for n in [4, 3, 2, 1]:
+                for span_start in range(len(query_words_list) - n + 1):
+                    span_end = span_start + n
+                    # Skip if this span overlaps with any matched span
+                    if any(not (span_end <= ms or span_start >= me) for ms, me in matched_query_spans):
                         continue
                     
-                    # Try to match variants
-                    for variant in artist_variants:
-                        if any(v == variant for v in ngram_info['variants'] if v):
-                            # MATCH FOUND!
-                            found_artists.append(artist)
-                            normalized_seen.add(base_name)
-                            candidate_scores.append((artist, 1.6, 'Artist'))
-                            matched = True
-                            match_start = span_start
-                            match_end = span_end
-                            break
-                        
-                        # Partial match: if ≥2 words overlap
-                        if not matched:
-                            ngram_text = ngram_info['text']
-                            variant_words = set(variant.replace('-', ' ').split())
-                            ngram_words = set(ngram_text.replace('-', ' ').split())
-                            if len(variant_words.intersection(ngram_words)) >= 2:
-                                found_artists.append(artist)
-                                normalized_seen.add(base_name)
-                                candidate_scores.append((artist, 1.5, 'Artist'))
-                                matched = True
-                                match_start = span_start
-                                match_end = span_end
-                                break
+                    span = " ".join(query_words_list[span_start:span_end])
+                    # Whole name / spelling variant / alias: "jang won young" → "Jang Won-young"
+                    matches = [(artist, 1.6 if n >= 2 else 1.4)
+                               for artist in self.kg.lookup_name(span, entity_type='Artist')]
+                    if not matches and n >= 2:
+                        # Partial match: ≥2 words of the span in one name
+                        span_words = list(dict.fromkeys(span.replace('-', ' ').split()))
+                        for pair in itertools.combinations(span_words, 2):
+                            matches.extend((artist, 1.5)
+                                           for artist in self.kg.lookup_name_words(" ".join(pair), entity_type='Artist'))
                     
-                    if matched:
-                        break
-            
-            # ============================================
-            # CASE 2: Single-word names (1 word)
-            # ============================================
-            else:  # base_word_count == 1
-                # Check each word in query
-                for idx, word in enumerate(query_words_list):
-                    # Skip if this position was already matched
-                    is_overlapping = any(
-                        ms <= idx < me
-                        for ms, me in matched_query_spans
-                    )
-                    if is_overlapping:
-                        continue
-                    
-                    # Check if word matches any variant
-                    for variant in artist_variants:
-                        if word == variant:
-                            # MATCH FOUND!
-                            found_artists.append(artist)
-                            normalized_seen.add(base_name)
-                            candidate_scores.append((artist, 1.4, 'Artist'))
-                            matched = True
-                            match_start = idx
-                            match_end = idx + 1
-                            break
+                    matched = False
+                    for artist, score in matches:
+                        base_name = self._normalize_entity_name(artist).lower()
+                        if base_name in normalized_seen:
+                            continue
+                        found_artists.append(artist)
+                        normalized_seen.add(base_name)
+                        candidate_scores.append((artist, score, 'Artist'))
+                        matched = True
                     
+                    # Record matched span to prevent overlapping matches
                     if matched:
-                        break
-            
-            # Record matched span to prevent overlapping matches
-            if matched and match_start >= 0:
-                matched_query_spans.append((match_start, match_end))
+                        matched_query_spans.append((span_start, span_end))
         
         # Thêm tất cả artists tìm được (không chỉ 1)
         entities.extend(found_artists)
         
         # ============================================
-        # THÊM ENTITIES TỪ VARIANT_MAP VÀO KẾT QUẢ
+        # THÊM ENTITIES TỪ NAME INDEX VÀO KẾT QUẢ
         # ============================================
-        # Đảm bảo tất cả entities từ variant_map được thêm vào
+        # Đảm bảo tất cả entities từ name index được thêm vào
         if matched_from_graph:
             for m in matched_from_graph:
                 if m['name'] not in entities:
@@ -2925,223 +2776,60 @@ QUY TẮC NGHIÊM NGẶT:
         Returns:
             Base name (không có đuôi)
         """
-        import re
         # Remove suffixes trong parentheses: (ca sĩ), (nhóm nhạc), (rapper), etc.
-        normalized = re.sub(r'\s*\([^)]+\)\s*$', '', entity_name)
-        return normalized.strip()
-    
-    def _generate_variants(self, name: str) -> List[str]:
-        """Sinh các biến thể đơn giản của một tên entity."""
-        base = self._normalize_entity_name(name).lower()
-        variants = {
-            base,  # Original: "jang won-young"
-            base.replace('-', ' '),  # "jang won-young" → "jang won young", "go-won" → "go won"
-            base.replace('-', ''),   # "jang won-young" → "jangwonyoung", "go-won" → "gowon"
-            base.replace(' ', ''),   # "jang won-young" → "jangwon-young", "go won" → "gowon"
-            base.replace(' ', '-'),  # "jang won-young" → "jang-won-young", "go won" → "go-won"
-        }
-        
-        # QUAN TRỌNG: Xử lý tên có CẢ dash VÀ space như "jang won-young"
-        # Tách thành các parts (cả dash và space đều là separator)
-        # "jang won-young" → ["jang", "won", "young"]
-        all_parts = []
-        # Tách theo dash trước
-        for part in base.split('-'):
-            # Mỗi part có thể có space, tách tiếp
-            all_parts.extend(part.split())
-        # Loại bỏ empty parts
-        all_parts = [p for p in all_parts if p]
-        
-        if len(all_parts) >= 2:
-            # Tạo variants với tất cả các combinations
-            # "jang won-young" → ["jang", "won", "young"]
-            variants.add(" ".join(all_parts))  # "jang won young"
-            variants.add("-".join(all_parts))  # "jang-won-young"
-            variants.add("".join(all_parts))   # "jangwonyoung"
-            
-            # Tạo các combinations: một số parts có dash, một số có space
-            # "jang won-young" → "jang won-young", "jang-won young", etc.
-            if len(all_parts) == 3:
-                # 3 parts: có thể có 2 dash positions
-                variants.add(f"{all_parts[0]} {all_parts[1]}-{all_parts[2]}")  # "jang won-young"
-                variants.add(f"{all_parts[0]}-{all_parts[1]} {all_parts[2]}")  # "jang-won young"
-                variants.add(f"{all_parts[0]}-{all_parts[1]}-{all_parts[2]}")  # "jang-won-young"
-                variants.add(f"{all_parts[0]} {all_parts[1]} {all_parts[2]}")  # "jang won young"
-        
-        # Nếu có gạch, thêm bản tách gạch với nhiều space và combinations
-        if '-' in base:
-            parts = base.split('-')
-            # "yoo-jeong-yeon" → ["yoo", "jeong", "yeon"]
-            variants.add(" ".join(parts))  # "yoo jeong yeon"
-            variants.add("".join(parts))   # "yoojeongyeon"
-            # Thêm các combinations: "yoo jeong-yeon", "yoo-jeong yeon", etc.
-            for i in range(len(parts)):
-                # Tạo variant với một số phần có gạch, một số có space
-                if i < len(parts) - 1:
-                    variant_parts = parts.copy()
-                    variant_parts[i] = variant_parts[i] + "-" + variant_parts[i+1]
-                    variant_parts.pop(i+1)
-                    variants.add(" ".join(variant_parts))
-        # Nếu có space, thêm variant với gạch và các combinations
-        if ' ' in base:
-            parts = base.split(' ')
-            # "go won" → ["go", "won"]
-            variants.add("-".join(parts))  # "go-won"
-            variants.add("".join(parts))   # "gowon"
-            # Với tên dài hơn: "jang won young" → "jang-won-young", "jangwonyoung"
-            if len(parts) > 2:
-                variants.add("-".join(parts))  # "jang-won-young"
-                variants.add("".join(parts))   # "jangwonyoung"
-        return list(variants)
+        # Dùng chung với name_index để mọi component chuẩn hóa giống nhau
+        return strip_name_suffix(entity_name)
     
-    def _ensure_entity_variant_map(self):
-        """
-        Build một map variant -> [entity] để tra cứu nhanh (graph -> query).
-        Chỉ giữ label Artist/Group; thêm alias thủ công cho một số case dễ nhầm.
-        ƯU TIÊN: Tạo nhiều biến thể để đảm bảo matching chính xác từ graph → query.
+    def _lookup_name_candidates(self, name: str, cache: Optional[Dict[str, List[Dict[str, Any]]]] = None) -> List[Dict[str, Any]]:
         """
-        if hasattr(self, "_entity_variant_map") and self._entity_variant_map is not None:
-            return
+        Entities a query n-gram can refer to, best first, as {name, label, score}.
         
-        import re
-        
-        alias_map = {
-            # LOONA / LOOΠΔ
-            "loona": ["loona", "looπδ", "loonα", "loona-loona"],
-            "vi vi": ["vivi", "vi-vi", "vi vi"],
-            "vivi": ["vivi", "vi-vi", "vi vi"],
-            "go won": ["go won", "gowon", "go-won"],
-            "gowon": ["go won", "gowon", "go-won"],
-            # BLACKPINK
-            "blackpink": ["blackpink", "black pink", "black-pink", "bp"],
-        }
+        Served by the graph's name index (kg.lookup_name / kg.lookup_name_words),
+        which already covers case, suffix, hyphen/space/compact variants and the
+        manual aliases, so no per-chatbot variant map has to be built or kept in
+        sync with graph mutations.
         
-        variant_map: Dict[str, List[Dict[str, Any]]] = {}
-        # QUAN TRỌNG: Build variant map cho TẤT CẢ entity types, không chỉ Artist/Group
-        # Ưu tiên Artist và Group vì chúng quan trọng nhất, nhưng cũng index cả Company, Song, Album, etc.
-        entity_type_priority = ['Artist', 'Group', 'Company', 'Song', 'Album', 'Genre', 'Occupation']
-        
-        for node, data in self.kg.graph.nodes(data=True):
-            label = data.get('label')
-            # Chỉ index các entity types có trong priority list (để tránh nhiễu)
-            if label not in entity_type_priority:
-                continue
-            
-            base_name = self._normalize_entity_name(node)
-            base_variants = self._generate_variants(node)
-            
-            # Thêm alias thủ công nếu khớp base name
-            extra_alias = []
-            base_lower = base_name.lower()
-            if base_lower in alias_map:
-                extra_alias = alias_map[base_lower]
-            
-            # QUAN TRỌNG: Tạo thêm variants từ base_name (không chỉ từ node)
-            # Đảm bảo cover được cả base_name variants
-            base_name_variants = self._generate_variants(base_name)
-            
-            all_variants = set(base_variants + base_name_variants + extra_alias)
-            
-            # Thêm cả full node name (có thể có đuôi) và base name
-            all_variants.add(node.lower())
-            all_variants.add(base_name.lower())
-            
-            # QUAN TRỌNG: Tạo thêm các biến thể từ node name (có thể có hậu tố)
-            # Ví dụ: "Luna (ca sĩ)" → tạo variants cho cả "Luna (ca sĩ)" và "Luna"
-            node_lower = node.lower()
-            main_name = None
-            if '(' in node_lower:
-                # Tách phần tên và hậu tố
-                parts = re.split(r'\s*\([^)]+\)\s*', node_lower)
-                main_name = parts[0].strip()
-                if main_name:
-                    all_variants.add(main_name)
-                    # Tạo variants từ main_name
-                    main_variants = self._generate_variants(main_name)
-                    all_variants.update(main_variants)
-            
-            # QUAN TRỌNG: Tạo n-grams từ tên entity để match tốt hơn
-            # Ví dụ: "Jang Won-young" → ["jang", "won", "young", "jang won", "won young", "jang won young"]
-            base_words = base_name.lower().replace('-', ' ').split()
-            if len(base_words) > 1:
-                # Tạo các n-grams (1-word, 2-word, 3-word, etc.)
-                for n in range(1, min(len(base_words) + 1, 5)):  # Tối đa 4 words
-                    for i in range(len(base_words) - n + 1):
-                        ngram = " ".join(base_words[i:i+n])
-                        all_variants.add(ngram)
-                        # Thêm variants của ngram
-                        ngram_variants = self._generate_variants(ngram)
-                        all_variants.update(ngram_variants)
-            
-            # QUAN TRỌNG: Xử lý ký tự đặc biệt và số
-            # Loại bỏ ký tự đặc biệt như *, (), [] nhưng giữ lại dash và space
-            base_clean = re.sub(r'[^\w\s-]', '', base_name.lower())
-            if base_clean != base_name.lower():
-                all_variants.add(base_clean)
-                base_clean_variants = self._generate_variants(base_clean)
-                all_variants.update(base_clean_variants)
-            
-            # QUAN TRỌNG: Tạo variants không có số (nếu có)
-            base_no_numbers = re.sub(r'\d+', '', base_name.lower())
-            if base_no_numbers != base_name.lower():
-                base_no_numbers = " ".join(base_no_numbers.split())
-                if base_no_numbers:
-                    all_variants.add(base_no_numbers)
-                    base_no_numbers_variants = self._generate_variants(base_no_numbers)
-                    all_variants.update(base_no_numbers_variants)
-            
-            for v in all_variants:
-                if len(v) < 2:
-                    continue
-                # Normalize: loại bỏ spaces thừa
-                v_normalized = " ".join(v.split())
-                if len(v_normalized) < 2:
+        Scores: 3.0 exact name (with or without suffix), 2.5 alias, 2.0 spelling
+        variant ("jang won young", "gowon"), NAME_WORD_SCORES[label] when the
+        n-gram is only part of a multi-word name ("won-young").
+        """
+        if cache is not None and name in cache:
+            return cache[name]
+        candidates = []
+        if len(name) >= 2:
+            name_lower = name.lower()
+            seen = set()
+            for entity_id in self.kg.lookup_name(name):
+                label = self.kg.get_entity_type(entity_id)
+                if label not in self.NAME_WORD_SCORES:
                     continue
-                
-                # Thêm cả normalized và original vào map
-                for variant_key in [v, v_normalized]:
-                    if len(variant_key) < 2:
+                base_lower = self._normalize_entity_name(entity_id).lower()
+                if name_lower in (entity_id.lower(), base_lower):
+                    score = 3.0
+                elif name_lower in NAME_ALIASES.get(base_lower, ()):
+                    score = 2.5  # Alias thủ công
+                else:
+                    score = 2.0  # Biến thể viết: gạch nối, dấu cách, dấu tiếng Việt
+                candidates.append({"name": entity_id, "label": label, "score": score})
+                seen.add(entity_id)
+            # Một phần của tên nhiều từ: "won-young" → "Jang Won-young"
+            # So khớp từ nguyên dạng (có dấu) để "là", "và" không khớp tên có "La", "Va"
+            # N-gram lặp từ ("woo-hye-lim woo", ghép từ token và các phần của nó) bị bỏ qua
+            name_words = name_lower.replace('-', ' ').split()
+            words = set(name_words)
+            if len(words) == len(name_words) <= 4:
+                for entity_id in self.kg.lookup_name_words(name):
+                    if entity_id in seen:
                         continue
-                    
-                    if variant_key not in variant_map:
-                        variant_map[variant_key] = []
-                    
-                    # Score: Ưu tiên exact match và alias
-                    # Exact match (base_name hoặc node) có score cao nhất
-                    if variant_key == base_name.lower() or variant_key == node.lower():
-                        score = 3.0  # Highest priority
-                    elif variant_key in extra_alias:
-                        score = 2.5  # High priority for aliases
-                    elif variant_key in base_name_variants:
-                        score = 2.0  # High priority for base name variants
-                    elif main_name and variant_key == main_name:
-                        score = 1.8  # High priority for main name (without suffix)
-                    else:
-                        # Default score - có thể điều chỉnh theo label
-                        if label in ['Artist', 'Group']:
-                            score = 1.5  # High priority cho Artist/Group
-                        elif label == 'Company':
-                            score = 1.4
-                        elif label in ['Song', 'Album']:
-                            score = 1.3
-                        else:
-                            score = 1.2  # Lower priority cho các types khác
-                    
-                    # Tránh duplicate entries
-                    existing = [e for e in variant_map[variant_key] if e["name"] == node]
-                    if not existing:
-                        variant_map[variant_key].append({
-                            "name": node,
-                            "label": label,
-                            "score": score
-                        })
-        
-        # Sort entries by score (highest first) để ưu tiên exact match
-        for key in variant_map:
-            variant_map[key].sort(key=lambda x: x["score"], reverse=True)
-        
-        self._entity_variant_map = variant_map
-        
+                    label = self.kg.get_entity_type(entity_id)
+                    base_words = self._normalize_entity_name(entity_id).lower().replace('-', ' ').split()
+                    if label in self.NAME_WORD_SCORES and len(base_words) > 1 and words <= set(base_words):
+                        candidates.append({"name": entity_id, "label": label, "score": self.NAME_WORD_SCORES[label]})
+            candidates.sort(key=lambda c: c["score"], reverse=True)
+        if cache is not None:
+            cache[name] = candidates
+        return candidates
+    
     # =========== Specialized Query Methods ===========
     
     def get_group_members(self, group_name: str) -> Dict:
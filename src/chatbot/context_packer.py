@@ -0,0 +1,150 @@
+"""
+Token-Budgeted Context Packing
+
+Packs the sections of a GraphRAG context (entities, facts, relationships,
+paths) into an LLM prompt that fits a token budget:
+
+- token counts come from the active LLM tokenizer when one is set
+  (SmallLLM.count_tokens), else from estimate_tokens(), a fast estimator
+  for byte-level BPE tokenizers such as Qwen2's
+- counts are cached per fragment text (an entity block, a triple, ...), so
+  entities that recur across queries are tokenized once
+- every item carries a relevance score on one scale for all sections;
+  items are taken across sections in score order and each item that still
+  fits is added, so max_tokens alone decides how much context is kept
+  (output keeps the section layout and the item order within a section)
+- the packed text is counted once more as a whole when items were left
+  out or the fragment sum is within RECOUNT_MARGIN of the budget, and items
+  are dropped last-added first if tokenization across item boundaries went
+  over budget
+"""
+
+import re
+import threading
+from collections import OrderedDict
+from typing import Callable, List, Optional, Sequence, Tuple
+
+# (text, relevance score) of one item
+ScoredItem = Tuple[str, float]
+
+TRUNCATION_NOTE = "[... Context đã được rút gọn để phù hợp với giới hạn model ...]"
+
+# Fraction of the budget: a fragment sum below max_tokens * (1 - RECOUNT_MARGIN)
+# is trusted without counting the whole text again
+RECOUNT_MARGIN = 0.1
+
+_PIECE_RE = re.compile(r'\w+|[^\w\s]')
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Fast token count estimate without a tokenizer.
+
+    ASCII words cost about one token per 4 characters; words with Vietnamese
+    diacritics (or other non-ASCII text) split into byte-level pieces of about
+    2 characters; each punctuation mark / symbol is one token.
+    """
+    tokens = 0
+    for piece in _PIECE_RE.findall(text):
+        if piece.isascii():
+            tokens += (len(piece) + 3) // 4
+        else:
+            tokens += (len(piece) + 1) // 2
+    return tokens
+
+
+class ContextPacker:
+    """Greedy token-budget packer with a per-fragment token count cache."""
+
+    def __init__(self, token_counter: Optional[Callable[[str], int]] = None, cache_size: int = 8192):
+        """
+        Args:
+            token_counter: text -> token count (default: estimate_tokens)
+            cache_size: Fragment token counts kept (LRU)
+        """
+        self.token_counter = token_counter or estimate_tokens
+        self.cache_size = cache_size
+        self._counts: "OrderedDict[str, int]" = OrderedDict()  # fragment text -> tokens
+        self._lock = threading.Lock()
+
+    def set_token_counter(self, token_counter: Optional[Callable[[str], int]]):
+        """Switch tokenizer (None: estimate_tokens); cached counts are dropped."""
+        with self._lock:
+            self.token_counter = token_counter or estimate_tokens
+            self._counts.clear()
+
+    def count(self, fragment: str) -> int:
+        """Token count of a fragment (cached)."""
+        with self._lock:
+            tokens = self._counts.get(fragment)
+            if tokens is not None:
+                self._counts.move_to_end(fragment)
+                return tokens
+        tokens = self.token_counter(fragment)
+        with self._lock:
+            self._counts[fragment] = tokens
+            if len(self._counts) > self.cache_size:
+                self._counts.popitem(last=False)
+        return tokens
+
+    def pack(self, sections: Sequence[Tuple[str, Sequence[ScoredItem]]], max_tokens: int) -> str:
+        """
+        Join section headers and the most relevant items into at most max_tokens tokens.
+
+        Args:
+            sections: (header, (item text, score) pairs) in output order; lines
+                are joined with newlines, a section without items is left out.
+                Equal scores prefer earlier sections, then earlier items.
+            max_tokens: Token budget of the returned text
+
+        Returns:
+            Packed text, ending with TRUNCATION_NOTE if any item was left out
+        """
+        # One token per joining newline
+        item_costs = [[self.count(text) + 1 for text, _ in items] for _, items in sections]
+        header_costs = [self.count(header) + 1 for header, _ in sections]
+        total = sum(sum(costs) + header_costs[s] for s, costs in enumerate(item_costs) if costs)
+        # Best first over all sections (stable sort: ties keep section / item order)
+        ranked = sorted(
+            ((s, i) for s, (_, items) in enumerate(sections) for i in range(len(items))),
+            key=lambda item: -sections[item[0]][1][item[1]][1]
+        )
+        if total <= max_tokens:
+            chosen = [list(range(len(items))) for _, items in sections]
+            order = ranked
+            truncated = False
+        else:
+            budget = max_tokens - self.count(TRUNCATION_NOTE) - 2
+            chosen = [[] for _ in sections]
+            order: List[Tuple[int, int]] = []
+            used = 0
+            for s, i in ranked:
+                cost = item_costs[s][i] + (0 if chosen[s] else header_costs[s])
+                if used + cost <= budget:
+                    chosen[s].append(i)
+                    order.append((s, i))
+                    used += cost
+            truncated = True
+
+        text = self._join(sections, chosen, truncated)
+        if not truncated and total <= max_tokens * (1 - RECOUNT_MARGIN):
+            return text
+        # Token boundaries can differ from the sum of fragments: check the whole text
+        while order and self.token_counter(text) > max_tokens:
+            s, i = order.pop()  # Least relevant item kept
+            chosen[s].remove(i)
+            truncated = True
+            text = self._join(sections, chosen, truncated)
+        return text
+
+    @staticmethod
+    def _join(sections: Sequence[Tuple[str, Sequence[ScoredItem]]], chosen: List[List[int]], truncated: bool) -> str:
+        parts = []
+        for (header, items), indices in zip(sections, chosen):
+            if indices:
+                parts.append(header)
+                parts.extend(items[i][0] for i in sorted(indices))
+        text = "\n".join(parts)
+        if truncated:
+            text += "\n\n" + TRUNCATION_NOTE
+        return text
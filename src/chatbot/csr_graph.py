@@ -0,0 +1,504 @@
+"""
+CSR Graph Engine for K-pop Knowledge Graph
+
+This module provides an array-backed storage engine for KpopKnowledgeGraph.
+Nodes get integer IDs, adjacency is stored as CSR (compressed sparse row)
+arrays in both directions, and labels / relationship types are stored as
+small integer codes instead of per-edge attribute dicts.
+
+Layout:
+- One adjacency entry per (edge, relationship type), so an edge carrying
+  several types (the 'types' list in the NetworkX graph) expands into
+  consecutive entries that share the same edge ID.
+- Entry order follows NetworkX insertion order, so every traversal returns
+  results in exactly the same order as the NetworkX engine.
+"""
+
+from typing import Callable, Collection, Dict, List, Tuple, Optional, Iterator, Mapping, Sequence
+
+import numpy as np
+import networkx as nx
+
+try:
+    from .path_search import bidirectional_shortest_path, iter_simple_paths
+except ImportError:  # Fallback for no-package context
+    from path_search import bidirectional_shortest_path, iter_simple_paths
+
+
+class CSRGraph:
+    """
+    Read-only CSR adjacency for the K-pop knowledge graph.
+
+    Arrays:
+    - node_labels[n]: label code per node
+    - out_indptr[n+1], out_indices[m], out_types[m], out_eids[m]: forward adjacency
+    - in_indptr[n+1], in_indices[m], in_types[m], in_eids[m]: reverse adjacency
+    - edge_confidence[e], edge_method[e]: per-edge attributes (e = edge ID)
+    """
+
+    def __init__(
+        self,
+        node_ids: Sequence[str],
+        label_names: List[str],
+        rel_type_names: List[str],
+        method_names: List[str],
+        arrays: Dict[str, np.ndarray],
+        node_index: Optional[Mapping[str, int]] = None
+    ):
+        """
+        Initialize from prebuilt arrays.
+
+        Args:
+            node_ids: Node ID for each integer node index
+            label_names: Label name for each label code
+            rel_type_names: Relationship type name for each type code
+            method_names: Extraction method name for each method code
+            arrays: Dict of CSR and attribute arrays (see class docstring);
+                may be read-only memory-mapped arrays
+            node_index: Node ID -> index mapping (built from node_ids if None)
+        """
+        self.node_ids = node_ids
+        if node_index is None:
+            node_index = {node_id: i for i, node_id in enumerate(node_ids)}
+        self.node_index = node_index
+        self.label_names = label_names
+        self.label_codes: Dict[str, int] = {name: i for i, name in enumerate(label_names)}
+        self.rel_type_names = rel_type_names
+        self.rel_type_codes: Dict[str, int] = {name: i for i, name in enumerate(rel_type_names)}
+        self.method_names = method_names
+
+        self.node_labels = arrays['node_labels']
+        self.out_indptr = arrays['out_indptr']
+        self.out_indices = arrays['out_indices']
+        self.out_types = arrays['out_types']
+        self.out_eids = arrays['out_eids']
+        self.in_indptr = arrays['in_indptr']
+        self.in_indices = arrays['in_indices']
+        self.in_types = arrays['in_types']
+        self.in_eids = arrays['in_eids']
+        self.edge_confidence = arrays['edge_confidence']
+        self.edge_method = arrays['edge_method']
+
+    @classmethod
+    def from_networkx(cls, graph: nx.DiGraph) -> 'CSRGraph':
+        """
+        Build CSR arrays from the NetworkX graph built by KpopKnowledgeGraph.
+
+        Args:
+            graph: DiGraph with 'label' node attributes and 'type'/'types',
+                'confidence', 'method' edge attributes
+
+        Returns:
+            CSRGraph with the same nodes, edges and adjacency order
+        """
+        node_ids = list(graph.nodes())
+        node_index = {node_id: i for i, node_id in enumerate(node_ids)}
+
+        label_codes: Dict[str, int] = {}
+        node_labels = []
+        for _, data in graph.nodes(data=True):
+            label = data.get('label')
+            node_labels.append(label_codes.setdefault(label, len(label_codes)))
+
+        rel_type_codes: Dict[str, int] = {}
+        method_codes: Dict[str, int] = {}
+        edge_ids: Dict[Tuple[str, str], int] = {}
+        edge_type_lists: List[List[int]] = []
+        edge_confidence = []
+        edge_method = []
+
+        # Edge IDs follow graph.edges() order (= forward adjacency order)
+        for src, tgt, data in graph.edges(data=True):
+            rel_types = data.get('types', [data.get('type', 'RELATED')])
+            if not isinstance(rel_types, list):
+                rel_types = [rel_types]
+            edge_ids[(src, tgt)] = len(edge_ids)
+            edge_type_lists.append([rel_type_codes.setdefault(t, len(rel_type_codes)) for t in rel_types])
+            edge_confidence.append(data.get('confidence', 1.0))
+            edge_method.append(method_codes.setdefault(data.get('method', 'unknown'), len(method_codes)))
+
+        def build_direction(adjacency, reverse: bool):
+            indptr = [0]
+            indices, types, eids = [], [], []
+            for node_id in node_ids:
+                for neighbor in adjacency[node_id]:
+                    eid = edge_ids[(neighbor, node_id) if reverse else (node_id, neighbor)]
+                    for code in edge_type_lists[eid]:
+                        indices.append(node_index[neighbor])
+                        types.append(code)
+                        eids.append(eid)
+                indptr.append(len(indices))
+            return (
+                np.asarray(indptr, dtype=np.int64),
+                np.asarray(indices, dtype=np.int32),
+                np.asarray(types, dtype=np.int16),
+                np.asarray(eids, dtype=np.int32)
+            )
+
+        out_indptr, out_indices, out_types, out_eids = build_direction(graph.succ, reverse=False)
+        in_indptr, in_indices, in_types, in_eids = build_direction(graph.pred, reverse=True)
+
+        arrays = {
+            'node_labels': np.asarray(node_labels, dtype=np.int16),
+            'out_indptr': out_indptr,
+            'out_indices': out_indices,
+            'out_types': out_types,
+            'out_eids': out_eids,
+            'in_indptr': in_indptr,
+            'in_indices': in_indices,
+            'in_types': in_types,
+            'in_eids': in_eids,
+            'edge_confidence': np.asarray(edge_confidence, dtype=np.float64),
+            'edge_method': np.asarray(edge_method, dtype=np.int16)
+        }
+        return cls(node_ids, list(label_codes), list(rel_type_codes), list(method_codes), arrays)
+
+    def to_state(self) -> Dict:
+        """Plain-data state (name tables + arrays) for snapshots."""
+        return {
+            'node_ids': self.node_ids,
+            'label_names': self.label_names,
+            'rel_type_names': self.rel_type_names,
+            'method_names': self.method_names,
+            'arrays': {
+                'node_labels': self.node_labels,
+                'out_indptr': self.out_indptr,
+                'out_indices': self.out_indices,
+                'out_types': self.out_types,
+                'out_eids': self.out_eids,
+                'in_indptr': self.in_indptr,
+                'in_indices': self.in_indices,
+                'in_types': self.in_types,
+                'in_eids': self.in_eids,
+                'edge_confidence': self.edge_confidence,
+                'edge_method': self.edge_method
+            }
+        }
+
+    @classmethod
+    def from_state(cls, state: Dict) -> 'CSRGraph':
+        """Rebuild a CSRGraph from to_state() output."""
+        return cls(
+            state['node_ids'],
+            state['label_names'],
+            state['rel_type_names'],
+            state['method_names'],
+            state['arrays']
+        )
+
+    # ------------------------------------------------------------------
+    # Low-level accessors
+    # ------------------------------------------------------------------
+
+    def __contains__(self, node_id: str) -> bool:
+        return node_id in self.node_index
+
+    def __len__(self) -> int:
+        return len(self.node_ids)
+
+    def number_of_edges(self) -> int:
+        """Number of distinct (source, target) edges."""
+        return len(self.edge_confidence)
+
+    def _entries(self, i: int, reverse: bool) -> Tuple[List[int], List[int], List[int]]:
+        """Return (neighbor indices, type codes, edge IDs) of node index i."""
+        if reverse:
+            start, end = self.in_indptr[i], self.in_indptr[i + 1]
+            return (
+                self.in_indices[start:end].tolist(),
+                self.in_types[start:end].tolist(),
+                self.in_eids[start:end].tolist()
+            )
+        start, end = self.out_indptr[i], self.out_indptr[i + 1]
+        return (
+            self.out_indices[start:end].tolist(),
+            self.out_types[start:end].tolist(),
+            self.out_eids[start:end].tolist()
+        )
+
+    def _adjacent(self, i: int, reverse: bool = False) -> List[int]:
+        """Distinct neighbor indices of node index i, in adjacency order."""
+        if reverse:
+            indices = self.in_indices[self.in_indptr[i]:self.in_indptr[i + 1]].tolist()
+        else:
+            indices = self.out_indices[self.out_indptr[i]:self.out_indptr[i + 1]].tolist()
+        # Multi-type edges expand into consecutive duplicate entries
+        return list(dict.fromkeys(indices))
+
+    def _adjacent_typed(self, i: int, reverse: bool, type_codes: np.ndarray) -> List[int]:
+        """Distinct neighbor indices over edges carrying any of type_codes."""
+        if reverse:
+            start, end = self.in_indptr[i], self.in_indptr[i + 1]
+            indices, types = self.in_indices[start:end], self.in_types[start:end]
+        else:
+            start, end = self.out_indptr[i], self.out_indptr[i + 1]
+            indices, types = self.out_indices[start:end], self.out_types[start:end]
+        return list(dict.fromkeys(indices[np.isin(types, type_codes)].tolist()))
+
+    def neighbor_functions(
+        self,
+        rel_types: Optional[Collection[str]] = None,
+        undirected: bool = False
+    ) -> Tuple[Callable[[int], List[int]], Callable[[int], List[int]]]:
+        """
+        (successors, predecessors) functions over node indices for path search.
+
+        Args:
+            rel_types: Only follow edges carrying one of these types (None = all)
+            undirected: Follow edges in both directions (successors first)
+        """
+        if rel_types is None:
+            forward = lambda i: self._adjacent(i)
+            backward = lambda i: self._adjacent(i, reverse=True)
+        else:
+            type_codes = np.asarray(
+                [self.rel_type_codes[t] for t in rel_types if t in self.rel_type_codes],
+                dtype=self.out_types.dtype
+            )
+            forward = lambda i: self._adjacent_typed(i, False, type_codes)
+            backward = lambda i: self._adjacent_typed(i, True, type_codes)
+        if undirected:
+            both = lambda i: list(dict.fromkeys(forward(i) + backward(i)))
+            return both, both
+        return forward, backward
+
+    def _edge_types(self, eid: int, entries_types: List[int], entries_eids: List[int], pos: int) -> List[str]:
+        """Collect all relationship types of the edge whose entries include position pos."""
+        start = pos
+        while start > 0 and entries_eids[start - 1] == eid:
+            start -= 1
+        end = pos
+        while end < len(entries_eids) and entries_eids[end] == eid:
+            end += 1
+        return [self.rel_type_names[code] for code in entries_types[start:end]]
+
+    def get_label(self, node_id: str) -> Optional[str]:
+        """Get label name of a node (None if node does not exist)."""
+        i = self.node_index.get(node_id)
+        if i is None:
+            return None
+        return self.label_names[self.node_labels[i]]
+
+    def successors(self, node_id: str) -> List[str]:
+        """Distinct successor node IDs (same order as graph.successors)."""
+        i = self.node_index.get(node_id)
+        if i is None:
+            return []
+        return [self.node_ids[j] for j in self._adjacent(i)]
+
+    def edge_type(self, source: str, target: str) -> Optional[str]:
+        """Primary relationship type of edge source → target (None if no edge)."""
+        i = self.node_index.get(source)
+        j = self.node_index.get(target)
+        if i is None or j is None:
+            return None
+        indices, types, _ = self._entries(i, reverse=False)
+        for neighbor, code in zip(indices, types):
+            if neighbor == j:
+                return self.rel_type_names[code]
+        return None
+
+    # ------------------------------------------------------------------
+    # Traversal API (mirrors KpopKnowledgeGraph / NetworkX results)
+    # ------------------------------------------------------------------
+
+    def neighbors(self, node_id: str, direction: str = 'both') -> List[Tuple[str, str, str]]:
+        """List of (neighbor_id, relationship_type, direction), one tuple per type."""
+        i = self.node_index.get(node_id)
+        if i is None:
+            return []
+
+        node_ids = self.node_ids
+        rel_type_names = self.rel_type_names
+        neighbors = []
+        if direction in ['out', 'both']:
+            indices, types, _ = self._entries(i, reverse=False)
+            neighbors.extend((node_ids[j], rel_type_names[t], 'out') for j, t in zip(indices, types))
+        if direction in ['in', 'both']:
+            indices, types, _ = self._entries(i, reverse=True)
+            neighbors.extend((node_ids[j], rel_type_names[t], 'in') for j, t in zip(indices, types))
+        return neighbors
+
+    def _gather(self, rows: np.ndarray, reverse: bool) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Concatenated adjacency entries of several node indices in one gather.
+
+        Returns:
+            (entry counts per row, neighbor indices, type codes)
+        """
+        indptr = self.in_indptr if reverse else self.out_indptr
+        indices = self.in_indices if reverse else self.out_indices
+        types = self.in_types if reverse else self.out_types
+        starts = np.asarray(indptr[rows], dtype=np.int64)
+        counts = np.asarray(indptr[rows + 1], dtype=np.int64) - starts
+        # Position k of row r maps to entry starts[r] + (k - first output position of r)
+        first = np.cumsum(counts) - counts
+        positions = np.arange(int(counts.sum()), dtype=np.int64) + np.repeat(starts - first, counts)
+        return counts, indices[positions], types[positions]
+
+    def neighbors_many(self, node_ids: Sequence[str], direction: str = 'both') -> List[List[Tuple[str, str, str]]]:
+        """neighbors() for several nodes (missing nodes get []), gathered in one pass per direction."""
+        rows = [self.node_index.get(node_id) for node_id in node_ids]
+        present = [pos for pos, i in enumerate(rows) if i is not None]
+        results: List[List[Tuple[str, str, str]]] = [[] for _ in node_ids]
+        if not present:
+            return results
+        row_array = np.array([rows[pos] for pos in present], dtype=np.int64)
+
+        node_id_list = self.node_ids
+        rel_type_names = self.rel_type_names
+        for reverse, name in ((False, 'out'), (True, 'in')):
+            if direction not in (name, 'both'):
+                continue
+            counts, indices, types = self._gather(row_array, reverse)
+            offset = 0
+            for pos, count in zip(present, counts.tolist()):
+                end = offset + count
+                results[pos].extend(
+                    (node_id_list[j], rel_type_names[t], name)
+                    for j, t in zip(indices[offset:end].tolist(), types[offset:end].tolist())
+                )
+                offset = end
+        return results
+
+    def get_labels(self, node_ids: Sequence[str]) -> List[Optional[str]]:
+        """get_label() for several nodes with one vectorized label lookup."""
+        rows = [self.node_index.get(node_id) for node_id in node_ids]
+        present = [i for i in rows if i is not None]
+        codes = iter(self.node_labels[np.array(present, dtype=np.int64)].tolist()) if present else iter(())
+        return [self.label_names[next(codes)] if i is not None else None for i in rows]
+
+    def relationships(self, node_id: str) -> List[Dict]:
+        """Relationship dicts for a node, same format as KpopKnowledgeGraph.get_relationships."""
+        i = self.node_index.get(node_id)
+        if i is None:
+            return []
+
+        relationships = []
+        for reverse, direction in ((False, 'outgoing'), (True, 'incoming')):
+            indices, types, eids = self._entries(i, reverse=reverse)
+            for pos, (j, code, eid) in enumerate(zip(indices, types, eids)):
+                rel_type = self.rel_type_names[code]
+                all_types = self._edge_types(eid, types, eids, pos)
+                neighbor = self.node_ids[j]
+                relationships.append({
+                    'source': neighbor if reverse else node_id,
+                    'target': node_id if reverse else neighbor,
+                    'type': rel_type,
+                    'types': all_types if len(all_types) > 1 else [rel_type],
+                    'direction': direction,
+                    'confidence': float(self.edge_confidence[eid]),
+                    'method': self.method_names[self.edge_method[eid]]
+                })
+        return relationships
+
+    def typed_neighbors(
+        self,
+        node_id: str,
+        rel_type: str,
+        direction: str,
+        label: Optional[str] = None,
+        min_confidence: Optional[float] = None
+    ) -> List[str]:
+        """
+        Neighbors connected by edges that carry rel_type (scans the node's entries).
+
+        Args:
+            node_id: Node to expand
+            rel_type: Relationship type the edge must carry
+            direction: 'out' or 'in'
+            label: Optional label filter on the neighbor
+            min_confidence: Optional minimum edge confidence
+
+        Returns:
+            Neighbor IDs in adjacency order, one per matching edge
+        """
+        i = self.node_index.get(node_id)
+        code = self.rel_type_codes.get(rel_type)
+        if i is None or code is None:
+            return []
+
+        if direction == 'in':
+            start, end = self.in_indptr[i], self.in_indptr[i + 1]
+            indices, types, eids = self.in_indices[start:end], self.in_types[start:end], self.in_eids[start:end]
+        else:
+            start, end = self.out_indptr[i], self.out_indptr[i + 1]
+            indices, types, eids = self.out_indices[start:end], self.out_types[start:end], self.out_eids[start:end]
+
+        mask = types == code
+        if label is not None:
+            label_code = self.label_codes.get(label)
+            if label_code is None:
+                return []
+            mask &= self.node_labels[indices] == label_code
+        if min_confidence is not None:
+            mask &= self.edge_confidence[eids] >= min_confidence
+        matched, matched_eids = indices[mask], eids[mask]
+        # An edge listing the same type twice yields consecutive duplicate entries
+        if len(matched_eids) > 1:
+            first = np.ones(len(matched_eids), dtype=bool)
+            first[1:] = matched_eids[1:] != matched_eids[:-1]
+            matched = matched[first]
+        return [self.node_ids[j] for j in matched.tolist()]
+
+    def shortest_path(
+        self,
+        source: str,
+        target: str,
+        max_hops: Optional[int] = None,
+        rel_types: Optional[Collection[str]] = None,
+        node_labels: Optional[Collection[str]] = None,
+        undirected: bool = False
+    ) -> Optional[List[str]]:
+        """
+        Shortest path by bounded bidirectional BFS (see path_search).
+
+        Expands the smaller fringe first, exactly like nx.shortest_path on an
+        unweighted DiGraph, so ties are broken the same way.
+
+        Args:
+            source: Start node ID
+            target: End node ID
+            max_hops: Maximum path length in edges (None = unbounded)
+            rel_types: Only follow edges carrying one of these types
+            node_labels: Only pass through nodes with one of these labels
+            undirected: Ignore edge direction
+        """
+        s = self.node_index.get(source)
+        t = self.node_index.get(target)
+        if s is None or t is None:
+            return None
+
+        allowed = None
+        if node_labels is not None:
+            label_codes = {self.label_codes[label] for label in node_labels if label in self.label_codes}
+            allowed = lambda j: int(self.node_labels[j]) in label_codes
+
+        successors, predecessors = self.neighbor_functions(rel_types, undirected)
+        path = bidirectional_shortest_path(s, t, successors, predecessors, max_hops=max_hops, allowed=allowed)
+        if path is None:
+            return None
+        return [self.node_ids[j] for j in path]
+
+    def simple_paths(
+        self,
+        source: str,
+        target: str,
+        max_hops: int,
+        limit: Optional[int] = None,
+        time_budget: Optional[float] = None,
+        rel_types: Optional[Collection[str]] = None,
+        undirected: bool = False
+    ) -> Iterator[List[str]]:
+        """
+        Lazily yield simple paths with at most max_hops edges, shortest first.
+
+        See path_search.iter_simple_paths; arguments as in shortest_path.
+        """
+        s = self.node_index.get(source)
+        t = self.node_index.get(target)
+        if s is None or t is None:
+            return
+        successors, predecessors = self.neighbor_functions(rel_types, undirected)
+        for path in iter_simple_paths(s, t, successors, predecessors, max_hops, limit=limit, time_budget=time_budget):
+            yield [self.node_ids[j] for j in path]
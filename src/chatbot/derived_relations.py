@@ -0,0 +1,220 @@
+"""
+Derived Relations
+
+Materialized 2- and 3-hop facts of the K-pop knowledge graph that the
+reasoner, chatbot and evaluation generators otherwise re-derive on every
+question:
+
+- companies_via_group: Artist → MEMBER_OF → Group → MANAGED_BY → Company
+- companies: all companies of an entity (Artist: direct + via group,
+  Group: its own companies)
+- labelmates: groups under the same companies (Artist: via its groups)
+- song_companies: Song → Group / Artist → Company
+- genres / genres_via_group: Artist / Group / Song / Album → IS_GENRE → Genre,
+  Artist via its groups
+
+Tables are built in one pass over the typed accessors of the graph and hold
+tuples, so every lookup is a dict access. A GraphChange only re-derives the
+rows it can reach: a MEMBER_OF edge the artist's rows, a MANAGED_BY edge the
+rows of the group, its members and the labelmates under that company, an
+IS_GENRE edge the entity's genres, a SINGS edge the song's companies.
+Lookups, builds and updates hold the graph's state_lock, so retrieval
+threads never see a half-built table.
+"""
+
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+try:
+    from .graph_changes import ChangeType, GraphChange
+except ImportError:
+    from graph_changes import ChangeType, GraphChange
+
+
+def _unique(items: Iterable[str]) -> Tuple[str, ...]:
+    """Deduplicate keeping first-seen order."""
+    return tuple(dict.fromkeys(items))
+
+
+class DerivedRelations:
+    """Precomputed derived-relation tables over a KpopKnowledgeGraph."""
+
+    TABLES = ('companies_via_group', 'companies', 'labelmates', 'song_companies', 'genres', 'genres_via_group')
+
+    def __init__(self, kg):
+        """
+        Args:
+            kg: KpopKnowledgeGraph providing the typed accessors
+        """
+        self.kg = kg
+        self.tables: Dict[str, Dict[str, Tuple[str, ...]]] = {}
+        self.labels: Dict[str, Optional[str]] = {}  # Entity labels the tables were derived with
+        self._lock = kg.state_lock  # Same lock as mutations: builds never see a half-applied change
+
+    @property
+    def is_built(self) -> bool:
+        return bool(self.tables)
+
+    def invalidate(self):
+        """Drop all tables; they are rebuilt on the next lookup."""
+        with self._lock:
+            self.tables = {}
+            self.labels = {}
+
+    def build(self):
+        """Build every table from the current graph."""
+        kg = self.kg
+        by_label: Dict[str, List[str]] = {'Artist': [], 'Group': [], 'Song': [], 'Album': []}
+        labels = {}
+        for entity_id, label, _ in kg._iter_nodes():
+            labels[entity_id] = label
+            if label in by_label:
+                by_label[label].append(entity_id)
+        artists, groups, songs, albums = (by_label[label] for label in ('Artist', 'Group', 'Song', 'Album'))
+
+        group_companies = {g: _unique(kg.get_group_companies(g)) for g in groups}
+        artist_groups = {a: kg.get_artist_groups(a) for a in artists}
+
+        companies_via_group = {}
+        companies = {}
+        for artist, member_of in artist_groups.items():
+            via_group = _unique(c for g in member_of for c in self._group_companies(g, group_companies))
+            companies_via_group[artist] = via_group
+            companies[artist] = _unique(list(kg.get_artist_companies(artist)) + list(via_group))
+        for group in groups:
+            companies[group] = group_companies[group]
+
+        company_groups: Dict[str, Tuple[str, ...]] = {}
+        labelmates = {}
+        for entity in artists + groups:
+            # get_labelmates chỉ dùng công ty qua nhóm cho Artist
+            own = companies_via_group[entity] if entity in companies_via_group else companies[entity]
+            mates = []
+            for company in own:
+                if company not in company_groups:
+                    company_groups[company] = _unique(kg.get_company_groups(company))
+                mates.extend(company_groups[company])
+            labelmates[entity] = tuple(g for g in _unique(mates) if g != entity)
+
+        song_companies = {}
+        for song in songs:
+            performers = list(kg.get_song_groups(song)) + list(kg.get_song_artists(song))
+            song_companies[song] = _unique(
+                c for performer in performers for c in companies.get(performer, self._group_companies(performer, group_companies))
+            )
+
+        genres = {}
+        for entity in artists + groups + songs + albums:
+            genres[entity] = _unique(kg._typed_neighbors(entity, 'IS_GENRE', 'out', label='Genre'))
+        genres_via_group = {
+            artist: _unique(genre for g in member_of for genre in genres.get(g, ()))
+            for artist, member_of in artist_groups.items()
+        }
+
+        self.tables = {
+            'companies_via_group': companies_via_group,
+            'companies': companies,
+            'labelmates': labelmates,
+            'song_companies': song_companies,
+            'genres': genres,
+            'genres_via_group': genres_via_group,
+        }
+        self.labels = labels
+
+    def apply(self, change: GraphChange):
+        """Re-derive the rows one applied mutation can change (no-op before the first build)."""
+        with self._lock:
+            if not self.tables:
+                return
+            company_rows: Set[str] = set()  # companies_via_group / companies / labelmates
+            genre_rows: Set[str] = set()    # genres / genres_via_group
+            song_rows: Set[str] = set()     # song_companies
+            if change.is_entity_change:
+                entity_id = change.entity_id
+                old_label = self.labels.pop(entity_id, None)
+                for table in self.tables.values():
+                    table.pop(entity_id, None)
+                if change.change_type == ChangeType.ENTITY_REMOVED:
+                    return  # Its edges were removed (and applied) before
+                label = self.kg.graph.nodes[entity_id].get('label')
+                self.labels[entity_id] = label
+                company_rows.add(entity_id)
+                genre_rows.add(entity_id)
+                song_rows.add(entity_id)
+                if change.change_type == ChangeType.ENTITY_UPDATED and label != old_label:
+                    # Typed accessors filter neighbors by label: every incident edge may count differently now
+                    graph = self.kg.graph
+                    for source, target, data in list(graph.in_edges(entity_id, data=True)) + list(graph.out_edges(entity_id, data=True)):
+                        for rel_type in self.kg._edge_types(data):
+                            self._mark(source, rel_type, target, company_rows, genre_rows, song_rows)
+            else:
+                self._mark(change.source, change.rel_type, change.target, company_rows, genre_rows, song_rows)
+            self._update_rows(company_rows, genre_rows, song_rows)
+
+    def _members(self, entity_id: str) -> List[str]:
+        return self.kg._typed_neighbors(entity_id, 'MEMBER_OF', 'in')
+
+    def _mark(self, source: str, rel_type: str, target: str,
+              company_rows: Set[str], genre_rows: Set[str], song_rows: Set[str]):
+        """Collect the rows an edge (source, rel_type, target) feeds into."""
+        if rel_type == 'MEMBER_OF':
+            company_rows.add(source)
+            genre_rows.add(source)
+        elif rel_type == 'MANAGED_BY':
+            # The managed entity and its members, plus labelmates of every group under the company
+            for entity in [source] + self.kg.get_company_groups(target):
+                company_rows.add(entity)
+                company_rows.update(self._members(entity))
+        elif rel_type == 'IS_GENRE':
+            genre_rows.add(source)
+            genre_rows.update(self._members(source))
+        elif rel_type == 'SINGS':
+            song_rows.update((source, target))
+
+    def _update_rows(self, company_rows: Set[str], genre_rows: Set[str], song_rows: Set[str]):
+        kg = self.kg
+        tables = self.tables
+        labels = self.labels
+        for entity in company_rows:
+            label = labels.get(entity)
+            if label == 'Artist':
+                via_group = _unique(c for g in kg.get_artist_groups(entity) for c in _unique(kg.get_group_companies(g)))
+                tables['companies_via_group'][entity] = via_group
+                tables['companies'][entity] = _unique(list(kg.get_artist_companies(entity)) + list(via_group))
+            elif label == 'Group':
+                tables['companies'][entity] = _unique(kg.get_group_companies(entity))
+            # Songs of the entity take its companies
+            song_rows.update(kg._typed_neighbors(entity, 'SINGS', 'in', label='Song'))
+            song_rows.update(kg._typed_neighbors(entity, 'SINGS', 'out', label='Song'))
+        for entity in company_rows:
+            if labels.get(entity) in ('Artist', 'Group'):
+                own = tables['companies_via_group'][entity] if labels[entity] == 'Artist' else tables['companies'][entity]
+                mates = [g for company in own for g in _unique(kg.get_company_groups(company))]
+                tables['labelmates'][entity] = tuple(g for g in _unique(mates) if g != entity)
+        companies = tables['companies']
+        for entity in song_rows:
+            if labels.get(entity) == 'Song':
+                performers = list(kg.get_song_groups(entity)) + list(kg.get_song_artists(entity))
+                tables['song_companies'][entity] = _unique(
+                    c for performer in performers
+                    for c in (companies[performer] if performer in companies else _unique(kg.get_group_companies(performer)))
+                )
+        for entity in genre_rows:
+            if labels.get(entity) in ('Artist', 'Group', 'Song', 'Album'):
+                tables['genres'][entity] = _unique(kg._typed_neighbors(entity, 'IS_GENRE', 'out', label='Genre'))
+        for entity in genre_rows:
+            if labels.get(entity) == 'Artist':
+                tables['genres_via_group'][entity] = _unique(
+                    genre for g in kg.get_artist_groups(entity) for genre in tables['genres'].get(g, ())
+                )
+
+    def _group_companies(self, group: str, cache: Dict[str, Tuple[str, ...]]) -> Tuple[str, ...]:
+        if group not in cache:
+            cache[group] = _unique(self.kg.get_group_companies(group))
+        return cache[group]
+
+    def lookup(self, table: str, entity_id: str) -> List[str]:
+        """Rows of a derived table for an entity ([] if none)."""
+        with self._lock:
+            if not self.tables:
+                self.build()
+            return list(self.tables[table].get(entity_id, ()))
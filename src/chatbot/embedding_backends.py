@@ -0,0 +1,312 @@
+"""
+Embedding Encoder Backends
+
+Pluggable sentence encoders behind GraphRAG entity / query embeddings:
+
+- 'torch': sentence-transformers on PyTorch (reference backend)
+- 'onnx': the same model exported once to ONNX, dynamically quantized to
+  int8 and run with onnxruntime on CPU; serving only needs onnxruntime and
+  tokenizers (no torch import), the one-time export needs torch +
+  transformers
+
+Every backend has encode(texts, batch_size, show_progress_bar) returning a
+float32 (len(texts), dim) array of mean-pooled sentence embeddings, and a
+name used as the embedding cache key (vectors of different backends are
+never mixed).
+
+Exported models live in data/onnx/<model name>/ (model.onnx, model.int8.onnx,
+tokenizer.json, encoder.json). Export, parity check against PyTorch and
+micro-benchmark:
+
+    python -m src.chatbot.embedding_backends --texts 512
+"""
+
+import argparse
+import importlib.util
+import json
+import os
+import time
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+try:
+    import onnxruntime as ort
+    ONNXRUNTIME_AVAILABLE = True
+except ImportError:
+    ONNXRUNTIME_AVAILABLE = False
+
+try:
+    from tokenizers import Tokenizer
+    TOKENIZERS_AVAILABLE = True
+except ImportError:
+    TOKENIZERS_AVAILABLE = False
+
+ENCODER_BACKENDS = ('torch', 'onnx')
+
+DEFAULT_MODEL = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+
+# Minimum cosine similarity between ONNX and PyTorch embeddings of the same text
+PARITY_THRESHOLD = 0.99
+
+
+def backend_available(backend: str, model_name: str = DEFAULT_MODEL) -> bool:
+    """
+    Whether a backend can serve a model (checked without importing torch).
+
+    'onnx' needs onnxruntime + tokenizers, and either an existing export of
+    the model or torch + transformers to export it on first use.
+    """
+    if backend == 'torch':
+        return importlib.util.find_spec('sentence_transformers') is not None
+    if backend == 'onnx':
+        if not (ONNXRUNTIME_AVAILABLE and TOKENIZERS_AVAILABLE):
+            return False
+        return onnx_export_exists(model_name) or can_export_onnx()
+    raise ValueError(f"Unknown encoder backend: {backend} (expected one of {ENCODER_BACKENDS})")
+
+
+def default_onnx_dir(model_name: str) -> str:
+    """Export directory of a model (data/onnx/<model name with / replaced>)."""
+    return os.path.join('data', 'onnx', model_name.replace('/', '__'))
+
+
+def onnx_export_exists(model_name: str, model_dir: Optional[str] = None, quantized: bool = True) -> bool:
+    """Whether the files OnnxEncoder serves from are present."""
+    model_dir = model_dir or default_onnx_dir(model_name)
+    files = ('model.int8.onnx' if quantized else 'model.onnx', 'tokenizer.json', 'encoder.json')
+    return all(os.path.exists(os.path.join(model_dir, name)) for name in files)
+
+
+def can_export_onnx() -> bool:
+    """Whether export_onnx's dependencies (torch, transformers) are installed."""
+    return all(importlib.util.find_spec(module) is not None for module in ('torch', 'transformers'))
+
+
+class SentenceTransformerEncoder:
+    """Reference backend: sentence-transformers on PyTorch."""
+
+    def __init__(self, model_name: str = DEFAULT_MODEL):
+        # Imported here: pulls in torch, which is slow and large
+        from sentence_transformers import SentenceTransformer
+        self.model = SentenceTransformer(model_name)
+        self.name = model_name
+
+    def encode(self, texts: Sequence[str], batch_size: int = 32, show_progress_bar: bool = False, **kwargs) -> np.ndarray:
+        return np.asarray(
+            self.model.encode(list(texts), batch_size=batch_size, show_progress_bar=show_progress_bar),
+            dtype=np.float32
+        )
+
+
+def export_onnx(model_name: str, output_dir: str, quantize: bool = True, max_seq_length: int = 128, opset: int = 14) -> str:
+    """
+    Export a transformer encoder to ONNX (and an int8 copy), once.
+
+    Needs torch, transformers and onnxruntime (for quantization).
+
+    Args:
+        model_name: Hugging Face model name
+        output_dir: Export directory
+        quantize: Also write model.int8.onnx (dynamic int8 weight quantization)
+        max_seq_length: Truncation length used at encode time (128 for the
+            paraphrase-multilingual-MiniLM sentence-transformers model)
+        opset: ONNX opset version
+
+    Returns:
+        Path of the model file to serve (int8 if quantize)
+    """
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    os.makedirs(output_dir, exist_ok=True)
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModel.from_pretrained(model_name)
+    model.config.return_dict = False
+    model.eval()
+
+    fp32_path = os.path.join(output_dir, 'model.onnx')
+    sample = tokenizer(["Xin chào BTS"], return_tensors='pt')
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            (sample['input_ids'], sample['attention_mask']),
+            fp32_path,
+            input_names=['input_ids', 'attention_mask'],
+            output_names=['token_embeddings'],
+            dynamic_axes={
+                'input_ids': {0: 'batch', 1: 'sequence'},
+                'attention_mask': {0: 'batch', 1: 'sequence'},
+                'token_embeddings': {0: 'batch', 1: 'sequence'}
+            },
+            opset_version=opset
+        )
+    tokenizer.save_pretrained(output_dir)  # Writes tokenizer.json for the fast tokenizer
+
+    model_path = fp32_path
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        model_path = os.path.join(output_dir, 'model.int8.onnx')
+        quantize_dynamic(fp32_path, model_path, weight_type=QuantType.QInt8)
+
+    meta = {
+        'model_name': model_name,
+        'max_seq_length': max_seq_length,
+        'pad_token': tokenizer.pad_token,
+        'pad_token_id': tokenizer.pad_token_id
+    }
+    with open(os.path.join(output_dir, 'encoder.json'), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+    print(f"✅ Exported {model_name} to {model_path}")
+    return model_path
+
+
+class OnnxEncoder:
+    """ONNX Runtime CPU backend (int8 by default), exported on first use."""
+
+    def __init__(
+        self,
+        model_name: str = DEFAULT_MODEL,
+        model_dir: Optional[str] = None,
+        quantized: bool = True,
+        num_threads: Optional[int] = None
+    ):
+        """
+        Args:
+            model_name: Hugging Face model name
+            model_dir: Export directory (default: default_onnx_dir(model_name))
+            quantized: Serve model.int8.onnx instead of model.onnx
+            num_threads: onnxruntime intra-op threads (default: onnxruntime's choice)
+        """
+        if not (ONNXRUNTIME_AVAILABLE and TOKENIZERS_AVAILABLE):
+            raise ImportError("The 'onnx' encoder backend needs onnxruntime and tokenizers")
+        self.model_dir = model_dir or default_onnx_dir(model_name)
+        model_path = os.path.join(self.model_dir, 'model.int8.onnx' if quantized else 'model.onnx')
+        if not onnx_export_exists(model_name, self.model_dir, quantized):
+            if not can_export_onnx():
+                raise ImportError(
+                    f"No ONNX export of {model_name} in {self.model_dir}, and exporting needs torch + transformers "
+                    f"(run python -m src.chatbot.embedding_backends where they are installed, then copy the directory)"
+                )
+            print(f"🔄 Exporting {model_name} to ONNX (one time)...")
+            export_onnx(model_name, self.model_dir, quantize=quantized)
+        with open(os.path.join(self.model_dir, 'encoder.json'), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+
+        options = ort.SessionOptions()
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(model_path, options, providers=['CPUExecutionProvider'])
+        self.tokenizer = Tokenizer.from_file(os.path.join(self.model_dir, 'tokenizer.json'))
+        self.tokenizer.enable_truncation(max_length=meta['max_seq_length'])
+        self.tokenizer.enable_padding(pad_id=meta['pad_token_id'], pad_token=meta['pad_token'])
+        self.name = f"{model_name}#onnx-{'int8' if quantized else 'fp32'}"
+
+    def encode(self, texts: Sequence[str], batch_size: int = 32, show_progress_bar: bool = False, **kwargs) -> np.ndarray:
+        texts = list(texts)
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        # Longest first (like sentence-transformers) so each batch pads little
+        order = sorted(range(len(texts)), key=lambda i: -len(texts[i]))
+        pooled = [None] * len(texts)
+        for start in range(0, len(texts), batch_size):
+            batch = order[start:start + batch_size]
+            encodings = self.tokenizer.encode_batch([texts[i] for i in batch])
+            input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+            attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+            token_embeddings = self.session.run(
+                ['token_embeddings'],
+                {'input_ids': input_ids, 'attention_mask': attention_mask}
+            )[0]
+            # Mean pooling over real tokens (the model's sentence-transformers pooling)
+            mask = attention_mask[:, :, None].astype(np.float32)
+            embeddings = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            for i, embedding in zip(batch, embeddings):
+                pooled[i] = embedding
+            if show_progress_bar:
+                print(f"  {min(start + batch_size, len(texts))}/{len(texts)}", end='\r')
+        return np.stack(pooled).astype(np.float32)
+
+
+def create_encoder(backend: str, model_name: str = DEFAULT_MODEL, **kwargs):
+    """Encoder for a backend ('torch' or 'onnx'); kwargs go to the backend class."""
+    if backend == 'torch':
+        return SentenceTransformerEncoder(model_name)
+    if backend == 'onnx':
+        return OnnxEncoder(model_name, **kwargs)
+    raise ValueError(f"Unknown encoder backend: {backend} (expected one of {ENCODER_BACKENDS})")
+
+
+def check_parity(reference, candidate, texts: List[str], batch_size: int = 32, threshold: float = PARITY_THRESHOLD) -> Dict:
+    """
+    Compare two encoders text by text (cosine similarity of their embeddings).
+
+    Returns:
+        Dict with min / mean cosine, the worst text and whether min >= threshold
+    """
+    a = reference.encode(texts, batch_size=batch_size)
+    b = candidate.encode(texts, batch_size=batch_size)
+    cosines = (a * b).sum(axis=1) / (np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1))
+    worst = int(np.argmin(cosines))
+    return {
+        'texts': len(texts),
+        'min_cosine': float(cosines[worst]),
+        'mean_cosine': float(cosines.mean()),
+        'worst_text': texts[worst],
+        'passed': bool(cosines[worst] >= threshold)
+    }
+
+
+def benchmark_encoder(encoder, texts: List[str], batch_sizes: Sequence[int] = (1, 32), repeats: int = 3) -> Dict[int, Dict[str, float]]:
+    """
+    Encoding throughput per batch size (best of repeats, after one warm-up).
+
+    Returns:
+        batch_size -> {'texts_per_second', 'ms_per_text'}
+    """
+    results = {}
+    for batch_size in batch_sizes:
+        encoder.encode(texts[:batch_size], batch_size=batch_size)
+        best = float('inf')
+        for _ in range(repeats):
+            start = time.perf_counter()
+            encoder.encode(texts, batch_size=batch_size)
+            best = min(best, time.perf_counter() - start)
+        results[batch_size] = {
+            'texts_per_second': len(texts) / best,
+            'ms_per_text': best * 1000 / len(texts)
+        }
+    return results
+
+
+def main():
+    """Export the ONNX model, check parity against PyTorch and benchmark both."""
+    parser = argparse.ArgumentParser(description="ONNX encoder export / parity check / benchmark")
+    parser.add_argument('--model', default=DEFAULT_MODEL)
+    parser.add_argument('--data', default='data/merged_kpop_data.json', help="Graph JSON to take entity texts from")
+    parser.add_argument('--texts', type=int, default=512, help="Number of entity texts to use")
+    parser.add_argument('--fp32', action='store_true', help="Serve the unquantized ONNX model")
+    args = parser.parse_args()
+
+    from .knowledge_graph import KpopKnowledgeGraph
+    from .graph_rag import GraphRAG
+
+    kg = KpopKnowledgeGraph(args.data)
+    texts = [GraphRAG._entity_to_text(entity_id, kg.get_entity(entity_id)) for entity_id in kg.get_all_entity_ids()[:args.texts]]
+
+    onnx_encoder = OnnxEncoder(args.model, quantized=not args.fp32)
+    torch_encoder = SentenceTransformerEncoder(args.model)
+
+    parity = check_parity(torch_encoder, onnx_encoder, texts)
+    status = "✅" if parity['passed'] else "⚠️"
+    print(f"{status} Parity over {parity['texts']} texts: min cosine {parity['min_cosine']:.4f}, mean {parity['mean_cosine']:.4f} (threshold {PARITY_THRESHOLD})")
+    if not parity['passed']:
+        print(f"   Worst text: {parity['worst_text']}")
+
+    for name, encoder in (('torch', torch_encoder), (onnx_encoder.name, onnx_encoder)):
+        for batch_size, stats in benchmark_encoder(encoder, texts).items():
+            print(f"⏱️ {name} batch={batch_size}: {stats['texts_per_second']:.1f} texts/s ({stats['ms_per_text']:.2f} ms/text)")
+
+
+if __name__ == "__main__":
+    main()
@@ -90,10 +90,10 @@ class EvaluationDatasetGenerator:
         """Cache frequently used entities and relationships."""
         print("🔄 Caching knowledge graph data...")
         
-        # Groups with members
+        # Groups with members (one batched lookup for all groups)
         self.groups_with_members = {}
-        for group in self.kg.get_entities_by_type("Group"):
-            members = self.kg.get_group_members(group)
+        all_members = self.kg.get_group_members_many(list(self.kg.get_entities_by_type("Group")))
+        for group, members in all_members.items():
             if len(members) >= 2:  # Only groups with 2+ members
                 self.groups_with_members[group] = members
                 
@@ -135,7 +135,7 @@ class EvaluationDatasetGenerator:
         # Songs by groups/artists
         self.entity_songs = defaultdict(list)
         # First, get songs directly linked to artists/groups via SINGS edges
-        for edge in self.kg.edges:
+        for edge in self.kg.edges.values():
             if edge.get('type') == 'SINGS':
                 song = edge.get('source')
                 entity = edge.get('target')  # Can be Artist or Group
@@ -0,0 +1,226 @@
+"""
+Entity Name Gazetteer
+
+Finds every entity name mentioned in a query in one pass: an Aho-Corasick
+automaton over the word sequences of all entity names, so matching is linear
+in the query length whatever the number of entities.
+
+Keys of an entity (words are casefolded, diacritic-folded \\w+ tokens):
+- 'exact': the entity ID without crawler prefix ("Lisa (ca sĩ)" -> lisa ca si)
+- 'base': the ID without its parenthetical suffix (lisa)
+- 'partial': a single word of an Artist / Group / Company base name that
+  belongs to no other such entity (jennie -> "Jennie Kim")
+
+Overlapping matches are resolved longest first, then leftmost ("red velvet"
+wins over "velvet"); a span yields all entities keyed by its words, best key
+kind first ("seventeen" -> "Seventeen", then "Seventeen (nhóm nhạc)").
+"""
+
+import argparse
+import re
+import threading
+from collections import defaultdict, deque
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+try:
+    from .name_index import fold_diacritics, strip_name_prefix, strip_name_suffix
+except ImportError:  # Fallback for no-package context
+    from name_index import fold_diacritics, strip_name_prefix, strip_name_suffix
+
+# Key kinds, best first
+MENTION_KINDS = ('exact', 'base', 'partial')
+
+# Labels whose single name words are partial keys
+PARTIAL_LABELS = ('Artist', 'Group', 'Company')
+
+# Shorter keys (e.g. "iu", "g") match too many ordinary words
+MIN_MENTION_LENGTH = 3
+
+_WORD_RE = re.compile(r'\w+')
+
+
+def name_words(text: str) -> Tuple[str, ...]:
+    """Gazetteer words of a name or query: "Jang Won-young!" -> ('jang', 'won', 'young')."""
+    return tuple(_WORD_RE.findall(fold_diacritics(text).casefold()))
+
+
+@dataclass
+class Mention:
+    """Entity name found in a query."""
+    start: int  # First word (index into name_words(query))
+    end: int  # One past the last word
+    text: str  # Matched words joined by spaces
+    kind: str  # Best of MENTION_KINDS among the span's entities
+    entity_ids: List[str]  # Entities for the span, best kind first, then in graph order
+    entity_kinds: Dict[str, str]  # entity -> its key kind for the span
+
+
+class Gazetteer:
+    """Aho-Corasick automaton over entity name keys, rebuilt lazily after changes."""
+
+    def __init__(self, entities: Iterable[Tuple[str, Optional[str]]] = ()):
+        """
+        Args:
+            entities: (entity_id, label) tuples in graph order
+        """
+        self._entities: Dict[str, Tuple[Tuple[str, ...], Tuple[str, ...], Optional[str]]] = {}
+        self._dirty = True
+        # Guards _entities and the automaton: graph change listeners call add / remove
+        # while retrieval threads call find(), and only one of them rebuilds
+        self._build_lock = threading.Lock()
+        # Automaton (valid when not _dirty)
+        self._goto: List[Dict[str, int]] = []
+        self._fail: List[int] = []
+        self._output_link: List[int] = []  # Nearest key-ending state on the failure chain (0: none)
+        self._state_keys: List[Optional[Tuple[str, ...]]] = []
+        self._keys: Dict[Tuple[str, ...], Dict[str, str]] = {}  # key -> entity -> kind
+
+        for entity_id, label in entities:
+            self.add(entity_id, label)
+
+    def __len__(self) -> int:
+        return len(self._entities)
+
+    def add(self, entity_id: str, label: Optional[str]):
+        """Add or re-index an entity."""
+        full = strip_name_prefix(entity_id)
+        keys = (name_words(full), name_words(strip_name_suffix(full)), label)
+        with self._build_lock:
+            self._entities.pop(entity_id, None)  # Re-added entities move to the end, like graph order
+            self._entities[entity_id] = keys
+            self._dirty = True
+
+    def remove(self, entity_id: str):
+        with self._build_lock:
+            if self._entities.pop(entity_id, None) is not None:
+                self._dirty = True
+
+    def _collect_keys(self) -> Dict[Tuple[str, ...], Dict[str, str]]:
+        keys: Dict[Tuple[str, ...], Dict[str, str]] = defaultdict(dict)
+        word_owners: Dict[str, List[str]] = defaultdict(list)
+        for entity_id, (full, base, label) in self._entities.items():
+            keys[full][entity_id] = 'exact'
+            if base != full:
+                keys[base].setdefault(entity_id, 'base')
+            if label in PARTIAL_LABELS and len(base) > 1:
+                for word in set(base):
+                    word_owners[word].append(entity_id)
+        for word, owners in word_owners.items():
+            if len(owners) == 1 and (word,) not in keys:
+                keys[(word,)][owners[0]] = 'partial'
+        return {
+            key: entities for key, entities in keys.items()
+            if key and len(' '.join(key)) >= MIN_MENTION_LENGTH
+        }
+
+    def _build(self):
+        """Build the trie, failure links and output links over all keys."""
+        self._keys = self._collect_keys()
+        goto: List[Dict[str, int]] = [{}]
+        state_keys: List[Optional[Tuple[str, ...]]] = [None]
+        for key in self._keys:
+            state = 0
+            for word in key:
+                next_state = goto[state].get(word)
+                if next_state is None:
+                    next_state = goto[state][word] = len(goto)
+                    goto.append({})
+                    state_keys.append(None)
+                state = next_state
+            state_keys[state] = key
+
+        # Breadth-first: a state's failure target is always shallower
+        fail = [0] * len(goto)
+        output_link = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for word, next_state in goto[state].items():
+                target = fail[state]
+                while target and word not in goto[target]:
+                    target = fail[target]
+                target = goto[target].get(word, 0)
+                fail[next_state] = target
+                output_link[next_state] = target if state_keys[target] is not None else output_link[target]
+                queue.append(next_state)
+
+        self._goto, self._fail, self._output_link, self._state_keys = goto, fail, output_link, state_keys
+        self._dirty = False
+
+    def find(self, text: str) -> List[Mention]:
+        """
+        Non-overlapping entity mentions in a text, in text order.
+
+        Args:
+            text: Query (any case / diacritics / punctuation)
+        """
+        with self._build_lock:
+            if self._dirty:
+                self._build()
+            goto, fail, output_link, state_keys = self._goto, self._fail, self._output_link, self._state_keys
+            keys = self._keys
+
+        words = name_words(text)
+        matches = []  # (start, end, key)
+        state = 0
+        for position, word in enumerate(words):
+            while state and word not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(word, 0)
+            match_state = state if state_keys[state] is not None else output_link[state]
+            while match_state:
+                key = state_keys[match_state]
+                matches.append((position + 1 - len(key), position + 1, key))
+                match_state = output_link[match_state]
+
+        # Longest first, then leftmost; skip matches overlapping a chosen one
+        matches.sort(key=lambda match: (match[0] - match[1], match[0]))
+        taken = [False] * len(words)
+        mentions = []
+        for start, end, key in matches:
+            if any(taken[start:end]):
+                continue
+            taken[start:end] = [True] * (end - start)
+            entities = keys[key]
+            # Exact and base keys of the same words both count: "seventeen" is the
+            # exact name of an Artist stub and the base name of the group
+            entity_ids = sorted(entities, key=lambda entity_id: MENTION_KINDS.index(entities[entity_id]))
+            mentions.append(Mention(
+                start=start,
+                end=end,
+                text=' '.join(key),
+                kind=entities[entity_ids[0]],
+                entity_ids=entity_ids,
+                entity_kinds=dict(entities)
+            ))
+        mentions.sort(key=lambda mention: mention.start)
+        return mentions
+
+
+def main():
+    """Check mentions of names shared by several entities on the K-pop graph."""
+    parser = argparse.ArgumentParser(description="Gazetteer mention check")
+    parser.add_argument('--data', default='data/merged_kpop_data.json', help="Graph JSON")
+    args = parser.parse_args()
+
+    try:
+        from .knowledge_graph import KpopKnowledgeGraph
+    except ImportError:  # Fallback for no-package context
+        from knowledge_graph import KpopKnowledgeGraph
+
+    kg = KpopKnowledgeGraph(args.data)
+    gazetteer = Gazetteer((entity_id, label) for entity_id, label, _ in kg._iter_nodes())
+    checks = [
+        ("BTS và SEVENTEEN có cùng công ty không?", ["Seventeen (nhóm nhạc)", "BTS"]),
+        ("Lisa và Jennie có cùng nhóm không?", ["Lisa", "Jennie", "Jennie (ca sĩ)"]),
+    ]
+    for query, expected in checks:
+        found = [entity_id for mention in gazetteer.find(query) for entity_id in mention.entity_ids]
+        missing = [entity_id for entity_id in expected if entity_id not in found]
+        print(f"{'✅' if not missing else '❌'} {query} -> {found}")
+        assert not missing, f"Missing {missing}"
+
+
+if __name__ == "__main__":
+    main()
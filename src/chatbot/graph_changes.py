@@ -0,0 +1,46 @@
+"""
+Graph Change Events
+
+Events emitted by the KpopKnowledgeGraph mutation API (add_entity,
+update_entity, remove_entity, add_relationship, remove_relationship).
+Downstream caches (GraphRAG name maps and embeddings, the name index,
+...) subscribe with kg.subscribe(callback) and refresh only what a
+change touches instead of reloading the whole graph.
+"""
+
+from dataclasses import dataclass
+from enum import Enum
+from typing import List, Optional
+
+
+class ChangeType(Enum):
+    """Kinds of graph mutations."""
+    ENTITY_ADDED = "entity_added"
+    ENTITY_UPDATED = "entity_updated"
+    ENTITY_REMOVED = "entity_removed"
+    RELATIONSHIP_ADDED = "relationship_added"
+    RELATIONSHIP_REMOVED = "relationship_removed"
+
+
+ENTITY_CHANGES = (ChangeType.ENTITY_ADDED, ChangeType.ENTITY_UPDATED, ChangeType.ENTITY_REMOVED)
+
+
+@dataclass
+class GraphChange:
+    """A single applied mutation (IDs are cleaned IDs, as stored in graph)."""
+    change_type: ChangeType
+    entity_id: Optional[str] = None  # Entity events
+    source: Optional[str] = None     # Relationship events
+    target: Optional[str] = None
+    rel_type: Optional[str] = None
+
+    @property
+    def is_entity_change(self) -> bool:
+        return self.change_type in ENTITY_CHANGES
+
+    @property
+    def entity_ids(self) -> List[str]:
+        """Entities whose own data or adjacency changed."""
+        if self.is_entity_change:
+            return [self.entity_id]
+        return [self.source, self.target]
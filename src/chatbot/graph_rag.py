@@ -13,28 +13,47 @@ Key Features:
 - Context ranking and filtering
 """
 
+import hashlib
 import json
 import numpy as np
-from typing import Dict, List, Tuple, Optional, Set, Any
-from collections import defaultdict
+from typing import Callable, Dict, List, Tuple, Optional, Set, Any, Union
+from collections import OrderedDict, defaultdict
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from dataclasses import dataclass, field
 import os
 import re
+import threading
+import time
+import weakref
 
-try:
-    from sentence_transformers import SentenceTransformer
-    SENTENCE_TRANSFORMERS_AVAILABLE = True
-except ImportError:
-    SENTENCE_TRANSFORMERS_AVAILABLE = False
+from .knowledge_graph import KpopKnowledgeGraph
+from .graph_changes import ChangeType, GraphChange
+from .name_index import strip_name_suffix
+from .gazetteer import Gazetteer
+from .result_cache import ResultCache
+from .context_packer import ContextPacker
+from .node_features import top_k_indices
+from .embedding_backends import DEFAULT_MODEL, backend_available, create_encoder
+from .vector_index import (
+    build_vector_index, load_vector_index, normalize_rows,
+    save_vector_index, vector_index_base
+)
+
+# Checked without importing sentence_transformers (torch); the encoder is created on demand
+SENTENCE_TRANSFORMERS_AVAILABLE = backend_available('torch')
+if not SENTENCE_TRANSFORMERS_AVAILABLE:
     print("⚠️ sentence-transformers not installed. Using keyword-based retrieval.")
 
-try:
-    import faiss
-    FAISS_AVAILABLE = True
-except ImportError:
-    FAISS_AVAILABLE = False
-    print("⚠️ faiss not installed. Using numpy-based similarity search.")
 
-from .knowledge_graph import KpopKnowledgeGraph
+@dataclass
+class _StageRun:
+    """A submitted retrieval stage (see GraphRAG._run_stage)."""
+    stage: str  # Key of GraphRAG.STAGE_DEADLINES
+    future: Future
+    budget: Optional[float] = None  # Seconds from start (None: ran inline, already done)
+    submitted: float = 0.0  # time.monotonic() at submit
+    started: threading.Event = field(default_factory=threading.Event)
+    started_at: Optional[float] = None  # time.monotonic() when a worker picked it up
 
 
 class GraphRAG:
@@ -68,12 +87,54 @@ class GraphRAG:
     4. Multi-hop path finding
     """
     
+    # Query embeddings kept by encode_query (the encoder pass dominates retrieval CPU)
+    QUERY_CACHE_SIZE = 1024
+    # Queries per similarity matrix in semantic_search_batch
+    SEARCH_CHUNK_SIZE = 256
+    # retrieve_context results kept in memory, and their lifetime in seconds
+    RESULT_CACHE_SIZE = 512
+    RESULT_CACHE_TTL = 3600.0
+    # Answering LLM (Qwen2-0.5B-Instruct): 32K-token window, minus the answer
+    # (LLMConfig.max_new_tokens) and the prompt around the context (system prompt,
+    # reasoning steps, 5 history turns, query) = format_context_for_llm budget
+    LLM_CONTEXT_WINDOW = 32768
+    LLM_ANSWER_TOKENS = 512
+    PROMPT_RESERVE_TOKENS = 4096
+    CONTEXT_TOKEN_BUDGET = LLM_CONTEXT_WINDOW - LLM_ANSWER_TOKENS - PROMPT_RESERVE_TOKENS
+    # Smaller budget when graph reasoning already found the answer (less noise for a 0.5B model)
+    REASONED_CONTEXT_TOKEN_BUDGET = 4096
+    # Info fields shown per entity
+    CONTEXT_INFO_FIELDS = 3
+    # concurrent_retrieval: worker threads, and seconds a stage may run (counted
+    # from when a worker starts it) before retrieve_context goes on without its results
+    RETRIEVAL_WORKERS = 4
+    STAGE_DEADLINES = {'encoding': 2.0, 'extraction': 10.0, 'semantic': 2.0, 'paths': 2.0}
+    # Query keywords that make a relationship type / entity type relevant (_rank_and_filter_context)
+    REL_TYPE_KEYWORDS = {
+        'MEMBER_OF': ['thành viên', 'member', 'nhóm', 'group', 'thuộc', 'belongs'],
+        'MANAGED_BY': ['công ty', 'company', 'hãng đĩa', 'label', 'quản lý', 'manage'],
+        'SINGS': ['hát', 'sing', 'bài hát', 'song', 'ca khúc'],
+        'RELEASED': ['phát hành', 'release', 'album', 'single'],
+        'COLLAB_WITH': ['hợp tác', 'collab', 'collaborate', 'cùng'],
+        'PRODUCED_BY': ['sản xuất', 'produce', 'producer']
+    }
+    ENTITY_TYPE_KEYWORDS = {
+        'Group': ['nhóm', 'group', 'band'],
+        'Artist': ['ca sĩ', 'artist', 'singer', 'idol'],
+        'Song': ['bài hát', 'song', 'ca khúc'],
+        'Company': ['công ty', 'company', 'label', 'hãng đĩa']
+    }
+    
     def __init__(
         self,
         knowledge_graph: Optional[KpopKnowledgeGraph] = None,
-        embedding_model: str = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2",
+        embedding_model: str = DEFAULT_MODEL,
         use_cache: bool = True,
-        llm_for_understanding: Optional[Any] = None
+        llm_for_understanding: Optional[Any] = None,
+        encoder_backend: str = 'torch',
+        index_type: str = 'flat',
+        result_cache_dir: Optional[str] = None,
+        concurrent_retrieval: bool = False
     ):
         """
         Initialize GraphRAG.
@@ -83,25 +144,51 @@ class GraphRAG:
             embedding_model: Sentence transformer model for embeddings
             use_cache: Whether to cache embeddings
             llm_for_understanding: Optional LLM for understanding queries (entity extraction + intent detection)
+            encoder_backend: Embedding encoder ('torch' or 'onnx' int8 on CPU, see embedding_backends)
+            index_type: Vector index ('flat' exact, 'hnsw' or 'ivfpq' approximate, see vector_index)
+            result_cache_dir: Directory of the on-disk retrieve_context cache tier (None: memory only)
+            concurrent_retrieval: Run independent retrieval stages on a thread pool, with per-stage
+                deadlines (call close() to stop the pool; it is also shut down when GraphRAG is collected)
         """
         self.kg = knowledge_graph or KpopKnowledgeGraph()
         self.embedding_model_name = embedding_model
         self.use_cache = use_cache
+        self.encoder_backend = encoder_backend
+        self.index_type = index_type
+        self.concurrent_retrieval = concurrent_retrieval
+        self._executor: Optional[ThreadPoolExecutor] = None  # Created on first concurrent retrieval
+        self._executor_lock = threading.Lock()
         self.llm_for_understanding = llm_for_understanding  # LLM để hiểu câu hỏi
         
         # Initialize embedding model
         self.embedder = None
         self.entity_embeddings = None
         self.entity_ids = []
-        self.faiss_index = None
-        
-        if SENTENCE_TRANSFORMERS_AVAILABLE:
+        self._entity_rows: Dict[str, int] = {}  # entity_id -> row of entity_embeddings
+        self.vector_index = None  # FaissIndex / NumpyIndex over normalized entity embeddings
+        # Entities changed since the last search (entity_id -> removed), applied in one batch
+        self._pending_embeddings: Dict[str, bool] = {}
+        self._embedding_lock = threading.Lock()
+        self._query_cache: "OrderedDict[str, np.ndarray]" = OrderedDict()  # normalized query -> embedding
+        self._query_cache_lock = threading.Lock()  # Stages / callers may encode from several threads
+        self._gazetteer: Optional[Gazetteer] = None  # Entity name automaton, built on first extraction
+        # retrieve_context results by (query, params, graph version); see retrieval_cache_info()
+        self.result_cache = ResultCache(self.RESULT_CACHE_SIZE, self.RESULT_CACHE_TTL, result_cache_dir)
+        # Fits format_context_for_llm output to a token budget (estimator until set_token_counter)
+        self.context_packer = ContextPacker()
+        
+        if backend_available(encoder_backend, embedding_model):
             self._init_embeddings()
         else:
+            if encoder_backend == 'onnx':
+                print(f"⚠️ No ONNX export of {embedding_model} (and no torch + transformers to create one)")
             print("⚠️ Running in keyword-only mode (no semantic embeddings)")
             
         # Entity patterns for extraction
         self._init_entity_patterns()
+        
+        # Keep name maps / embeddings in sync with graph mutations
+        self.kg.subscribe(self._on_graph_change)
     
     def _normalize_entity_name(self, entity_name: str) -> str:
         """
@@ -119,58 +206,130 @@ class GraphRAG:
             Base name (không có đuôi)
         """
         # Remove suffixes trong parentheses: (ca sĩ), (nhóm nhạc), (rapper), etc.
-        # Pattern: (.*) ở cuối string
-        import re
-        # Match pattern: space + (anything) ở cuối
-        normalized = re.sub(r'\s*\([^)]+\)\s*$', '', entity_name)
-        return normalized.strip()
+        # Dùng chung với name_index để mọi component chuẩn hóa giống nhau
+        return strip_name_suffix(entity_name)
         
     def _init_embeddings(self):
         """Initialize sentence transformer and build entity embeddings."""
-        print(f"🔄 Loading embedding model: {self.embedding_model_name}")
-        self.embedder = SentenceTransformer(self.embedding_model_name)
+        print(f"🔄 Loading embedding model: {self.embedding_model_name} ({self.encoder_backend})")
+        self.embedder = create_encoder(self.encoder_backend, self.embedding_model_name)
         
-        # Check for cached embeddings
+        # Cached vectors are reused per entity when its text is unchanged
         cache_path = "data/entity_embeddings.npz"
-        if self.use_cache and os.path.exists(cache_path):
-            print("📂 Loading cached embeddings...")
-            data = np.load(cache_path, allow_pickle=True)
-            self.entity_embeddings = data['embeddings']
-            self.entity_ids = data['entity_ids'].tolist()
+        cached = self._load_embedding_cache(cache_path) if self.use_cache else None
+        text_hashes, changed = self._build_entity_embeddings(cached)
+        if self.use_cache and changed:
+            self._save_embedding_cache(cache_path, text_hashes)
+                
+        # Saved index is reused while the embedded texts are the same
+        index_base = vector_index_base(cache_path, self.index_type)
+        index_key = self._text_hash('\n'.join([self.embedder.name, self.index_type] + text_hashes))
+        if self.use_cache:
+            self.vector_index = load_vector_index(index_base, index_key, self.index_type)
+        if self.vector_index is not None:
+            print(f"📂 Loaded {self.vector_index.index_type} vector index with {len(self.vector_index)} vectors")
         else:
-            print("🔄 Building entity embeddings...")
-            self._build_entity_embeddings()
+            self._build_vector_index()
             if self.use_cache:
-                np.savez(
-                    cache_path,
-                    embeddings=self.entity_embeddings,
-                    entity_ids=self.entity_ids
-                )
-                
-        # Build FAISS index
-        self._build_faiss_index()
+                save_vector_index(self.vector_index, index_base, index_key)
+        
+    @staticmethod
+    def _text_hash(text: str) -> str:
+        """Content address of an entity text in the embedding cache."""
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+        
+    def _load_embedding_cache(self, cache_path: str) -> Optional[Dict[str, Any]]:
+        """
+        Load cached embeddings keyed by text hash.
         
-    def _build_entity_embeddings(self):
-        """Build embeddings for all entities."""
+        Returns:
+            Dict text hash -> row, embeddings; None if missing, unreadable,
+            from an older format or from another embedding model
+        """
+        if not os.path.exists(cache_path):
+            return None
+        try:
+            with np.load(cache_path) as data:
+                if 'text_hashes' not in data.files or str(data['model_name']) != self.embedder.name:
+                    print("⚠️ Cached embeddings have no text hashes or another model, re-encoding all entities")
+                    return None
+                return {
+                    'rows': {text_hash: row for row, text_hash in enumerate(data['text_hashes'].tolist())},
+                    'embeddings': data['embeddings']
+                }
+        except (OSError, ValueError, KeyError) as e:
+            print(f"⚠️ Could not read cached embeddings: {e}")
+            return None
+        
+    def _save_embedding_cache(self, cache_path: str, text_hashes: List[str]):
+        """Write embeddings + text hashes atomically (temp file + rename)."""
+        tmp_path = f"{cache_path}.tmp{os.getpid()}.npz"
+        try:
+            np.savez(
+                tmp_path,
+                embeddings=self.entity_embeddings,
+                entity_ids=np.array(self.entity_ids),
+                text_hashes=np.array(text_hashes),
+                model_name=np.array(self.embedder.name)
+            )
+            os.replace(tmp_path, cache_path)
+        except OSError as e:
+            print(f"⚠️ Could not save cached embeddings: {e}")
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        
+    def _build_entity_embeddings(self, cached: Optional[Dict[str, Any]] = None) -> Tuple[List[str], bool]:
+        """
+        Build embeddings for all entities, encoding only texts missing from cache.
+        
+        Args:
+            cached: Result of _load_embedding_cache (None: encode everything)
+            
+        Returns:
+            (text hash per entity, whether anything differs from cache)
+        """
         texts = []
+        text_hashes = []
         self.entity_ids = []
         
-        for node_id, data in self.kg.graph.nodes(data=True):
+        for node_id in self.kg.get_all_entity_ids():
+            data = self.kg.get_entity(node_id)
             # Create text representation of entity
             text = self._entity_to_text(node_id, data)
             texts.append(text)
+            text_hashes.append(self._text_hash(text))
             self.entity_ids.append(node_id)
-            
-        # Batch encode
-        self.entity_embeddings = self.embedder.encode(
-            texts,
-            show_progress_bar=True,
-            batch_size=64
-        )
-        
-        print(f"✅ Built embeddings for {len(self.entity_ids)} entities")
-        
-    def _entity_to_text(self, entity_id: str, data: Dict) -> str:
+        self._entity_rows = {entity_id: row for row, entity_id in enumerate(self.entity_ids)}
+        
+        cached_rows = cached['rows'] if cached is not None else {}
+        reused = [i for i, text_hash in enumerate(text_hashes) if text_hash in cached_rows]
+        missing = [i for i, text_hash in enumerate(text_hashes) if text_hash not in cached_rows]
+        
+        # Batch encode new / changed entities only
+        encoded = None
+        if missing:
+            print(f"🔄 Encoding {len(missing)} new or changed entities...")
+            encoded = np.asarray(self.embedder.encode(
+                [texts[i] for i in missing],
+                show_progress_bar=len(missing) > 64,
+                batch_size=64
+            ))
+        dim = encoded.shape[1] if encoded is not None else cached['embeddings'].shape[1]
+        dtype = encoded.dtype if encoded is not None else cached['embeddings'].dtype
+        self.entity_embeddings = np.zeros((len(texts), dim), dtype=dtype)
+        if reused:
+            self.entity_embeddings[reused] = cached['embeddings'][[cached_rows[text_hashes[i]] for i in reused]]
+        if missing:
+            self.entity_embeddings[missing] = encoded
+        
+        dropped = len(cached_rows) - len(reused)
+        print(f"✅ Built embeddings for {len(self.entity_ids)} entities ({len(reused)} cached, {len(missing)} encoded, {dropped} dropped)")
+        changed = bool(missing) or dropped > 0 or [cached_rows[text_hashes[i]] for i in reused] != list(range(len(reused)))
+        return text_hashes, changed
+        
+    @staticmethod
+    def _entity_to_text(entity_id: str, data: Dict) -> str:
         """Convert entity to text representation for embedding."""
         parts = [entity_id]
         
@@ -193,21 +352,82 @@ class GraphRAG:
                     
         return " | ".join(parts)
         
-    def _build_faiss_index(self):
-        """Build FAISS index for fast similarity search."""
-        if not FAISS_AVAILABLE or self.entity_embeddings is None:
+    def _on_graph_change(self, change: GraphChange):
+        """Refresh caches derived from entity data after a graph mutation."""
+        if not change.is_entity_change:
+            return  # Relationships are read from the graph at query time
+        
+        # Gazetteer for entity extraction (automaton is rebuilt lazily on next use)
+        if self._gazetteer is not None:
+            if change.change_type == ChangeType.ENTITY_REMOVED:
+                self._gazetteer.remove(change.entity_id)
+            else:
+                self._gazetteer.add(change.entity_id, self.kg.get_entity_type(change.entity_id))
+        
+        if self.embedder is None or self.entity_embeddings is None:
             return
+        # Re-encoded and indexed in one batch on the next search (a crawl delta emits many events)
+        with self._embedding_lock:
+            self._pending_embeddings[change.entity_id] = change.change_type == ChangeType.ENTITY_REMOVED
+        
+    def _apply_pending_embeddings(self):
+        """Re-encode / drop entities changed since the last search, then rebuild the vector index once."""
+        with self._embedding_lock:
+            if not self._pending_embeddings:
+                return
+            pending, self._pending_embeddings = self._pending_embeddings, {}
+            
+            removed = {entity_id for entity_id, is_removed in pending.items() if is_removed and entity_id in self._entity_rows}
+            if removed:
+                keep = np.fromiter((entity_id not in removed for entity_id in self.entity_ids), dtype=bool, count=len(self.entity_ids))
+                self.entity_embeddings = self.entity_embeddings[keep]
+                self.entity_ids = [entity_id for entity_id in self.entity_ids if entity_id not in removed]
+                self._entity_rows = {entity_id: row for row, entity_id in enumerate(self.entity_ids)}
             
-        dim = self.entity_embeddings.shape[1]
-        self.faiss_index = faiss.IndexFlatIP(dim)  # Inner product for cosine similarity
+            # Re-encode only the added / updated entities, in batches
+            changed, texts = [], []
+            for entity_id, is_removed in pending.items():
+                data = None if is_removed else self.kg.get_entity(entity_id)
+                if data is not None:
+                    changed.append(entity_id)
+                    texts.append(self._entity_to_text(entity_id, data))
+            if texts:
+                print(f"🔄 Encoding {len(texts)} changed entities...")
+                encoded = np.asarray(self.embedder.encode(texts, show_progress_bar=len(texts) > 64, batch_size=64))
+                updated = [i for i, entity_id in enumerate(changed) if entity_id in self._entity_rows]
+                if updated:
+                    self.entity_embeddings[[self._entity_rows[changed[i]] for i in updated]] = encoded[updated]
+                added = [i for i, entity_id in enumerate(changed) if entity_id not in self._entity_rows]
+                if added:
+                    self.entity_embeddings = np.vstack([self.entity_embeddings, encoded[added]])
+                    for i in added:
+                        self._entity_rows[changed[i]] = len(self.entity_ids)
+                        self.entity_ids.append(changed[i])
+            
+            if removed or texts:
+                # Rebuilt in memory only: the saved index no longer matches and is rebuilt on next start
+                self._build_vector_index()
         
-        # Normalize for cosine similarity
-        normalized = self.entity_embeddings / np.linalg.norm(
-            self.entity_embeddings, axis=1, keepdims=True
-        )
-        self.faiss_index.add(normalized.astype('float32'))
+    def _build_vector_index(self):
+        """Build the vector index (FAISS, or numpy exact search) for similarity search."""
+        if self.entity_embeddings is None:
+            return
+        
+        # Normalized once here, so inner product = cosine similarity at query time
+        self.vector_index = build_vector_index(normalize_rows(self.entity_embeddings), self.index_type)
+        
+        print(f"✅ Built {self.vector_index.kind} {self.vector_index.index_type} index with {len(self.vector_index)} vectors")
         
-        print(f"✅ Built FAISS index with {self.faiss_index.ntotal} vectors")
+    def _get_gazetteer(self) -> Gazetteer:
+        """Entity name gazetteer over all graph entities (built on first use)."""
+        if self._gazetteer is None:
+            # Under the graph lock: changes made while it is built reach it through _on_graph_change
+            with self.kg.state_lock:
+                if self._gazetteer is None:
+                    self._gazetteer = Gazetteer(
+                        (entity_id, label) for entity_id, label, _ in self.kg._iter_nodes()
+                    )
+        return self._gazetteer
         
     def _init_entity_patterns(self):
         """Initialize regex patterns for entity extraction."""
@@ -227,7 +447,11 @@ class GraphRAG:
             ]
         }
         
-    def extract_entities(self, query: str) -> List[Dict]:
+    def extract_entities(
+        self,
+        query: str,
+        query_embedding: Union[np.ndarray, Callable[[], Optional[np.ndarray]], None] = None
+    ) -> List[Dict]:
         """
         Extract potential entities from a natural language query.
         
@@ -237,6 +461,10 @@ class GraphRAG:
         
         Args:
             query: User's question
+            query_embedding: Embedding from encode_query (computed if None), or a
+                callable returning it; the callable is only invoked for the semantic
+                step, so the encoder pass can overlap pattern / gazetteer matching
+                (a callable returning None skips the semantic step)
             
         Returns:
             List of extracted entities with types
@@ -340,95 +568,42 @@ class GraphRAG:
                             'score': results[0]['score']
                         })
         
-        # Method 5: Tìm tất cả nodes trong KG và check xem có trong query không (fuzzy match)
+        # Method 5: Tìm tất cả tên entity có trong query (gazetteer, một lần quét)
         # QUAN TRỌNG: Xử lý lowercase names như "jennie", "jisoo", "lisa"
-        # Lấy tất cả entity names từ KG (cached để tránh chậm)
-        if not hasattr(self, '_all_entity_names'):
-            self._all_entity_names = list(self.kg.graph.nodes())
-        
-        # Cache lowercase mapping để tìm nhanh hơn
-        # QUAN TRỌNG: Xử lý node có đuôi như "Lisa (ca sĩ)", "BLACKPINK (nhóm nhạc)"
-        if not hasattr(self, '_entity_lowercase_map'):
-            self._entity_lowercase_map = {}
-            self._entity_base_name_map = {}  # Map base name (không có đuôi) → full name
-            
-            for name in self._all_entity_names:
-                # Map full name lowercase
-                self._entity_lowercase_map[name.lower()] = name
-                
-                # Extract base name (remove suffixes như "(ca sĩ)", "(nhóm nhạc)")
-                base_name = self._normalize_entity_name(name)
-                if base_name != name:
-                    # Map base name → full name
-                    if base_name.lower() not in self._entity_base_name_map:
-                        self._entity_base_name_map[base_name.lower()] = []
-                    self._entity_base_name_map[base_name.lower()].append(name)
-        
-        query_words = query_lower.split()
-        # Tìm từng word trong query (case-insensitive)
-        for word in query_words:
-            if len(word) < 3:  # Skip short words
-                continue
-            
-            # Method 5a: Exact match (case-insensitive) - với full name
-            if word in self._entity_lowercase_map:
-                entity_name = self._entity_lowercase_map[word]
+        # và node có đuôi như "Lisa (ca sĩ)", "BLACKPINK (nhóm nhạc)"
+        # Aho-Corasick trên mọi tên (không giới hạn số entity), ưu tiên match dài nhất
+        method_scores = {
+            'exact': ('kg_lookup_fuzzy_exact', 0.9),
+            'base': ('kg_lookup_base_name', 0.95),  # High score vì match chính xác base name
+            'partial': ('kg_lookup_fuzzy_partial', 0.7)
+        }
+        # Giới hạn 5 entity từ gazetteer (không tính entity của các method trước,
+        # để tên đã match theo pattern vẫn được resolve sang node có đuôi)
+        gazetteer_found = 0
+        for mention in self._get_gazetteer().find(query):
+            if gazetteer_found >= 5:  # Đủ rồi
+                break
+            for entity_name in mention.entity_ids:
+                method, score = method_scores[mention.entity_kinds[entity_name]]
                 # Check xem đã có chưa
                 if not any(e['text'].lower() == entity_name.lower() for e in entities):
-                    entity_data = self.kg.get_entity(entity_name)
-                    if entity_data:
-                        entities.append({
-                            'text': entity_name,
-                            'type': entity_data.get('label', 'Unknown'),
-                            'method': 'kg_lookup_fuzzy_exact',
-                            'score': 0.9
-                        })
-                        if len(entities) >= 5:  # Đủ rồi
-                            break
-                    continue
-            
-            # Method 5a2: Match với base name (không có đuôi)
-            # Ví dụ: query "lisa" → match với "Lisa (ca sĩ)"
-            if word in self._entity_base_name_map:
-                for entity_name in self._entity_base_name_map[word]:
-                    if not any(e['text'].lower() == entity_name.lower() for e in entities):
-                        entity_data = self.kg.get_entity(entity_name)
-                        if entity_data:
-                            entities.append({
-                                'text': entity_name,
-                                'type': entity_data.get('label', 'Unknown'),
-                                'method': 'kg_lookup_base_name',
-                                'score': 0.95  # High score vì match chính xác base name
-                            })
-                            if len(entities) >= 5:  # Đủ rồi
-                                break
-            
-            # Method 5b: Partial match - word là substring của entity name (hoặc base name)
-            for entity_name in self._all_entity_names[:1000]:  # Limit để tránh chậm
-                entity_lower = entity_name.lower()
-                base_name = self._normalize_entity_name(entity_name).lower()
-                
-                # Check nếu word match với full name hoặc base name
-                if (word in entity_lower and len(word) >= 3) or (word in base_name and len(word) >= 3):
-                    # Check xem đã có chưa
-                    if not any(e['text'].lower() == entity_name.lower() for e in entities):
-                        entity_data = self.kg.get_entity(entity_name)
-                        if entity_data:
-                            # Chỉ thêm nếu là Artist hoặc Group (tránh false positives)
-                            entity_type = entity_data.get('label', '')
-                            if entity_type in ['Artist', 'Group', 'Company']:
-                                entities.append({
-                                    'text': entity_name,
-                                    'type': entity_type,
-                                    'method': 'kg_lookup_fuzzy_partial',
-                                    'score': 0.7
-                                })
-                                if len(entities) >= 5:  # Đủ rồi
-                                    break
+                    entities.append({
+                        'text': entity_name,
+                        'type': self.kg.get_entity_type(entity_name) or 'Unknown',
+                        'method': method,
+                        'score': score
+                    })
+                    gazetteer_found += 1
                     
         # 1c. Semantic similarity search (if available)
-        if self.embedder:
-            similar_entities = self.semantic_search(query, top_k=3)
+        if callable(query_embedding):
+            # None: encoding missed its deadline, không encode lại ở đây
+            query_embedding = query_embedding()
+            skip_semantic = query_embedding is None
+        else:
+            skip_semantic = False
+        if self.embedder and not skip_semantic:
+            similar_entities = self.semantic_search(query, top_k=3, query_embedding=query_embedding)
             for entity, score in similar_entities:
                 if score > 0.5:  # Threshold
                     entities.append({
@@ -497,13 +672,18 @@ class GraphRAG:
                     # Nếu LLM fail, fallback về pattern matching (an toàn)
                     pass
                     
-        # Deduplicate
-        seen = set()
+        # Deduplicate (không phân biệt hoa thường): text của pattern ("SEVENTEEN")
+        # nhường chỗ cho node cùng tên trong graph ("Seventeen")
+        seen = {}
         unique_entities = []
         for entity in entities:
-            if entity['text'] not in seen:
-                seen.add(entity['text'])
+            key = entity['text'].lower()
+            if key not in seen:
+                seen[key] = len(unique_entities)
                 unique_entities.append(entity)
+            elif (self.kg.get_entity_type(unique_entities[seen[key]]['text']) is None
+                  and self.kg.get_entity_type(entity['text']) is not None):
+                unique_entities[seen[key]] = entity
                 
         return unique_entities
     
@@ -647,13 +827,81 @@ Chỉ trả về JSON, không thêm text khác."""
         
         return []
         
-    def semantic_search(self, query: str, top_k: int = 5) -> List[Tuple[str, float]]:
+    def encode_query(self, query: str) -> Optional[np.ndarray]:
+        """
+        Unit-normalized query embedding, cached (LRU) by whitespace-normalized query.
+        
+        Args:
+            query: Search query
+            
+        Returns:
+            Read-only embedding vector, or None without an embedding model
+        """
+        if not self.embedder:
+            return None
+        key = ' '.join(query.split())
+        with self._query_cache_lock:
+            query_embedding = self._query_cache.get(key)
+            if query_embedding is not None:
+                self._query_cache.move_to_end(key)
+                return query_embedding
+        
+        query_embedding = self.embedder.encode([key])[0]
+        query_embedding = query_embedding / np.linalg.norm(query_embedding)
+        return self._remember_query(key, query_embedding)
+        
+    def encode_queries(self, queries: List[str], batch_size: int = 64) -> Optional[np.ndarray]:
+        """
+        Unit-normalized embeddings of several queries (see encode_query).
+        
+        Queries missing from the LRU cache are encoded together in batches.
+        
+        Args:
+            queries: Search queries
+            batch_size: Encoder batch size
+            
+        Returns:
+            (len(queries), dim) matrix in query order, or None without an embedding model
+        """
+        if not self.embedder:
+            return None
+        keys = [' '.join(query.split()) for query in queries]
+        embeddings = {}
+        with self._query_cache_lock:
+            for key in keys:
+                if key in self._query_cache:
+                    self._query_cache.move_to_end(key)
+                    embeddings[key] = self._query_cache[key]
+        missing = [key for key in dict.fromkeys(keys) if key not in embeddings]
+        if missing:
+            encoded = np.asarray(self.embedder.encode(
+                missing,
+                batch_size=batch_size,
+                show_progress_bar=len(missing) > batch_size
+            ))
+            encoded = encoded / np.linalg.norm(encoded, axis=1, keepdims=True)
+            for key, query_embedding in zip(missing, encoded):
+                embeddings[key] = self._remember_query(key, query_embedding.copy())
+        return np.stack([embeddings[key] for key in keys]) if keys else np.zeros((0, self.entity_embeddings.shape[1]), dtype=np.float32)
+        
+    def _remember_query(self, key: str, query_embedding: np.ndarray) -> np.ndarray:
+        """Put a normalized query embedding into the LRU cache (read-only)."""
+        query_embedding.setflags(write=False)
+        with self._query_cache_lock:
+            self._query_cache[key] = query_embedding
+            self._query_cache.move_to_end(key)
+            if len(self._query_cache) > self.QUERY_CACHE_SIZE:
+                self._query_cache.popitem(last=False)
+        return query_embedding
+        
+    def semantic_search(self, query: str, top_k: int = 5, query_embedding: Optional[np.ndarray] = None) -> List[Tuple[str, float]]:
         """
         Search entities by semantic similarity.
         
         Args:
             query: Search query
             top_k: Number of results
+            query_embedding: Embedding from encode_query (computed if None)
             
         Returns:
             List of (entity_id, score) tuples
@@ -661,34 +909,49 @@ Chỉ trả về JSON, không thêm text khác."""
         if not self.embedder:
             return []
             
-        # Encode query
-        query_embedding = self.embedder.encode([query])[0]
-        query_embedding = query_embedding / np.linalg.norm(query_embedding)
+        # Encode query (once per request: callers pass the embedding along)
+        if query_embedding is None:
+            query_embedding = self.encode_query(query)
         
-        if FAISS_AVAILABLE and self.faiss_index:
-            # Fast FAISS search
-            distances, indices = self.faiss_index.search(
-                query_embedding.reshape(1, -1).astype('float32'),
-                top_k
-            )
-            results = [
-                (self.entity_ids[idx], float(dist))
-                for idx, dist in zip(indices[0], distances[0])
-            ]
-        else:
-            # Numpy fallback
-            normalized = self.entity_embeddings / np.linalg.norm(
-                self.entity_embeddings, axis=1, keepdims=True
-            )
-            similarities = np.dot(normalized, query_embedding)
-            top_indices = np.argsort(similarities)[-top_k:][::-1]
-            results = [
-                (self.entity_ids[idx], float(similarities[idx]))
-                for idx in top_indices
-            ]
+        return self._search_embeddings(query_embedding.reshape(1, -1), top_k)[0]
+        
+    def semantic_search_batch(self, queries: List[str], top_k: int = 5, batch_size: int = 64) -> List[List[Tuple[str, float]]]:
+        """
+        Semantic search for many queries (evaluation, offline jobs).
+        
+        Queries are encoded in batches and searched as one stacked matrix
+        (one FAISS search / matrix product per chunk) instead of one call each.
+        
+        Args:
+            queries: Search queries
+            top_k: Number of results per query
+            batch_size: Encoder batch size
             
+        Returns:
+            (entity_id, score) lists, one per query in input order
+        """
+        if not self.embedder:
+            return [[] for _ in queries]
+        
+        query_matrix = self.encode_queries(queries, batch_size=batch_size)
+        results = []
+        # Chunk the similarity matrix (queries x entities) to bound memory
+        for start in range(0, len(queries), self.SEARCH_CHUNK_SIZE):
+            results.extend(self._search_embeddings(query_matrix[start:start + self.SEARCH_CHUNK_SIZE], top_k))
         return results
         
+    def _search_embeddings(self, query_matrix: np.ndarray, top_k: int) -> List[List[Tuple[str, float]]]:
+        """Top-k entities for each row of a matrix of normalized query embeddings."""
+        self._apply_pending_embeddings()
+        # Same generation of index and IDs even if another thread applies changes meanwhile
+        with self._embedding_lock:
+            vector_index, entity_ids = self.vector_index, self.entity_ids
+        scores, indices = vector_index.search(query_matrix, top_k)
+        return [
+            [(entity_ids[idx], float(score)) for idx, score in zip(row_indices, row_scores) if idx >= 0]
+            for row_indices, row_scores in zip(indices, scores)
+        ]
+        
     def retrieve_context(
         self,
         query: str,
@@ -712,7 +975,43 @@ Chỉ trả về JSON, không thêm text khác."""
             
         Returns:
             Context dictionary with entities, relationships, and facts
+            (a fresh copy on cache hits: safe to modify)
+            
+        With concurrent_retrieval, a stage that misses its STAGE_DEADLINES
+        entry is left out of the context (which is then not cached).
+        """
+        # Cache key: cùng câu hỏi (chuẩn hóa khoảng trắng) + tham số + phiên bản đồ thị
+        cache_key = (
+            ' '.join(query.split()), max_entities, max_hops, include_paths,
+            self.kg.graph_version,
+            self.embedder.name if self.embedder else None,
+            self.index_type,  # hnsw / ivfpq kết quả xấp xỉ, khác flat
+            self.llm_for_understanding is not None
+        )
+        context = self.result_cache.get(cache_key)
+        if context is not None:
+            context['query'] = query
+            return context
+        
+        context, missed_stages = self._retrieve_context(query, max_entities, max_hops, include_paths)
+        # Kết quả thiếu stage (quá deadline) không được cache
+        if not missed_stages:
+            self.result_cache.put(cache_key, context)
+        return context
+        
+    def _retrieve_context(self, query: str, max_entities: int, max_hops: int, include_paths: bool) -> Tuple[Dict, List[str]]:
+        """
+        retrieve_context without the result cache.
+        
+        Independent stages (query encoding / entity extraction / semantic
+        search, then path search / subgraph expansion) run as _run_stage
+        futures; their results are merged in a fixed order, so both modes return the same context
+        unless a stage misses its deadline.
+        
+        Returns:
+            (context, stages that missed their deadline)
         """
+        missed_stages: List[str] = []
         context = {
             'query': query,
             'entities': [],
@@ -729,8 +1028,31 @@ Chỉ trả về JSON, không thêm text khác."""
         # ============================================
         seed_entities = []
         
+        # Query được encode một lần cho cả request (extract_entities + semantic search).
+        # Ở concurrent mode encoder pass chạy song song với phần pattern / gazetteer của
+        # extraction; extraction chỉ chờ embedding khi tới bước semantic của nó
+        encoding = self._run_stage('encoding', self.encode_query, query) if self.embedder else None
+        
+        def wait_for_embedding() -> Optional[np.ndarray]:
+            # Chờ không quá deadline của encoding; quá hạn / bị hủy thì extraction bỏ bước semantic
+            try:
+                return self._await_stage(encoding)
+            except (FutureTimeoutError, CancelledError):
+                return None
+        
+        extraction = self._run_stage(
+            'extraction', self.extract_entities, query,
+            query_embedding=wait_for_embedding if encoding else None
+        )
+        query_embedding = self._stage_result(encoding, None, missed_stages) if encoding else None
+        
+        # Extraction và semantic search độc lập nhau (chạy song song ở concurrent mode)
+        semantic = None
+        if query_embedding is not None:
+            semantic = self._run_stage('semantic', self.semantic_search, query, top_k=max_entities, query_embedding=query_embedding)
+        
         # 1a. Pattern-based extraction (fallback nếu không có embeddings)
-        extracted = self.extract_entities(query)
+        extracted = self._stage_result(extraction, [], missed_stages)
         for entity_info in extracted[:max_entities]:
             entity_id = entity_info['text']
             if entity_id not in seen_entities:
@@ -738,8 +1060,8 @@ Chỉ trả về JSON, không thêm text khác."""
                 seen_entities.add(entity_id)
         
         # 1b. Semantic Search (ưu tiên - tìm node gần nhất bằng FAISS)
-        if self.embedder:
-            similar_entities = self.semantic_search(query, top_k=max_entities)
+        if semantic is not None:
+            similar_entities = self._stage_result(semantic, [], missed_stages)
             for entity_id, score in similar_entities:
                 if entity_id not in seen_entities and score > 0.5:  # Threshold
                     seed_entities.append((entity_id, score, 'semantic'))
@@ -749,6 +1071,15 @@ Chỉ trả về JSON, không thêm text khác."""
         seed_entities.sort(key=lambda x: (x[2] == 'semantic', x[1]), reverse=True)
         seed_entities = seed_entities[:max_entities]
         
+        # Path search giữa các seed chỉ cần seed: chạy song song với expand subgraph bên dưới
+        path_searches = []
+        if include_paths and len(seed_entities) >= 2:
+            for i in range(len(seed_entities) - 1):
+                for j in range(i + 1, min(i + 3, len(seed_entities))):
+                    path_searches.append(self._run_stage(
+                        'paths', self._find_seed_paths, seed_entities[i][0], seed_entities[j][0], max_hops
+                    ))
+        
         # ============================================
         # BƯỚC 2: EXPAND SUBGRAPH (multi-hop)
         # Từ node tìm được → mở rộng hàng xóm 1-2 hop → lấy subgraph liên quan
@@ -756,9 +1087,11 @@ Chỉ trả về JSON, không thêm text khác."""
         subgraph_entities = set()
         subgraph_relationships = []
         
+        # Mở rộng subgraph của tất cả seed cùng lúc (1-2 hop, frontier chung)
+        seed_contexts = self.kg.get_entity_context_many([entity_id for entity_id, _, _ in seed_entities], max_depth=max_hops)
+        
         for entity_id, relevance, method in seed_entities:
-            # Mở rộng subgraph từ entity này (1-2 hop)
-            entity_context = self.kg.get_entity_context(entity_id, max_depth=max_hops)
+            entity_context = seed_contexts[entity_id]
             
             if entity_context:
                 # Add main entity
@@ -841,21 +1174,9 @@ Chỉ trả về JSON, không thêm text khác."""
                 facts = self._generate_facts(entity_id, entity_data)
                 context['facts'].extend(facts)
         
-        # Find paths between seed entities (multi-hop paths trong subgraph)
-        if include_paths and len(seed_entities) >= 2:
-            for i in range(len(seed_entities) - 1):
-                for j in range(i + 1, min(i + 3, len(seed_entities))):
-                    source = seed_entities[i][0]
-                    target = seed_entities[j][0]
-                    paths = self.kg.find_all_paths(source, target, max_hops=max_hops)
-                    for path in paths[:3]:  # Limit paths
-                        path_details = self.kg.get_path_details(path)
-                        context['paths'].append({
-                            'from': source,
-                            'to': target,
-                            'path': path,
-                            'details': path_details
-                        })
+        # Find paths between seed entities (multi-hop paths trong subgraph), theo thứ tự cặp seed
+        for path_search in path_searches:
+            context['paths'].extend(self._stage_result(path_search, [], missed_stages))
                         
         # ============================================
         # BƯỚC 2.5: GRAPH RANKING (Module B)
@@ -863,7 +1184,112 @@ Chỉ trả về JSON, không thêm text khác."""
         # ============================================
         context = self._rank_and_filter_context(context, query)
         
-        return context
+        return context, missed_stages
+    
+    def _find_seed_paths(self, source: str, target: str, max_hops: int) -> List[Dict]:
+        """Up to 3 shortest paths between two seed entities, with details."""
+        # Chỉ lấy 3 path ngắn nhất (lazy, có time budget)
+        paths = self.kg.find_all_paths(
+            source, target, max_hops=max_hops,
+            limit=3, time_budget=self.kg.PATH_TIME_BUDGET
+        )
+        return [
+            {
+                'from': source,
+                'to': target,
+                'path': path,
+                'details': self.kg.get_path_details(path)
+            }
+            for path in paths
+        ]
+    
+    def _run_stage(self, stage: str, func, *args, **kwargs) -> _StageRun:
+        """
+        Start a retrieval stage.
+        
+        concurrent_retrieval: submitted to the thread pool; otherwise run
+        inline (exceptions are raised by _stage_result, as in concurrent mode).
+        The STAGE_DEADLINES budget starts when a worker picks the stage up,
+        so stages queued behind others (path searches) get their full budget.
+        """
+        if not self.concurrent_retrieval:
+            future = Future()
+            try:
+                future.set_result(func(*args, **kwargs))
+            except Exception as e:
+                future.set_exception(e)
+            return _StageRun(stage, future)
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.RETRIEVAL_WORKERS, thread_name_prefix='graphrag')
+                # Stop the workers if the GraphRAG is dropped without close()
+                self._executor_finalizer = weakref.finalize(self, self._executor.shutdown, wait=False)
+            executor = self._executor
+        run = _StageRun(stage, None, self.STAGE_DEADLINES[stage], time.monotonic())
+        
+        def start_stage():
+            run.started_at = time.monotonic()
+            run.started.set()
+            return func(*args, **kwargs)
+        
+        run.future = executor.submit(start_stage)
+        return run
+    
+    @staticmethod
+    def _await_stage(run: _StageRun) -> Any:
+        """
+        Result of a stage, waiting no longer than its deadline.
+        
+        A stage still queued one budget after submit (workers stuck on stages
+        that missed theirs) also counts as missed.
+        
+        Raises:
+            FutureTimeoutError: The stage missed its deadline
+            CancelledError: The stage was cancelled after missing it
+        """
+        if run.budget is None:
+            return run.future.result()
+        if not run.started.wait(timeout=max(0.0, run.submitted + run.budget - time.monotonic())):
+            raise FutureTimeoutError()
+        return run.future.result(timeout=max(0.0, run.started_at + run.budget - time.monotonic()))
+    
+    def _stage_result(self, run: _StageRun, default: Any, missed_stages: List[str]) -> Any:
+        """Result of a stage, or default (stage added to missed_stages) if it misses its deadline."""
+        try:
+            return self._await_stage(run)
+        except (FutureTimeoutError, CancelledError):
+            # Thread không dừng được: kết quả muộn bị bỏ qua
+            run.future.cancel()
+            if run.stage not in missed_stages:
+                missed_stages.append(run.stage)
+                print(f"⚠️ Retrieval stage '{run.stage}' missed its {self.STAGE_DEADLINES[run.stage]}s deadline")
+            return default
+    
+    def close(self):
+        """
+        Shut down the retrieval thread pool (concurrent_retrieval).
+        
+        Stages still running finish in the background; their results are
+        dropped. A later concurrent retrieval starts a new pool.
+        """
+        with self._executor_lock:
+            executor, self._executor = self._executor, None
+            if executor is not None:
+                self._executor_finalizer.detach()
+                executor.shutdown(wait=False, cancel_futures=True)
+    
+    def retrieval_cache_info(self) -> Dict[str, Any]:
+        """Hit / miss counters and size of the retrieve_context result cache."""
+        return self.result_cache.info()
+    
+    def set_token_counter(self, token_counter: Optional[Any]):
+        """
+        Count context tokens with the answering LLM's tokenizer.
+        
+        Args:
+            token_counter: text -> token count (e.g. SmallLLM.count_tokens; None: fast estimate)
+        """
+        self.context_packer.set_token_counter(token_counter)
     
     def _rank_and_filter_context(self, context: Dict, query: str) -> Dict:
         """
@@ -883,102 +1309,53 @@ Chỉ trả về JSON, không thêm text khác."""
             Filtered và ranked context
         """
         query_lower = query.lower()
+        features = self.kg.get_node_features()  # Degree / PageRank arrays, patched per mutation
+        
+        # 1. Rank relationships (triples) by relevance (vectorized over all triples)
+        relationships = context['relationships']
+        sources = [rel['source'] for rel in relationships]
+        targets = [rel['target'] for rel in relationships]
+        
+        # 1a. Similarity giữa node label với câu hỏi: entity names xuất hiện trong query
+        name_score = 0.3 * np.array([source.lower() in query_lower for source in sources], dtype=np.float64)
+        name_score += 0.3 * np.array([target.lower() in query_lower for target in targets], dtype=np.float64)
+        
+        # 1b. Độ quan trọng (degree - số lượng connections), normalize (0-0.2)
+        endpoint_degrees = features.degrees(sources + targets)
+        degree_score = np.minimum((endpoint_degrees[:len(sources)] + endpoint_degrees[len(sources):]) / 50.0, 0.2)
+        # PageRank so với node trung bình (0-0.1): cũng tính node chỉ có cạnh vào (công ty, thể loại)
+        endpoint_ranks = features.pagerank_ratios(sources + targets)
+        pagerank_score = np.minimum((endpoint_ranks[:len(sources)] + endpoint_ranks[len(sources):]) / 100.0, 0.1)
+        
+        # 1c. Loại quan hệ phù hợp với câu hỏi (keywords của query → relationship types)
+        boosted_types = {
+            rel_type for rel_type, keywords in self.REL_TYPE_KEYWORDS.items()
+            if any(keyword in query_lower for keyword in keywords)
+        }
+        type_score = 0.3 * np.array([rel['type'] in boosted_types for rel in relationships], dtype=np.float64)
         
-        # 1. Rank relationships (triples) by relevance
-        ranked_relationships = []
-        for rel in context['relationships']:
-            score = 0.0
-            
-            # 1a. Similarity giữa node label với câu hỏi
-            source = rel['source']
-            target = rel['target']
-            rel_type = rel['type']
-            
-            # Check if entity names appear in query
-            if source.lower() in query_lower:
-                score += 0.3
-            if target.lower() in query_lower:
-                score += 0.3
-            
-            # 1b. Độ quan trọng (degree - số lượng connections)
-            source_degree = len(list(self.kg.graph.neighbors(source))) if source in self.kg.graph else 0
-            target_degree = len(list(self.kg.graph.neighbors(target))) if target in self.kg.graph else 0
-            # Normalize degree score (0-0.2)
-            degree_score = min((source_degree + target_degree) / 50.0, 0.2)
-            score += degree_score
-            
-            # 1c. Loại quan hệ phù hợp với câu hỏi
-            # Map query keywords to relevant relationship types
-            rel_keywords = {
-                'MEMBER_OF': ['thành viên', 'member', 'nhóm', 'group', 'thuộc', 'belongs'],
-                'MANAGED_BY': ['công ty', 'company', 'hãng đĩa', 'label', 'quản lý', 'manage'],
-                'SINGS': ['hát', 'sing', 'bài hát', 'song', 'ca khúc'],
-                'RELEASED': ['phát hành', 'release', 'album', 'single'],
-                'COLLAB_WITH': ['hợp tác', 'collab', 'collaborate', 'cùng'],
-                'PRODUCED_BY': ['sản xuất', 'produce', 'producer']
-            }
-            
-            for rel_type_key, keywords in rel_keywords.items():
-                if rel_type == rel_type_key:
-                    for keyword in keywords:
-                        if keyword in query_lower:
-                            score += 0.3
-                            break
-            
-            ranked_relationships.append({
-                'relationship': rel,
-                'score': score
-            })
-        
-        # Sort by score và lọc top relationships
-        ranked_relationships.sort(key=lambda x: x['score'], reverse=True)
+        rel_scores = name_score + degree_score + pagerank_score + type_score
         # Giữ top 15 relationships có score > 0.1
-        filtered_relationships = [
-            item['relationship'] 
-            for item in ranked_relationships 
-            if item['score'] > 0.1
-        ][:15]
+        filtered_relationships = [relationships[i] for i in top_k_indices(rel_scores, 15, min_score=0.1)]
         
         # 2. Rank entities by relevance
-        ranked_entities = []
-        for entity in context['entities']:
-            score = entity.get('relevance', 0.0)
-            entity_id = entity['id']
-            
-            # Boost score nếu entity name xuất hiện trong query
-            if entity_id.lower() in query_lower:
-                score += 0.5
-            
-            # Boost score nếu entity type phù hợp với query
-            entity_type = entity.get('type', '')
-            type_keywords = {
-                'Group': ['nhóm', 'group', 'band'],
-                'Artist': ['ca sĩ', 'artist', 'singer', 'idol'],
-                'Song': ['bài hát', 'song', 'ca khúc'],
-                'Company': ['công ty', 'company', 'label', 'hãng đĩa']
-            }
-            
-            for type_key, keywords in type_keywords.items():
-                if entity_type == type_key:
-                    for keyword in keywords:
-                        if keyword in query_lower:
-                            score += 0.3
-                            break
-            
-            ranked_entities.append({
-                'entity': entity,
-                'score': score
-            })
+        entities = context['entities']
+        boosted_labels = {
+            entity_type for entity_type, keywords in self.ENTITY_TYPE_KEYWORDS.items()
+            if any(keyword in query_lower for keyword in keywords)
+        }
+        entity_scores = np.array([entity.get('relevance', 0.0) for entity in entities], dtype=np.float64)
+        # Boost score nếu entity name xuất hiện trong query
+        entity_scores += 0.5 * np.array([entity['id'].lower() in query_lower for entity in entities], dtype=np.float64)
+        # Boost score nếu entity type phù hợp với query
+        entity_scores += 0.3 * np.array([entity.get('type', '') in boosted_labels for entity in entities], dtype=np.float64)
         
-        # Sort entities by score
-        ranked_entities.sort(key=lambda x: x['score'], reverse=True)
         # QUAN TRỌNG: Giới hạn số lượng entities để tránh context quá lớn (1969 entities!)
-        # CHỈ LẤY TOP 20 ENTITIES - đủ để trả lời nhưng không quá nhiều
-        filtered_entities = [
-            item['entity'] 
-            for item in ranked_entities 
-            if item['score'] > 0.1  # Chỉ lấy entities có score > 0.1
-        ][:20]  # Tối đa 20 entities
+        # CHỈ LẤY TOP 20 ENTITIES có score > 0.1 - đủ để trả lời nhưng không quá nhiều
+        filtered_entities = []
+        for i in top_k_indices(entity_scores, 20, min_score=0.1):
+            entities[i]['rank_score'] = float(entity_scores[i])  # Relevance of context fragments (format_context_for_llm)
+            filtered_entities.append(entities[i])
         
         # 3. Filter facts (keep top 10 most relevant)
         facts = context['facts'][:10]
@@ -1031,7 +1408,7 @@ Chỉ trả về JSON, không thêm text khác."""
                 
         return facts
         
-    def format_context_for_llm(self, context: Dict, max_tokens: int = 20000) -> str:
+    def format_context_for_llm(self, context: Dict, max_tokens: Optional[int] = None) -> str:
         """
         BƯỚC 3: BUILD CONTEXT CHO LLM
         Chuyển subgraph → text/triples để feed vào mô hình 1B.
@@ -1041,85 +1418,84 @@ Chỉ trả về JSON, không thêm text khác."""
         
         Args:
             context: Retrieved context dictionary (từ subgraph expansion)
-            max_tokens: Maximum tokens for context (default 20000, leaving room for query + response)
+            max_tokens: Maximum tokens for context (default CONTEXT_TOKEN_BUDGET: what
+                the Qwen2-0.5B window leaves after the rest of the prompt and the answer)
             
         Returns:
             Formatted context string (text/triples format cho LLM)
         """
-        parts = []
+        if max_tokens is None:
+            max_tokens = self.CONTEXT_TOKEN_BUDGET
+        # Một thang điểm chung cho mọi fragment: trung bình điểm các entity mà fragment nối / nhắc tới
+        # (rank_score từ _rank_and_filter_context, hoặc relevance lúc retrieve; ngoài context = 0),
+        # nên triple giữa hai entity liên quan đứng trên triple tới một node lạ
+        entity_scores = {
+            entity['id']: entity.get('rank_score', entity.get('relevance', 0.0)) for entity in context['entities']
+        }
+        
+        def mentioned_score(entity_ids) -> float:
+            scores = [entity_scores.get(entity_id, 0.0) for entity_id in entity_ids]
+            return sum(scores) / len(scores) if scores else 0.0
         
         # ============================================
         # Format 1: Entities (Nodes trong subgraph)
         # ============================================
-        if context['entities']:
-            parts.append("=== THÔNG TIN THỰC THỂ (Từ Subgraph) ===")
-            # Sort by relevance và giới hạn số lượng
-            sorted_entities = sorted(context['entities'], key=lambda x: x.get('relevance', 0), reverse=True)
-            # Giới hạn: chỉ lấy top 10 entities quan trọng nhất
-            for entity in sorted_entities[:10]:
-                entity_str = f"\n📍 {entity['id']} (Loại: {entity['type']})"
-                if entity.get('method'):
-                    entity_str += f" [Tìm bằng: {entity['method']}]"
-                info = entity.get('info', {})
-                if info:
-                    # Giới hạn: chỉ lấy 3 fields quan trọng nhất
-                    for key, value in list(info.items())[:3]:
-                        if value:
-                            entity_str += f"\n  • {key}: {value}"
-                parts.append(entity_str)
-                
+        # Sort by relevance; mỗi entity là một fragment (tên, loại, vài fields info)
+        sorted_entities = sorted(context['entities'], key=lambda x: entity_scores[x['id']], reverse=True)
+        entity_items = []
+        for entity in sorted_entities:
+            entity_str = f"\n📍 {entity['id']} (Loại: {entity['type']})"
+            if entity.get('method'):
+                entity_str += f" [Tìm bằng: {entity['method']}]"
+            info = entity.get('info', {})
+            if info:
+                for key, value in list(info.items())[:self.CONTEXT_INFO_FIELDS]:
+                    if value:
+                        entity_str += f"\n  • {key}: {value}"
+            entity_items.append((entity_str, entity_scores[entity['id']]))
+            
         # ============================================
         # Format 2: Facts (Triples từ subgraph)
         # ============================================
-        if context['facts']:
-            parts.append("\n=== SỰ KIỆN (Triples từ Subgraph) ===")
-            # Giới hạn: chỉ lấy top 5 facts quan trọng nhất
-            for fact in context['facts'][:5]:
-                parts.append(f"• {fact}")
+        fact_items = [
+            (f"• {fact}", mentioned_score([entity_id for entity_id in entity_scores if entity_id in fact]))
+            for fact in context['facts']
+        ]
                 
         # ============================================
         # Format 3: Relationships (Edges trong subgraph - Triples format)
         # ============================================
-        if context['relationships']:
-            parts.append("\n=== MỐI QUAN HỆ (Edges trong Subgraph - Triples) ===")
-            seen_rels = set()
-            # Giới hạn: chỉ lấy top 10 relationships quan trọng nhất
-            for rel in context['relationships'][:10]:
-                rel_key = (rel['source'], rel['type'], rel['target'])
-                if rel_key not in seen_rels:
-                    seen_rels.add(rel_key)
-                    # Format as triple: (source, relationship, target)
-                    parts.append(f"• ({rel['source']}, {rel['type']}, {rel['target']})")
+        relationship_items = []
+        seen_rels = set()
+        for rel in context['relationships']:
+            rel_key = (rel['source'], rel['type'], rel['target'])
+            if rel_key not in seen_rels:
+                seen_rels.add(rel_key)
+                # Format as triple: (source, relationship, target)
+                relationship_items.append((
+                    f"• ({rel['source']}, {rel['type']}, {rel['target']})",
+                    mentioned_score((rel['source'], rel['target']))
+                ))
                     
         # ============================================
         # Format 4: Paths (Multi-hop paths trong subgraph)
         # ============================================
-        if context['paths']:
-            parts.append("\n=== ĐƯỜNG DẪN QUAN HỆ (Multi-hop Paths trong Subgraph) ===")
-            # Giới hạn: chỉ lấy top 3 paths quan trọng nhất
-            for path_info in context['paths'][:3]:
-                path = path_info['path']
-                path_str = " → ".join(path)
-                parts.append(f"• Path: {path_str}")
-                # Không thêm path details để giảm độ dài
-                
-        context_text = "\n".join(parts)
+        # Không thêm path details để giảm độ dài
+        path_items = [
+            (f"• Path: {' → '.join(path_info['path'])}", mentioned_score((path_info['path'][0], path_info['path'][-1])))
+            for path_info in context['paths']
+        ]
         
         # ============================================
-        # Truncate nếu quá dài (ước tính tokens)
+        # Đóng gói theo token budget (tokenizer của LLM hoặc ước lượng)
         # ============================================
-        # Ước tính: 1 token ≈ 4 characters (tiếng Việt)
-        max_chars = max_tokens * 4
-        if len(context_text) > max_chars:
-            # Truncate và thêm thông báo
-            context_text = context_text[:max_chars]
-            # Cắt ở dòng cuối cùng hoàn chỉnh
-            last_newline = context_text.rfind('\n')
-            if last_newline > max_chars * 0.9:  # Nếu có newline gần cuối
-                context_text = context_text[:last_newline]
-            context_text += "\n\n[... Context đã được rút gọn để phù hợp với giới hạn model ...]"
-        
-        return context_text
+        # Nếu quá dài: lấy các item có điểm cao nhất (mọi section) cho tới khi hết budget
+        return self.context_packer.pack([
+            ("=== THÔNG TIN THỰC THỂ (Từ Subgraph) ===", entity_items),
+            ("\n=== SỰ KIỆN (Triples từ Subgraph) ===", fact_items),
+            ("\n=== MỐI QUAN HỆ (Edges trong Subgraph - Triples) ===", relationship_items),
+            ("\n=== ĐƯỜNG DẪN QUAN HỆ (Multi-hop Paths trong Subgraph) ===", path_items)
+        ], max_tokens)
         
     def get_multi_hop_context(
         self,
@@ -1157,8 +1533,9 @@ Chỉ trả về JSON, không thêm text khác."""
             }
             
             # Get context for current entities
+            hop_contexts = self.kg.get_entity_context_many(current_entities[:3], max_depth=1)
             for entity_id in current_entities[:3]:
-                entity_context = self.kg.get_entity_context(entity_id, max_depth=1)
+                entity_context = hop_contexts[entity_id]
                 if entity_context:
                     hop_result['context'][entity_id] = entity_context
                     
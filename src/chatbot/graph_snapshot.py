@@ -0,0 +1,83 @@
+"""
+Knowledge Graph Snapshot Module
+
+Compiled warm-start snapshots for KpopKnowledgeGraph. A snapshot stores the
+fully built state (graph, cleaned-ID maps, entity / relationship / typed
+indices, the node attribute store and CSR arrays) in one binary file next to the source
+JSON, so later process starts skip json.load and all index building.
+
+A snapshot is only used when it was built from the same source content
+(SHA-256 of the JSON file) and with the same SNAPSHOT_VERSION; otherwise
+the graph is rebuilt from JSON and the snapshot is rewritten.
+"""
+
+import hashlib
+import os
+import pickle
+from typing import Dict, Optional, Any
+
+# Bump when the layout of the snapshot state changes
+SNAPSHOT_VERSION = 3
+
+
+def file_content_hash(path: str) -> str:
+    """SHA-256 hex digest of a file's content."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def default_snapshot_path(data_path: str) -> str:
+    """Snapshot path for a source JSON (data/x.json -> data/x.kgsnap)."""
+    return os.path.splitext(data_path)[0] + '.kgsnap'
+
+
+def save_snapshot(path: str, source_hash: str, state: Dict[str, Any]):
+    """
+    Write a snapshot atomically (temp file + rename).
+
+    Args:
+        path: Snapshot file path
+        source_hash: Content hash of the source JSON the state was built from
+        state: Knowledge graph state to store
+    """
+    payload = {
+        'version': SNAPSHOT_VERSION,
+        'source_hash': source_hash,
+        'state': state
+    }
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    try:
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def load_snapshot(path: str, source_hash: str) -> Optional[Dict[str, Any]]:
+    """
+    Load snapshot state if it is current.
+
+    Args:
+        path: Snapshot file path
+        source_hash: Content hash of the current source JSON
+
+    Returns:
+        Stored state, or None if the snapshot is missing, stale or unreadable
+    """
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'rb') as f:
+            payload = pickle.load(f)
+    except Exception:
+        return None
+    if not isinstance(payload, dict):
+        return None
+    if payload.get('version') != SNAPSHOT_VERSION or payload.get('source_hash') != source_hash:
+        return None
+    return payload.get('state')
@@ -5,12 +5,49 @@ This module builds and manages the knowledge graph from the merged K-pop data.
 It provides graph traversal, entity lookup, and relationship queries.
 """
 
+import functools
+import hashlib
 import json
+import threading
 import networkx as nx
-from typing import Dict, List, Tuple, Optional, Set, Any
+from typing import Dict, List, Tuple, Optional, Set, Any, Iterable, Iterator, Callable
 from collections import defaultdict
 import os
 
+try:
+    from .csr_graph import CSRGraph
+    from .graph_snapshot import file_content_hash, default_snapshot_path, load_snapshot, save_snapshot
+    from .mapped_graph import MappedGraph, default_mapped_path, open_mapped_graph, write_mapped_graph
+    from .search_index import EntitySearchIndex
+    from .name_index import NameIndex, compact_key, entity_name_keys, normalize_name, strip_name_prefix
+    from .path_search import bidirectional_shortest_path, iter_simple_paths
+    from .derived_relations import DerivedRelations
+    from .graph_changes import ChangeType, GraphChange
+    from .attribute_columns import AttributeColumns
+    from .node_features import NodeFeatures
+    from .attribute_store import AttributeStore, GRAPH_ATTRS, default_attributes_path
+except ImportError:  # Fallback for no-package context
+    from csr_graph import CSRGraph
+    from graph_snapshot import file_content_hash, default_snapshot_path, load_snapshot, save_snapshot
+    from mapped_graph import MappedGraph, default_mapped_path, open_mapped_graph, write_mapped_graph
+    from search_index import EntitySearchIndex
+    from name_index import NameIndex, compact_key, entity_name_keys, normalize_name, strip_name_prefix
+    from path_search import bidirectional_shortest_path, iter_simple_paths
+    from derived_relations import DerivedRelations
+    from graph_changes import ChangeType, GraphChange
+    from attribute_columns import AttributeColumns
+    from node_features import NodeFeatures
+    from attribute_store import AttributeStore, GRAPH_ATTRS, default_attributes_path
+
+
+def _holding_state_lock(method):
+    """Run a KpopKnowledgeGraph method while holding its state_lock."""
+    @functools.wraps(method)
+    def locked(self, *args, **kwargs):
+        with self.state_lock:
+            return method(self, *args, **kwargs)
+    return locked
+
 
 class KpopKnowledgeGraph:
     """
@@ -20,23 +57,267 @@ class KpopKnowledgeGraph:
     - Entity types: Group, Artist, Song, Album, Company, Genre, Occupation, Instrument
     - Relationship types: MEMBER_OF, SINGS, RELEASED, MANAGED_BY, SUBUNIT_OF, etc.
     - Multi-hop traversal and reasoning
+    
+    Storage engines:
+    - 'networkx': traversals walk the NetworkX DiGraph (default)
+    - 'csr': traversals use integer-ID CSR arrays (see csr_graph.CSRGraph);
+      self.graph is still built for callers that use it directly
+    - 'mmap': read-only CSR arrays and node attributes memory-mapped from
+      files shared by all worker processes (see mapped_graph); self.graph,
+      raw edges and Python indices are only materialized on first use
+    
+    Node attributes:
+    - Graph nodes only carry label and title; infobox, url, depth and
+      original_id live in an interned, columnar store (see attribute_store)
+      and are merged back by get_entity
+    - lazy_infobox=True moves infobox rows to a memory-mapped file that is
+      decoded on access
+    - The raw JSON nodes are not kept after the build: read nodes through
+      get_entity / get_entities_by_type / graph, which reflect mutations
+    
+    Warm start:
+    - The built state is saved to a binary snapshot next to the JSON
+      (see graph_snapshot) and reused while the JSON content hash matches
+    
+    Derived relations:
+    - Multi-hop company / labelmate / genre facts are materialized on first
+      use (see derived_relations); a mutation re-derives only the rows it reaches
+    - Infobox years and member counts are parsed once into sorted columns
+      (see attribute_columns) for year lookups and range / group-by queries
+    
+    Mutations:
+    - add_entity / update_entity / remove_entity / add_relationship /
+      remove_relationship update the graph and every index in place and
+      emit GraphChange events to subscribers (see graph_changes)
+    - Raw edges are keyed by (source, type, target), so removing one is O(1);
+      columns, node features and cached member lists are patched per event
+      (only the rows the change touches), not rebuilt
+    - CSR arrays are immutable: after a mutation traversals use self.graph
+      until refresh_engine() rebuilds them; the 'mmap' engine first detaches
+      into a per-process copy
+    - Mutations and the lazy builds that scan the whole graph (search / name
+      indices, derived tables, columns, node features) hold state_lock, so
+      readers on other threads never build from a half-applied change
+    
+    Versions (cache keys for downstream caches):
+    - graph_version: source JSON hash chained with every applied mutation,
+      equal across processes for the same source and mutation sequence
+    - version: number of mutations applied since load; get_entity_version /
+      get_changed_entities tell which entities changed after a given version
     """
     
-    def __init__(self, data_path: str = "data/korean_artists_graph_bfs.json"):
-        """Initialize knowledge graph from merged data."""
+    ENGINES = ('networkx', 'csr', 'mmap')
+    
+    # Built state stored in / restored from warm-start snapshots
+    SNAPSHOT_ATTRS = (
+        'metadata', 'edges', 'graph', 'attribute_store',
+        'original_to_cleaned', 'cleaned_to_original',
+        'entity_index', 'relationship_index', 'typed_index'
+    )
+    
+    # Default time budget (seconds) for path enumeration in interactive callers
+    PATH_TIME_BUDGET = 0.5
+    
+    # State the 'mmap' engine materializes on first access (see __getattr__)
+    LAZY_ATTRS = ('graph', 'edges', 'entity_index', 'relationship_index', 'typed_index', 'attribute_store')
+    
+    def __init__(
+        self,
+        data_path: str = "data/korean_artists_graph_bfs.json",
+        engine: str = 'networkx',
+        use_snapshot: bool = True,
+        snapshot_path: Optional[str] = None,
+        mapped_path: Optional[str] = None,
+        lazy_infobox: bool = False,
+        attributes_path: Optional[str] = None
+    ):
+        """
+        Initialize knowledge graph from merged data.
+        
+        Args:
+            data_path: Path to graph JSON
+            engine: Storage engine for traversals ('networkx', 'csr' or 'mmap')
+            use_snapshot: Load from / save to a warm-start snapshot
+            snapshot_path: Snapshot file (default: data_path with .kgsnap extension)
+            mapped_path: Mapped store directory for the 'mmap' engine
+                (default: data_path with .kgmap extension)
+            lazy_infobox: Keep infoboxes in a memory-mapped file instead of
+                process memory ('networkx' / 'csr' engines; 'mmap' always does)
+            attributes_path: Spilled infobox directory for lazy_infobox
+                (default: data_path with .kgattrs extension)
+        """
+        if engine not in self.ENGINES:
+            raise ValueError(f"Unknown graph engine: {engine} (expected one of {self.ENGINES})")
         self.data_path = data_path
+        self.engine = engine
+        self.use_snapshot = use_snapshot
+        self.snapshot_path = snapshot_path or default_snapshot_path(data_path)
+        self.source_hash: Optional[str] = None
+        self.state_lock = threading.RLock()  # Mutations / lazy full-graph builds (see class docstring)
+        self.csr: Optional[CSRGraph] = None
+        self.mapped: Optional[MappedGraph] = None
+        self.mapped_path = mapped_path or default_mapped_path(data_path)
+        self.lazy_infobox = lazy_infobox
+        self.attributes_path = attributes_path or default_attributes_path(data_path)
+        self._search_index: Optional[EntitySearchIndex] = None  # Built on first search
+        self._name_index: Optional[NameIndex] = None  # Built on first name lookup
+        self._derived = DerivedRelations(self)  # Tables built on first derived lookup
+        self._columns = AttributeColumns(self)  # Parsed years / member counts, built on first use
+        self._node_features = NodeFeatures(self)  # Degree / PageRank arrays for ranking, built on first use
+        self._group_members_cache: Dict[str, List[str]] = {}  # Resolved members per group
+        # Word / compact key of infobox member names -> entities listing them (built when a
+        # mutation has to find the cached member lists an entity could join or leave)
+        self._member_name_index: Optional[Dict[str, Set[str]]] = None
+        self._member_name_keys: Dict[str, Set[str]] = {}
+        self._subscribers: List[Callable[[GraphChange], None]] = []  # Mutation event callbacks
+        self.version = 0  # Mutations applied since load
+        self._version_hash: Optional[str] = None  # graph_version, computed on first use
+        self._entity_versions: Dict[str, int] = {}  # entity -> version of its last change
+        
+        if engine == 'mmap':
+            self._open_mapped()
+        else:
+            # Load and build graph (or warm start from a current snapshot)
+            self._init_state()
+            if not self._load_snapshot():
+                self._build_from_json()
+            if lazy_infobox:
+                self._spill_infoboxes()
+    
+    def __getattr__(self, name: str):
+        """
+        Materialize lazy state for the 'mmap' engine.
+        
+        Only called when normal attribute lookup fails, i.e. for LAZY_ATTRS that
+        a caller touches before they were built in this process.
+        """
+        mapped = self.__dict__.get('mapped')
+        if mapped is None or name not in self.LAZY_ATTRS:
+            raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'")
+        self._materialize(name)
+        return self.__dict__[name]
+    
+    def _init_state(self):
+        """Create empty containers for the built state."""
         self.graph = nx.DiGraph()
-        self.nodes: Dict[str, Dict] = {}
-        self.edges: List[Dict] = []
+        # Raw JSON edges keyed by (source, type, target) with cleaned IDs (see _key_edges)
+        self.edges: Dict[Tuple[str, str, str], Dict] = {}
+        self.attribute_store = AttributeStore()  # infobox / url / depth / original_id
         self.entity_index: Dict[str, Set[str]] = defaultdict(set)  # type -> entities
-        self.relationship_index: Dict[str, List[Tuple]] = defaultdict(list)  # type -> (src, tgt)
+        self.relationship_index: Dict[str, Set[Tuple]] = defaultdict(set)  # primary type -> (src, tgt)
+        # (rel_type, direction, neighbor_label) -> entity -> neighbors
+        self.typed_index: Dict[Tuple[str, str, Optional[str]], Dict[str, List[str]]] = {}
         self.original_to_cleaned: Dict[str, str] = {}  # Mapping from original ID to cleaned ID
         self.cleaned_to_original: Dict[str, str] = {}  # Mapping from cleaned ID to original ID (for reverse lookup if needed)
-        
-        # Load and build graph
-        self._load_data()
-        self._build_graph()
+    
+    def _build_from_json(self):
+        """Cold build: parse JSON, build graph and indices, save snapshot."""
+        # Raw JSON nodes duplicate the attribute store: only used for the build
+        nodes = self._load_data()
+        self._build_graph(nodes)
+        self.edges = self._key_edges(self.edges)
         self._build_indices()
+        if self.engine == 'csr':
+            self._build_csr()
+        if self.use_snapshot:
+            self._save_snapshot()
+    
+    def _spill_infoboxes(self):
+        """Move infobox rows to the memory-mapped attributes file (lazy_infobox)."""
+        if self.mapped is not None:
+            return  # Already read from the mapped store on access
+        self.source_hash = self.source_hash or file_content_hash(self.data_path)
+        try:
+            self.attribute_store.spill(self.attributes_path, self.source_hash)
+        except OSError as e:
+            print(f"⚠️ Could not spill infoboxes: {e}")
+            return
+        print(f"✅ Infoboxes of {len(self.attribute_store)} entities mapped from {self.attributes_path}")
+    
+    def _open_mapped(self):
+        """
+        Open the memory-mapped store for the 'mmap' engine.
+        
+        If the store is missing or was built from different JSON content, the
+        graph is built once in this process and the store is (re)written.
+        """
+        if not os.path.exists(self.data_path):
+            raise FileNotFoundError(f"Data file not found: {self.data_path}")
+        self.source_hash = file_content_hash(self.data_path)
+        
+        mapped = open_mapped_graph(self.mapped_path, self.source_hash)
+        if mapped is None:
+            self._init_state()
+            if not self._load_snapshot():
+                self._build_from_json()
+            try:
+                write_mapped_graph(self.mapped_path, self, self.source_hash)
+                print(f"✅ Wrote mapped store to {self.mapped_path}")
+            except OSError as e:
+                # Keep the in-process build and traverse it like the 'csr' engine
+                print(f"⚠️ Could not write mapped store: {e}")
+                if self.csr is None:
+                    self._build_csr()
+                return
+            # Drop the in-process copy; this worker reads the shared files like every other
+            for attr in self.LAZY_ATTRS:
+                self.__dict__.pop(attr, None)
+            mapped = open_mapped_graph(self.mapped_path, self.source_hash)
+        
+        self.mapped = mapped
+        self.csr = mapped.csr
+        self.metadata = mapped.metadata
+        self.original_to_cleaned = mapped.original_to_cleaned
+        self.cleaned_to_original = mapped.cleaned_to_original
+        print(f"✅ Opened mapped store {self.mapped_path}: {len(self.csr)} nodes and {self.csr.number_of_edges()} edges")
+    
+    def _materialize(self, name: str):
+        """Build one of LAZY_ATTRS in process memory from the mapped store."""
+        if name == 'entity_index':
+            entity_index = defaultdict(set)
+            for node_id, code in zip(self.csr.node_ids, self.csr.node_labels.tolist()):
+                entity_index[self.csr.label_names[code]].add(node_id)
+            self.entity_index = entity_index
+            return
+        
+        print(f"⚠️ Materializing '{name}' from mapped store (per-process copy)")
+        if name == 'graph':
+            self.graph = self.mapped.to_networkx()
+        elif name == 'edges':
+            self._load_data()
+            self.edges = self._key_edges(self.edges)
+        elif name == 'attribute_store':
+            self.attribute_store = AttributeStore.from_mapped(self.csr.node_ids, self.mapped.node_store)
+        else:
+            # relationship_index and typed_index are built together from the graph
+            self.relationship_index = defaultdict(set)
+            self.typed_index = {}
+            self._build_indices()
+    
+    def _has_node(self, entity_id: str) -> bool:
+        """Check if an ID (as stored in graph) exists."""
+        if self.mapped is not None:
+            return entity_id in self.csr
+        return entity_id in self.graph
+    
+    def _node_data(self, entity_id: str) -> Dict:
+        """Copy of the node attribute dict of an existing node."""
+        if self.mapped is not None:
+            return self.mapped.node_store.attributes(self.csr.node_index[entity_id])
+        data = dict(self.graph.nodes[entity_id])
+        data.update(self.attribute_store.attributes(entity_id))
+        return data
+    
+    def _iter_nodes(self):
+        """Iterate (node_id, label, title) over all nodes in graph order."""
+        if self.mapped is not None:
+            csr = self.csr
+            titles = self.mapped.node_store.titles
+            for i, code in enumerate(csr.node_labels.tolist()):
+                yield csr.node_ids[i], csr.label_names[code], titles[i]
+            return
+        for node_id, data in self.graph.nodes(data=True):
+            yield node_id, data.get('label'), data.get('title', node_id)
     
     def _clean_entity_id(self, entity_id: str) -> str:
         """
@@ -48,25 +329,8 @@ class KpopKnowledgeGraph:
         Returns:
             Cleaned entity ID without prefix
         """
-        # List of prefixes to remove
-        prefixes = [
-            'Genre_',
-            'Company_',
-            'Album_',
-            'Song_',
-            'Artist_',
-            'Group_',
-            'Occupation_',
-            'Instrument_'
-        ]
-        
-        cleaned_id = entity_id
-        for prefix in prefixes:
-            if cleaned_id.startswith(prefix):
-                cleaned_id = cleaned_id[len(prefix):]
-                break  # Only remove one prefix
-        
-        return cleaned_id
+        # Prefixes are shared with the name index (only one is removed)
+        return strip_name_prefix(entity_id)
     
     def _resolve_entity_id(self, entity_id: str) -> Optional[str]:
         """
@@ -79,23 +343,28 @@ class KpopKnowledgeGraph:
             Cleaned entity ID if exists in graph, None otherwise
         """
         # Try direct lookup first (might be cleaned ID)
-        if entity_id in self.graph:
+        if self._has_node(entity_id):
             return entity_id
         
         # Try mapping from original to cleaned
         cleaned_id = self.original_to_cleaned.get(entity_id)
-        if cleaned_id and cleaned_id in self.graph:
+        if cleaned_id and self._has_node(cleaned_id):
             return cleaned_id
         
         # Try cleaning the ID
         cleaned_id = self._clean_entity_id(entity_id)
-        if cleaned_id in self.graph:
+        if self._has_node(cleaned_id):
             return cleaned_id
         
         return None
         
-    def _load_data(self):
-        """Load merged K-pop data from JSON."""
+    def _load_data(self) -> Dict[str, Dict]:
+        """
+        Load merged K-pop data from JSON.
+        
+        Returns:
+            Raw JSON nodes, for _build_graph (not kept on the instance)
+        """
         if not os.path.exists(self.data_path):
             raise FileNotFoundError(f"Data file not found: {self.data_path}")
             
@@ -103,15 +372,53 @@ class KpopKnowledgeGraph:
             data = json.load(f)
             
         self.metadata = data.get('metadata', {})
-        self.nodes = data.get('nodes', {})
+        nodes = data.get('nodes', {})
         self.edges = data.get('edges', [])
         
-        print(f"✅ Loaded {len(self.nodes)} nodes and {len(self.edges)} edges")
+        print(f"✅ Loaded {len(nodes)} nodes and {len(self.edges)} edges")
+        return nodes
+    
+    def _load_snapshot(self) -> bool:
+        """
+        Restore built state from the warm-start snapshot.
+        
+        Returns:
+            True if a snapshot matching the current JSON content was loaded
+        """
+        if not self.use_snapshot:
+            return False
+        if not os.path.exists(self.data_path):
+            raise FileNotFoundError(f"Data file not found: {self.data_path}")
+        
+        self.source_hash = self.source_hash or file_content_hash(self.data_path)
+        state = load_snapshot(self.snapshot_path, self.source_hash)
+        if state is None:
+            return False
+        
+        for attr in self.SNAPSHOT_ATTRS:
+            setattr(self, attr, state[attr])
+        if self.engine == 'csr':
+            self.csr = CSRGraph.from_state(state['csr'])
+        
+        print(f"✅ Loaded snapshot {self.snapshot_path}: {self.graph.number_of_nodes()} nodes and {self.graph.number_of_edges()} edges")
+        return True
+    
+    def _save_snapshot(self):
+        """Save built state (including CSR arrays) to the warm-start snapshot."""
+        state = {attr: getattr(self, attr) for attr in self.SNAPSHOT_ATTRS}
+        # Always store CSR arrays so either engine can warm start from the snapshot
+        csr = self.csr if self.csr is not None else CSRGraph.from_networkx(self.graph)
+        state['csr'] = csr.to_state()
+        try:
+            save_snapshot(self.snapshot_path, self.source_hash, state)
+            print(f"✅ Saved snapshot to {self.snapshot_path}")
+        except OSError as e:
+            print(f"⚠️ Could not save snapshot: {e}")
         
-    def _build_graph(self):
-        """Build NetworkX graph from nodes and edges."""
+    def _build_graph(self, nodes: Dict[str, Dict]):
+        """Build NetworkX graph from raw JSON nodes and edges."""
         # Add nodes with cleaned IDs
-        for original_node_id, node_data in self.nodes.items():
+        for original_node_id, node_data in nodes.items():
             cleaned_node_id = self._clean_entity_id(original_node_id)
             
             # Store mapping
@@ -120,19 +427,7 @@ class KpopKnowledgeGraph:
             if cleaned_node_id not in self.cleaned_to_original:
                 self.cleaned_to_original[cleaned_node_id] = original_node_id
             
-            # Clean title if it contains prefix
-            title = node_data.get('title', original_node_id)
-            cleaned_title = self._clean_entity_id(title) if title == original_node_id else title
-            
-            self.graph.add_node(
-                cleaned_node_id,
-                label=node_data.get('label', 'Unknown'),
-                title=cleaned_title,
-                infobox=node_data.get('infobox', {}),
-                url=node_data.get('url', ''),
-                depth=node_data.get('depth', 0),
-                original_id=original_node_id  # Keep original ID for reference if needed
-            )
+            self._add_node(cleaned_node_id, self._node_attributes(original_node_id, node_data))
             
         # Add edges with cleaned IDs
         # Track edges to handle multiple relationship types between same nodes
@@ -183,6 +478,40 @@ class KpopKnowledgeGraph:
                 
         print(f"✅ Built graph with {self.graph.number_of_nodes()} nodes and {self.graph.number_of_edges()} edges (with cleaned IDs)")
         
+    def _key_edges(self, raw_edges: List[Dict]) -> Dict[Tuple[str, str, str], Dict]:
+        """
+        Raw JSON edges keyed by (source, type, target) with cleaned IDs, so a
+        relationship is found / removed in O(1). Repeated triples keep the first edge.
+        """
+        edges = {}
+        for edge in raw_edges:
+            key = (
+                self.original_to_cleaned.get(edge.get('source', ''), self._clean_entity_id(edge.get('source', ''))),
+                edge.get('type', 'RELATED'),
+                self.original_to_cleaned.get(edge.get('target', ''), self._clean_entity_id(edge.get('target', '')))
+            )
+            edges.setdefault(key, edge)
+        return edges
+        
+    def _node_attributes(self, original_node_id: str, node_data: Dict) -> Dict:
+        """Graph node attributes for a raw JSON node."""
+        # Clean title if it contains prefix
+        title = node_data.get('title', original_node_id)
+        cleaned_title = self._clean_entity_id(title) if title == original_node_id else title
+        return {
+            'label': node_data.get('label', 'Unknown'),
+            'title': cleaned_title,
+            'infobox': node_data.get('infobox', {}),
+            'url': node_data.get('url', ''),
+            'depth': node_data.get('depth', 0),
+            'original_id': original_node_id  # Keep original ID for reference if needed
+        }
+        
+    def _add_node(self, entity_id: str, attributes: Dict):
+        """Add / replace a node: label and title on the graph, the rest in the attribute store."""
+        self.graph.add_node(entity_id, **{key: attributes[key] for key in GRAPH_ATTRS if key in attributes})
+        self.attribute_store.put(entity_id, attributes)
+        
     def _build_indices(self):
         """Build lookup indices for fast retrieval."""
         # Entity type index
@@ -193,27 +522,42 @@ class KpopKnowledgeGraph:
         # Relationship type index
         for src, tgt, data in self.graph.edges(data=True):
             rel_type = data.get('type', 'RELATED')
-            self.relationship_index[rel_type].append((src, tgt))
+            self.relationship_index[rel_type].add((src, tgt))
+        
+        # Typed adjacency index for the typed accessors (get_group_songs, get_company_groups, ...)
+        # - Covers every type of multi-type edges, not only the primary 'type'
+        # - neighbor_label=None holds neighbors of any label
+        # - Neighbor lists keep graph adjacency order (same order as out_edges/in_edges)
+        for direction, adjacency in (('out', self.graph.succ), ('in', self.graph.pred)):
+            for node_id, neighbors in adjacency.items():
+                for neighbor, data in neighbors.items():
+                    neighbor_label = self.graph.nodes[neighbor].get('label')
+                    for rel_type in self._edge_types(data):
+                        for label in (None, neighbor_label):
+                            by_node = self.typed_index.setdefault((rel_type, direction, label), {})
+                            by_node.setdefault(node_id, []).append(neighbor)
             
         print(f"✅ Built indices for {len(self.entity_index)} entity types and {len(self.relationship_index)} relationship types")
+    
+    @staticmethod
+    def _edge_types(edge_data: Dict) -> List[str]:
+        """All relationship types of an edge (deduplicated, primary first)."""
+        rel_types = edge_data.get('types', [edge_data.get('type', 'RELATED')])
+        if not isinstance(rel_types, list):
+            rel_types = [rel_types]
+        return list(dict.fromkeys(rel_types))
+    
+    def _build_csr(self):
+        """Build CSR arrays used by the 'csr' engine."""
+        self.csr = CSRGraph.from_networkx(self.graph)
+        print(f"✅ Built CSR engine with {len(self.csr)} nodes and {len(self.csr.out_indices)} adjacency entries")
         
     def get_entity(self, entity_id: str) -> Optional[Dict]:
         """Get entity by ID (handles both original and cleaned IDs)."""
-        # Try direct lookup first (might be cleaned ID)
-        if entity_id in self.graph:
-            return dict(self.graph.nodes[entity_id])
-        
-        # Try mapping from original to cleaned
-        cleaned_id = self.original_to_cleaned.get(entity_id)
-        if cleaned_id and cleaned_id in self.graph:
-            return dict(self.graph.nodes[cleaned_id])
-        
-        # Try cleaning the ID
-        cleaned_id = self._clean_entity_id(entity_id)
-        if cleaned_id in self.graph:
-            return dict(self.graph.nodes[cleaned_id])
-        
-        return None
+        resolved_id = self._resolve_entity_id(entity_id)
+        if resolved_id is None:
+            return None
+        return self._node_data(resolved_id)
         
     def _has_relationship_type(self, edge_data: Dict, rel_type: str) -> bool:
         """
@@ -233,23 +577,69 @@ class KpopKnowledgeGraph:
         # Fallback to single 'type'
         return edge_data.get('type') == rel_type
     
-    def get_entity_type(self, entity_id: str) -> Optional[str]:
-        """Get entity type by ID (handles both original and cleaned IDs)."""
-        # Try direct lookup first (might be cleaned ID)
-        if entity_id in self.graph:
-            return self.graph.nodes[entity_id].get('label')
-        
-        # Try mapping from original to cleaned
-        cleaned_id = self.original_to_cleaned.get(entity_id)
-        if cleaned_id and cleaned_id in self.graph:
-            return self.graph.nodes[cleaned_id].get('label')
+    def _typed_neighbors(
+        self,
+        entity_id: str,
+        rel_type: str,
+        direction: str,
+        label: Optional[str] = None,
+        min_confidence: Optional[float] = None
+    ) -> List[str]:
+        """
+        Get neighbors connected through edges carrying a relationship type.
         
-        # Try cleaning the ID
-        cleaned_id = self._clean_entity_id(entity_id)
-        if cleaned_id in self.graph:
-            return self.graph.nodes[cleaned_id].get('label')
+        Served from typed_index, so cost is proportional to the answer size
+        (not to the entity's degree). The 'mmap' engine scans the entity's
+        CSR entries instead of building typed_index in every process.
         
-        return None
+        Args:
+            entity_id: Entity ID as stored in graph
+            rel_type: Relationship type to follow (e.g., 'SINGS', 'MEMBER_OF')
+            direction: 'out' (entity is source) or 'in' (entity is target)
+            label: Only keep neighbors of this entity type
+            min_confidence: Only keep edges with at least this confidence
+            
+        Returns:
+            Neighbor IDs in adjacency order, one per matching edge
+        """
+        if self.mapped is not None:
+            return self.csr.typed_neighbors(entity_id, rel_type, direction, label=label, min_confidence=min_confidence)
+        
+        neighbors = self.typed_index.get((rel_type, direction, label), {}).get(entity_id, [])
+        if min_confidence is None:
+            return list(neighbors)
+        
+        edge_confidence = []
+        for neighbor in neighbors:
+            edge = (entity_id, neighbor) if direction == 'out' else (neighbor, entity_id)
+            edge_confidence.append((neighbor, self.graph.edges[edge].get('confidence', 1.0)))
+        return [neighbor for neighbor, confidence in edge_confidence if confidence >= min_confidence]
+    
+    def get_entity_type(self, entity_id: str) -> Optional[str]:
+        """Get entity type by ID (handles both original and cleaned IDs)."""
+        resolved_id = self._resolve_entity_id(entity_id)
+        if resolved_id is None:
+            return None
+        if self.csr is not None:
+            return self.csr.get_label(resolved_id)
+        return self.graph.nodes[resolved_id].get('label')
+    
+    def get_entity_types_many(self, entity_ids: List[str]) -> Dict[str, Optional[str]]:
+        """Get entity types of several entities (same values as get_entity_type)."""
+        requested = list(dict.fromkeys(entity_ids))
+        resolved = [self._resolve_entity_id(entity_id) for entity_id in requested]
+        if self.csr is not None:
+            labels = self.csr.get_labels([r for r in resolved if r is not None])
+            labels = iter(labels)
+            return {
+                entity_id: next(labels) if resolved_id is not None else None
+                for entity_id, resolved_id in zip(requested, resolved)
+            }
+        nodes = self.graph.nodes
+        return {
+            entity_id: nodes[resolved_id].get('label') if resolved_id is not None else None
+            for entity_id, resolved_id in zip(requested, resolved)
+        }
     
     def extract_year_from_infobox(self, entity_id: str, year_type: str = 'activity', extract_first_year: bool = False) -> Optional[str]:
         """
@@ -261,62 +651,80 @@ class KpopKnowledgeGraph:
                 - 'activity': Năm hoạt động (for groups/artists)
                 - 'release': Phát hành (for songs/albums)
                 - 'founding': Năm thành lập (for companies)
+                - 'birth': Sinh (for artists)
             extract_first_year: If True, extract only the first year from range (e.g., "2016–nay" -> "2016")
         
         Returns:
             Year string (e.g., "2013–nay", "2021", "2016–2023") or first year only if extract_first_year=True
         """
-        entity = self.get_entity(entity_id)
-        if not entity:
+        # Parsed once per graph (see attribute_columns.parse_year)
+        resolved_id = self._resolve_entity_id(entity_id)
+        if resolved_id is None:
             return None
+        return self._columns.year_text(resolved_id, year_type, extract_first_year)
+    
+    def get_attribute(self, entity_id: str, column: str) -> Optional[int]:
+        """
+        Get a parsed numeric attribute of an entity.
         
-        infobox = entity.get('infobox', {})
-        if not infobox:
+        Args:
+            entity_id: Entity ID (original or cleaned)
+            column: 'debut_year', 'release_year', 'founding_year', 'birth_year' or 'member_count'
+        """
+        resolved_id = self._resolve_entity_id(entity_id)
+        if resolved_id is None:
             return None
+        return self._columns.column(column).get(resolved_id)
+    
+    def find_by_attribute_range(
+        self,
+        column: str,
+        low: Optional[int] = None,
+        high: Optional[int] = None,
+        entity_type: Optional[str] = None
+    ) -> List[Tuple[str, int]]:
+        """
+        Find entities whose attribute lies in [low, high] (bisect over a sorted column).
         
-        # Map year_type to infobox keys
-        key_mapping = {
-            'activity': 'Năm hoạt động',
-            'release': 'Phát hành',
-            'founding': 'Năm thành lập'
-        }
-        
-        key = key_mapping.get(year_type, 'Năm hoạt động')
-        year_str = infobox.get(key)
+        Example: find_by_attribute_range('debut_year', 2015, 2015, 'Group')
+        → groups that debuted in 2015
         
-        if not year_str:
-            return None
-        
-        import re
-        # Try to extract year from date format like "10 tháng 9 năm 2021"
-        year_match = re.search(r'(\d{4})', year_str)
-        if year_match:
-            # If it's a date format, return just the year
-            if 'tháng' in year_str or 'năm' in year_str:
-                return year_match.group(1)
-            
-            # If extract_first_year is True, return only the first year from range
-            if extract_first_year:
-                # Xử lý trường hợp có nhiều năm dính liền (ví dụ: "20122016–nay")
-                # Tìm tất cả các năm 4 chữ số
-                years_found = re.findall(r'\d{4}', year_str)
-                if len(years_found) > 1:
-                    # Kiểm tra xem có năm dính liền không
-                    first_year_pos = year_str.find(years_found[0])
-                    second_year_pos = year_str.find(years_found[1])
-                    distance = second_year_pos - first_year_pos
-                    # Nếu hai năm dính liền (khoảng cách 4 ký tự) và có dấu nối sau
-                    if 4 <= distance <= 5 and ('–' in year_str or '-' in year_str):
-                        # Với "ra mắt/debut", lấy năm cuối cùng trước dấu nối (thường là năm debut chính thức)
-                        # Ví dụ: "20122016–nay" → lấy "2016" (năm debut), không phải "2012"
-                        return years_found[-1] if years_found[-1] in year_str[:year_str.find('–' if '–' in year_str else '-')] else years_found[0]
-                # Trường hợp thông thường: lấy năm đầu tiên
-                return year_match.group(1)
+        Args:
+            column: Numeric column (see get_attribute)
+            low: Inclusive lower bound (None = unbounded)
+            high: Inclusive upper bound (None = unbounded)
+            entity_type: Only keep entities of this type
             
-            # Otherwise return the full range
-            return year_str
+        Returns:
+            (entity_id, value) tuples in ascending value order
+        """
+        return [
+            (entity_id, value) for value, entity_id in self._columns.column(column).range(low, high)
+            if not entity_type or self._columns.label(entity_id) == entity_type
+        ]
+    
+    def group_by_attribute(self, column: str, entity_type: Optional[str] = None) -> Dict[int, List[str]]:
+        """Group entities by a numeric attribute (value → entities, ascending values)."""
+        groups = {}
+        for value, entity_ids in self._columns.column(column).group_by().items():
+            if entity_type:
+                entity_ids = [e for e in entity_ids if self._columns.label(e) == entity_type]
+            if entity_ids:
+                groups[value] = entity_ids
+        return groups
+    
+    def get_entities_sharing_attribute(self, entity_id: str, column: str, entity_type: Optional[str] = None) -> List[str]:
+        """
+        Find other entities with the same attribute value as an entity.
         
-        return year_str
+        Example: get_entities_sharing_attribute('Jennie', 'debut_year', 'Artist')
+        → artists sharing a debut year with Jennie
+        """
+        value = self.get_attribute(entity_id, column)
+        if value is None:
+            return []
+        resolved_id = self._resolve_entity_id(entity_id)
+        return [e for e, _ in self.find_by_attribute_range(column, value, value, entity_type) if e != resolved_id]
         
     def get_entities_by_type(self, entity_type: str) -> Set[str]:
         """Get all entities of a specific type."""
@@ -336,12 +744,15 @@ class KpopKnowledgeGraph:
         """
         # Resolve entity_id to cleaned ID
         cleaned_entity_id = entity_id
-        if entity_id not in self.graph:
+        if not self._has_node(entity_id):
             cleaned_entity_id = self.original_to_cleaned.get(entity_id, self._clean_entity_id(entity_id))
         
-        if cleaned_entity_id not in self.graph:
+        if not self._has_node(cleaned_entity_id):
             return []
         
+        if self.csr is not None:
+            return self.csr.neighbors(cleaned_entity_id, direction)
+        
         neighbors = []
         
         if direction in ['out', 'both']:
@@ -365,6 +776,46 @@ class KpopKnowledgeGraph:
                     neighbors.append((source, rel_type, 'in'))
                 
         return neighbors
+    
+    def get_neighbors_many(self, entity_ids: List[str], direction: str = 'both') -> Dict[str, List[Tuple[str, str, str]]]:
+        """
+        Get neighbors of several entities (same tuples as get_neighbors).
+        
+        Each distinct ID is resolved once; the CSR engines gather all rows
+        with one vectorized index operation per direction.
+        
+        Returns:
+            Dict entity_id (as given) -> list of (neighbor_id, relationship_type, direction)
+        """
+        requested = list(dict.fromkeys(entity_ids))
+        resolved = [self._resolve_entity_id(entity_id) for entity_id in requested]
+        if self.csr is not None:
+            rows = self.csr.neighbors_many([r for r in resolved if r is not None], direction)
+            rows = iter(rows)
+            return {
+                entity_id: next(rows) if resolved_id is not None else []
+                for entity_id, resolved_id in zip(requested, resolved)
+            }
+        
+        succ, pred = self.graph.succ, self.graph.pred
+        
+        def edge_types(data: Dict) -> List[str]:
+            # One tuple per listed type, like get_neighbors (no deduplication)
+            rel_types = data.get('types', [data.get('type', 'RELATED')])
+            return rel_types if isinstance(rel_types, list) else [rel_types]
+        
+        results = {}
+        for entity_id, resolved_id in zip(requested, resolved):
+            neighbors = []
+            if resolved_id is not None:
+                if direction in ('out', 'both'):
+                    for target, data in succ[resolved_id].items():
+                        neighbors.extend((target, rel_type, 'out') for rel_type in edge_types(data))
+                if direction in ('in', 'both'):
+                    for source, data in pred[resolved_id].items():
+                        neighbors.extend((source, rel_type, 'in') for rel_type in edge_types(data))
+            results[entity_id] = neighbors
+        return results
         
     def get_relationships(self, entity_id: str) -> List[Dict]:
         """
@@ -379,12 +830,15 @@ class KpopKnowledgeGraph:
         """
         # Resolve entity_id to cleaned ID
         cleaned_entity_id = entity_id
-        if entity_id not in self.graph:
+        if not self._has_node(entity_id):
             cleaned_entity_id = self.original_to_cleaned.get(entity_id, self._clean_entity_id(entity_id))
         
-        if cleaned_entity_id not in self.graph:
+        if not self._has_node(cleaned_entity_id):
             return []
         
+        if self.csr is not None:
+            return self.csr.relationships(cleaned_entity_id)
+        
         relationships = []
         
         # Outgoing relationships
@@ -425,8 +879,30 @@ class KpopKnowledgeGraph:
             
         return relationships
         
-    def find_path(self, source: str, target: str, max_hops: int = 5) -> Optional[List[str]]:
-        """Find shortest path between two entities."""
+    def find_path(
+        self,
+        source: str,
+        target: str,
+        max_hops: int = 5,
+        rel_types: Optional[List[str]] = None,
+        node_labels: Optional[List[str]] = None,
+        undirected: bool = False
+    ) -> Optional[List[str]]:
+        """
+        Find shortest path between two entities (at most max_hops edges).
+        
+        Bidirectional BFS that stops after max_hops levels, so far-apart or
+        unreachable pairs do not cost a full graph traversal.
+        
+        Args:
+            source: Source entity
+            target: Target entity
+            max_hops: Maximum path length in edges
+            rel_types: Only follow edges with one of these relationship types
+            node_labels: Only pass through entities with one of these labels
+                (source and target are always allowed)
+            undirected: Ignore edge direction
+        """
         # Clean IDs if they contain prefixes
         cleaned_source = self._clean_entity_id(source)
         cleaned_target = self._clean_entity_id(target)
@@ -434,16 +910,74 @@ class KpopKnowledgeGraph:
         cleaned_source = self.original_to_cleaned.get(source, cleaned_source)
         cleaned_target = self.original_to_cleaned.get(target, cleaned_target)
         
-        try:
-            path = nx.shortest_path(self.graph, cleaned_source, cleaned_target)
-            if len(path) - 1 <= max_hops:
-                return path
-        except (nx.NetworkXNoPath, nx.NodeNotFound):
-            pass
-        return None
+        if self.csr is not None:
+            return self.csr.shortest_path(
+                cleaned_source, cleaned_target, max_hops=max_hops,
+                rel_types=rel_types, node_labels=node_labels, undirected=undirected
+            )
         
-    def find_all_paths(self, source: str, target: str, max_hops: int = 3) -> List[List[str]]:
-        """Find all simple paths between two entities (up to max_hops)."""
+        if cleaned_source not in self.graph or cleaned_target not in self.graph:
+            return None
+        allowed = None
+        if node_labels is not None:
+            allowed = lambda node: self.graph.nodes[node].get('label') in node_labels
+        successors, predecessors = self._neighbor_functions(rel_types, undirected)
+        return bidirectional_shortest_path(
+            cleaned_source, cleaned_target, successors, predecessors,
+            max_hops=max_hops, allowed=allowed
+        )
+    
+    def _neighbor_functions(self, rel_types: Optional[List[str]] = None, undirected: bool = False):
+        """
+        (successors, predecessors) functions over the NetworkX graph for path search.
+        
+        Args:
+            rel_types: Only follow edges carrying one of these types (None = all)
+            undirected: Follow edges in both directions (successors first)
+        """
+        succ, pred = self.graph.succ, self.graph.pred
+        if rel_types is None:
+            forward = lambda node: succ[node]
+            backward = lambda node: pred[node]
+        else:
+            wanted = set(rel_types)
+            
+            def carries(data: Dict) -> bool:
+                types = data.get('types', [data.get('type', 'RELATED')])
+                return not wanted.isdisjoint(types if isinstance(types, list) else [types])
+            
+            forward = lambda node: [n for n, data in succ[node].items() if carries(data)]
+            backward = lambda node: [n for n, data in pred[node].items() if carries(data)]
+        if undirected:
+            both = lambda node: list(dict.fromkeys([*forward(node), *backward(node)]))
+            return both, both
+        return forward, backward
+        
+    def iter_paths(
+        self,
+        source: str,
+        target: str,
+        max_hops: int = 3,
+        limit: Optional[int] = None,
+        time_budget: Optional[float] = None,
+        rel_types: Optional[List[str]] = None,
+        undirected: bool = False
+    ) -> Iterator[List[str]]:
+        """
+        Lazily yield simple paths between two entities, shortest first.
+        
+        Meets in the middle from both endpoints (see path_search.iter_simple_paths),
+        so hub-to-hub pairs do not enumerate every path before the first is used.
+        
+        Args:
+            source: Source entity
+            target: Target entity
+            max_hops: Maximum path length in edges
+            limit: Stop after this many paths
+            time_budget: Stop after this many seconds
+            rel_types: Only follow edges with one of these relationship types
+            undirected: Ignore edge direction
+        """
         # Clean IDs if they contain prefixes
         cleaned_source = self._clean_entity_id(source)
         cleaned_target = self._clean_entity_id(target)
@@ -451,12 +985,46 @@ class KpopKnowledgeGraph:
         cleaned_source = self.original_to_cleaned.get(source, cleaned_source)
         cleaned_target = self.original_to_cleaned.get(target, cleaned_target)
         
-        try:
-            paths = list(nx.all_simple_paths(self.graph, cleaned_source, cleaned_target, cutoff=max_hops))
-            return paths
-        except (nx.NetworkXNoPath, nx.NodeNotFound):
-            return []
-            
+        if self.csr is not None:
+            yield from self.csr.simple_paths(
+                cleaned_source, cleaned_target, max_hops, limit=limit,
+                time_budget=time_budget, rel_types=rel_types, undirected=undirected
+            )
+            return
+        
+        if cleaned_source not in self.graph or cleaned_target not in self.graph:
+            return
+        successors, predecessors = self._neighbor_functions(rel_types, undirected)
+        yield from iter_simple_paths(
+            cleaned_source, cleaned_target, successors, predecessors, max_hops,
+            limit=limit, time_budget=time_budget
+        )
+    
+    def find_all_paths(
+        self,
+        source: str,
+        target: str,
+        max_hops: int = 3,
+        limit: Optional[int] = None,
+        time_budget: Optional[float] = None,
+        rel_types: Optional[List[str]] = None
+    ) -> List[List[str]]:
+        """
+        Find simple paths between two entities (up to max_hops), shortest first.
+        
+        Args:
+            source: Source entity
+            target: Target entity
+            max_hops: Maximum path length in edges
+            limit: Maximum number of paths (None = all)
+            time_budget: Stop searching after this many seconds
+            rel_types: Only follow edges with one of these relationship types
+        """
+        return list(self.iter_paths(
+            source, target, max_hops=max_hops, limit=limit,
+            time_budget=time_budget, rel_types=rel_types
+        ))
+    
     def get_path_details(self, path: List[str]) -> List[Dict]:
         """Get detailed information about a path."""
         details = []
@@ -470,52 +1038,116 @@ class KpopKnowledgeGraph:
             
             if i < len(path) - 1:
                 # Get edge to next node
-                edge_data = self.graph.get_edge_data(node, path[i + 1])
-                if edge_data:
-                    step['relationship_to_next'] = edge_data.get('type', 'RELATED')
+                if self.csr is not None:
+                    rel_type = self.csr.edge_type(node, path[i + 1])
+                    if rel_type is not None:
+                        step['relationship_to_next'] = rel_type
+                else:
+                    edge_data = self.graph.get_edge_data(node, path[i + 1])
+                    if edge_data:
+                        step['relationship_to_next'] = edge_data.get('type', 'RELATED')
                     
             details.append(step)
         return details
         
     def search_entities(self, query: str, entity_type: Optional[str] = None, limit: int = 10) -> List[Dict]:
-        """Search entities by name/title."""
+        """
+        Search entities by name/title.
+        
+        Scores: 1.0 exact ID/title match, 0.8 substring match of the cleaned
+        query, 0.7 substring match of the raw query (e.g. with prefix).
+        Ties keep graph order. Served from the search index, so cost depends
+        on the number of matches rather than the number of nodes.
+        """
         # Clean query to remove prefixes for better matching
         cleaned_query = self._clean_entity_id(query)
-        query_lower = query.lower()
-        cleaned_query_lower = cleaned_query.lower()
-        results = []
+        index = self._get_search_index()
         
-        for node_id, data in self.graph.nodes(data=True):
-            # Filter by type if specified
-            if entity_type and data.get('label') != entity_type:
-                continue
-                
-            # Check if query matches (try both original query and cleaned query)
-            title = data.get('title', node_id).lower()
-            node_id_lower = node_id.lower()
-            
-            # Match with cleaned IDs (nodes in graph now use cleaned IDs)
-            if cleaned_query_lower in title or cleaned_query_lower in node_id_lower:
-                score = 1.0 if (cleaned_query_lower == title or cleaned_query_lower == node_id_lower) else 0.8
+        # Match with cleaned IDs (nodes in graph now use cleaned IDs)
+        exact = index.exact(cleaned_query)
+        matched = index.containing(cleaned_query)
+        # Also try matching with original query (in case user searches with prefix)
+        prefixed = set()
+        if query.lower() != cleaned_query.lower():
+            prefixed = index.containing(query) - matched
+        
+        results = []
+        for score, entity_ids in ((1.0, exact), (0.8, matched - exact), (0.7, prefixed)):
+            for node_id in index.ordered(entity_ids):
+                label = index.label(node_id)
+                # Filter by type if specified
+                if entity_type and label != entity_type:
+                    continue
                 results.append({
                     'id': node_id,  # Return cleaned ID (as stored in graph)
-                    'type': data.get('label'),
-                    'title': data.get('title', node_id),
-                    'score': score
-                })
-            # Also try matching with original query (in case user searches with prefix)
-            elif query_lower in title or query_lower in node_id_lower:
-                score = 0.7  # Lower score for prefix matches
-                results.append({
-                    'id': node_id,
-                    'type': data.get('label'),
-                    'title': data.get('title', node_id),
+                    'type': label,
+                    'title': index.title(node_id),
                     'score': score
                 })
-                
-        # Sort by score and return top results
-        results.sort(key=lambda x: x['score'], reverse=True)
+                if len(results) == limit:
+                    return results
         return results[:limit]
+    
+    def lookup_name(self, name: str, entity_type: Optional[str] = None) -> List[str]:
+        """
+        All entities a name can refer to, best first (see name_index.NameIndex).
+        
+        Handles prefixes, parenthetical suffixes, Vietnamese diacritics,
+        hyphen/space variants and manual aliases, e.g. "lisa" -> "Lisa (ca sĩ)",
+        "jang won young" -> "Jang Won-young", "yg" -> "YG Entertainment".
+        
+        Args:
+            name: Entity name in any spelling
+            entity_type: Only return entities with this label
+        """
+        return self._get_name_index().lookup(name, entity_type)
+    
+    def resolve_name(self, name: str, entity_type: Optional[str] = None) -> Optional[str]:
+        """Best entity ID for a name in any spelling (see lookup_name), or None."""
+        return self._get_name_index().resolve(name, entity_type)
+    
+    def lookup_name_words(self, name: str, entity_type: Optional[str] = None) -> List[str]:
+        """
+        Entities having every word of name in one of their names, in graph order
+        (see name_index.NameIndex.lookup_words), e.g. "won young" -> "Jang Won-young".
+        
+        Args:
+            name: Part of an entity name in any spelling
+            entity_type: Only return entities with this label
+        """
+        return self._get_name_index().lookup_words(name, entity_type)
+    
+    def find_by_prefix(self, prefix: str, entity_type: Optional[str] = None, limit: Optional[int] = None) -> List[str]:
+        """
+        Entities whose ID or title starts with prefix (case-insensitive), in graph order.
+        
+        Args:
+            prefix: Name prefix
+            entity_type: Only return entities with this label
+            limit: Maximum number of results
+        """
+        index = self._get_search_index()
+        matches = [
+            entity_id for entity_id in index.with_prefix(prefix)
+            if not entity_type or index.label(entity_id) == entity_type
+        ]
+        return matches[:limit] if limit is not None else matches
+    
+    def _get_name_index(self) -> NameIndex:
+        """Build the normalized name index on first use."""
+        if self._name_index is None:
+            with self.state_lock:
+                if self._name_index is None:
+                    self._name_index = NameIndex(self._iter_nodes())
+        return self._name_index
+    
+    def _get_search_index(self) -> EntitySearchIndex:
+        """Build the entity search index on first use."""
+        if self._search_index is None:
+            with self.state_lock:
+                if self._search_index is None:
+                    self._search_index = EntitySearchIndex(self._iter_nodes())
+        return self._search_index
         
     def get_subgraph(self, entity_ids: List[str], include_neighbors: bool = True) -> nx.DiGraph:
         """Extract a subgraph containing specified entities."""
@@ -536,54 +1168,76 @@ class KpopKnowledgeGraph:
         1. First try to get from infobox (most accurate)
         2. Fallback to MEMBER_OF edges (filtered by type and confidence)
         """
-        # Clean group_name if it contains prefix
-        cleaned_group_name = self._clean_entity_id(group_name)
-        if group_name not in self.graph:
-            cleaned_group_name = self.original_to_cleaned.get(group_name, cleaned_group_name)
-        group_name_to_use = cleaned_group_name if cleaned_group_name in self.graph else group_name
+        return self.get_group_members_many([group_name])[group_name]
+    
+    def get_group_members_many(self, group_names: List[str]) -> Dict[str, List[str]]:
+        """
+        Get members of several groups (same strategy as get_group_members).
         
-        # Try to get from infobox first (most accurate)
+        Infobox member names that are not node IDs are resolved through the
+        name index: first by normalized name ("Yoon Doo-joon", "V (ca sĩ)"),
+        then by whole words when only one artist matches ("Sana" ->
+        "Minatozaki Sana"). Resolved members
+        are cached per group until the graph changes.
+        
+        Returns:
+            Dict group_name (as given) -> member IDs
+        """
+        results = {}
+        cache = self._group_members_cache
+        for group_name in dict.fromkeys(group_names):
+            # Clean group_name if it contains prefix
+            cleaned_group_name = self._clean_entity_id(group_name)
+            if not self._has_node(group_name):
+                cleaned_group_name = self.original_to_cleaned.get(group_name, cleaned_group_name)
+            group_name_to_use = cleaned_group_name if self._has_node(cleaned_group_name) else group_name
+            
+            members = cache.get(group_name_to_use)
+            if members is None:
+                version = self.version
+                members = self._infobox_members(group_name_to_use) or self._edge_members(group_name_to_use)
+                with self.state_lock:
+                    # Not cached if a mutation ran meanwhile (it may have evicted this group already)
+                    if self.version == version:
+                        cache[group_name_to_use] = members
+            results[group_name] = list(members)
+        return results
+    
+    def _infobox_members(self, group_name_to_use: str) -> List[str]:
+        """Members listed in the group infobox (format: "Jin, Suga, J-Hope, ...")."""
         group_data = self.get_entity(group_name_to_use)
-        if group_data and group_data.get('infobox'):
-            infobox = group_data['infobox']
-            members_str = infobox.get('Thành viên', '')
-            if members_str and members_str.strip():
-                # Parse members from infobox (format: "Jin, Suga, J-Hope, ...")
-                members_list = [m.strip() for m in members_str.split(',') if m.strip()]
-                if members_list:
-                    # Try to match with actual entities in graph
-                    matched_members = []
-                    for member_name in members_list:
-                        # Try exact match first
-                        if member_name in self.graph:
-                            if self.get_entity_type(member_name) == 'Artist':
-                                matched_members.append(member_name)
-                        else:
-                            # Try fuzzy match (remove suffixes like "(ca sĩ)", "(rapper)")
-                            base_name = member_name.split('(')[0].strip()
-                            for node_id in self.graph.nodes():
-                                if base_name.lower() in node_id.lower() or node_id.lower() in base_name.lower():
-                                    if self.get_entity_type(node_id) == 'Artist':
-                                        matched_members.append(node_id)
-                                        break
-                    if matched_members:
-                        return matched_members
-        
-        # Fallback: Get from MEMBER_OF edges (with strict filtering)
+        if not group_data or not group_data.get('infobox'):
+            return []
+        members_str = group_data['infobox'].get('Thành viên', '')
+        members = []
+        for member_name in (m.strip() for m in members_str.split(',') if m.strip()):
+            # Try exact match first
+            if self._has_node(member_name):
+                if self.get_entity_type(member_name) == 'Artist':
+                    members.append(member_name)
+                continue
+            # Normalized name (suffix, diacritics, hyphens)
+            matches = self.lookup_name(member_name, 'Artist')
+            if matches:
+                members.append(matches[0])
+                continue
+            # Stage name inside a full name ("Sana" -> "Minatozaki Sana"), only if unambiguous
+            matches = self._get_name_index().lookup_words(member_name, 'Artist')
+            if len(matches) == 1:
+                members.append(matches[0])
+        return members
+    
+    def _edge_members(self, group_name_to_use: str) -> List[str]:
+        """Members from MEMBER_OF edges (with strict filtering)."""
         members = []
-        if group_name_to_use in self.graph:
-            for source, _, data in self.graph.in_edges(group_name_to_use, data=True):
-                if self._has_relationship_type(data, 'MEMBER_OF'):
-                    # Only include if source is actually an Artist
-                    source_type = self.get_entity_type(source)
-                    if source_type == 'Artist':
-                        # Check confidence if available
-                        confidence = data.get('confidence', 1.0)
-                        if confidence >= 0.7:  # Stricter threshold
-                            # Exclude obvious non-members (check if name looks like a member name)
-                            # Members usually don't have suffixes like "(Album)", "(Song)", etc.
-                            if '(' not in source or any(kw in source.lower() for kw in ['rapper', 'ca sĩ', 'singer']):
-                                members.append(source)
+        if self._has_node(group_name_to_use):
+            # Only include Artists, with stricter confidence threshold
+            candidates = self._typed_neighbors(group_name_to_use, 'MEMBER_OF', 'in', label='Artist', min_confidence=0.7)
+            for source in candidates:
+                # Exclude obvious non-members (check if name looks like a member name)
+                # Members usually don't have suffixes like "(Album)", "(Song)", etc.
+                if '(' not in source or any(kw in source.lower() for kw in ['rapper', 'ca sĩ', 'singer']):
+                    members.append(source)
 
         # Deduplicate members that represent the same person, e.g. "Jennie" và "Jennie (ca sĩ)"
         if members:
@@ -610,74 +1264,38 @@ class KpopKnowledgeGraph:
         
     def get_artist_groups(self, artist_name: str) -> List[str]:
         """Get all groups an artist belongs to."""
-        groups = []
-        for _, target, data in self.graph.out_edges(artist_name, data=True):
-            if self._has_relationship_type(data, 'MEMBER_OF'):
-                groups.append(target)
-        return groups
+        return self._typed_neighbors(artist_name, 'MEMBER_OF', 'out')
         
     def get_group_songs(self, group_name: str) -> List[str]:
         """Get all songs by a group."""
-        songs = []
         # Check in_edges: Song → SINGS → Group
-        for source, _, data in self.graph.in_edges(group_name, data=True):
-            if self._has_relationship_type(data, 'SINGS'):
-                songs.append(source)
+        songs = self._typed_neighbors(group_name, 'SINGS', 'in')
         # Also check out_edges: Group → SINGS → Song (if direction is reversed)
-        for _, target, data in self.graph.out_edges(group_name, data=True):
-            if self._has_relationship_type(data, 'SINGS'):
-                songs.append(target)
+        songs += self._typed_neighbors(group_name, 'SINGS', 'out')
         return list(set(songs))  # Remove duplicates
     
     def get_song_groups(self, song_name: str) -> List[str]:
         """Get all groups that performed a song."""
-        groups = []
         # Check out_edges: Song → SINGS → Group (if Song is source)
-        for _, target, data in self.graph.out_edges(song_name, data=True):
-            if self._has_relationship_type(data, 'SINGS'):
-                target_type = self.get_entity_type(target)
-                if target_type == 'Group':
-                    groups.append(target)
+        groups = self._typed_neighbors(song_name, 'SINGS', 'out', label='Group')
         # Check in_edges: Group → SINGS → Song (if Group is source)
-        for source, _, data in self.graph.in_edges(song_name, data=True):
-            if self._has_relationship_type(data, 'SINGS'):
-                source_type = self.get_entity_type(source)
-                if source_type == 'Group':
-                    groups.append(source)
+        groups += self._typed_neighbors(song_name, 'SINGS', 'in', label='Group')
         return list(set(groups))  # Remove duplicates
     
     def get_song_artists(self, song_name: str) -> List[str]:
         """Get all artists that performed a song."""
-        artists = []
         # Check out_edges: Song → SINGS → Artist (if Song is source)
-        for _, target, data in self.graph.out_edges(song_name, data=True):
-            if self._has_relationship_type(data, 'SINGS'):
-                target_type = self.get_entity_type(target)
-                if target_type == 'Artist':
-                    artists.append(target)
+        artists = self._typed_neighbors(song_name, 'SINGS', 'out', label='Artist')
         # Check in_edges: Artist → SINGS → Song (if Artist is source)
-        for source, _, data in self.graph.in_edges(song_name, data=True):
-            if self._has_relationship_type(data, 'SINGS'):
-                source_type = self.get_entity_type(source)
-                if source_type == 'Artist':
-                    artists.append(source)
+        artists += self._typed_neighbors(song_name, 'SINGS', 'in', label='Artist')
         return list(set(artists))  # Remove duplicates
     
     def get_album_groups(self, album_name: str) -> List[str]:
         """Get all groups that released an album."""
-        groups = []
         # Check in_edges: Group → RELEASED → Album (if Group is source)
-        for source, _, data in self.graph.in_edges(album_name, data=True):
-            if self._has_relationship_type(data, 'RELEASED'):
-                source_type = self.get_entity_type(source)
-                if source_type == 'Group':
-                    groups.append(source)
+        groups = self._typed_neighbors(album_name, 'RELEASED', 'in', label='Group')
         # Check out_edges: Album → RELEASED → Group (if Album is source - less common)
-        for _, target, data in self.graph.out_edges(album_name, data=True):
-            if self._has_relationship_type(data, 'RELEASED'):
-                target_type = self.get_entity_type(target)
-                if target_type == 'Group':
-                    groups.append(target)
+        groups += self._typed_neighbors(album_name, 'RELEASED', 'out', label='Group')
         return list(set(groups))  # Remove duplicates
     
     def get_song_albums(self, song_name: str) -> List[str]:
@@ -690,13 +1308,8 @@ class KpopKnowledgeGraph:
         Returns:
             List of album entity IDs
         """
-        albums = []
         # Check in_edges: Album → CONTAINS → Song (Album is source, Song is target)
-        for source, _, data in self.graph.in_edges(song_name, data=True):
-            if self._has_relationship_type(data, 'CONTAINS'):
-                source_type = self.get_entity_type(source)
-                if source_type == 'Album':
-                    albums.append(source)
+        albums = self._typed_neighbors(song_name, 'CONTAINS', 'in', label='Album')
         # Also check infobox
         song_data = self.get_entity(song_name)
         if song_data and song_data.get('infobox'):
@@ -707,12 +1320,12 @@ class KpopKnowledgeGraph:
                 album_entity = album_info
                 if album_entity not in albums:
                     # Check if it exists in graph
-                    if album_entity in self.graph:
+                    if self._has_node(album_entity):
                         albums.append(album_entity)
                     else:
                         # Try to find by name
-                        for node, data in self.graph.nodes(data=True):
-                            if data.get('label') == 'Album' and album_entity.lower() in node.lower():
+                        for node, label, _ in self._iter_nodes():
+                            if label == 'Album' and album_entity.lower() in node.lower():
                                 if node not in albums:
                                     albums.append(node)
                                 break
@@ -720,19 +1333,10 @@ class KpopKnowledgeGraph:
     
     def get_album_artists(self, album_name: str) -> List[str]:
         """Get all artists that released an album."""
-        artists = []
         # Check in_edges: Artist → RELEASED → Album (if Artist is source)
-        for source, _, data in self.graph.in_edges(album_name, data=True):
-            if self._has_relationship_type(data, 'RELEASED'):
-                source_type = self.get_entity_type(source)
-                if source_type == 'Artist':
-                    artists.append(source)
+        artists = self._typed_neighbors(album_name, 'RELEASED', 'in', label='Artist')
         # Check out_edges: Album → RELEASED → Artist (if Album is source - less common)
-        for _, target, data in self.graph.out_edges(album_name, data=True):
-            if self._has_relationship_type(data, 'RELEASED'):
-                target_type = self.get_entity_type(target)
-                if target_type == 'Artist':
-                    artists.append(target)
+        artists += self._typed_neighbors(album_name, 'RELEASED', 'out', label='Artist')
         return list(set(artists))  # Remove duplicates
         
     def get_group_company(self, group_name: str) -> Optional[str]:
@@ -742,30 +1346,84 @@ class KpopKnowledgeGraph:
     
     def get_group_companies(self, group_name: str) -> List[str]:
         """Get ALL companies managing a group (a group can have multiple companies)."""
-        companies = []
-        for _, target, data in self.graph.out_edges(group_name, data=True):
-            if self._has_relationship_type(data, 'MANAGED_BY'):
-                companies.append(target)
-        return companies
+        return self._typed_neighbors(group_name, 'MANAGED_BY', 'out')
     
     def get_artist_companies(self, artist_name: str) -> List[str]:
         """Get ALL companies managing an artist directly (Artist → Company)."""
-        companies = []
-        for _, target, data in self.graph.out_edges(artist_name, data=True):
-            if self._has_relationship_type(data, 'MANAGED_BY'):
-                # Check if target is a Company
-                if self.get_entity_type(target) == 'Company':
-                    companies.append(target)
-        return companies
+        return self._typed_neighbors(artist_name, 'MANAGED_BY', 'out', label='Company')
         
     def get_company_groups(self, company_name: str) -> List[str]:
         """Get all groups under a company."""
-        groups = []
-        for source, _, data in self.graph.in_edges(company_name, data=True):
-            if self._has_relationship_type(data, 'MANAGED_BY'):
-                if self.get_entity_type(source) == 'Group':
-                    groups.append(source)
-        return groups
+        return self._typed_neighbors(company_name, 'MANAGED_BY', 'in', label='Group')
+    
+    def get_entity_companies(self, entity_id: str) -> List[str]:
+        """
+        Get ALL companies of an artist or group (materialized, see derived_relations).
+        
+        Artist: direct companies + companies of its groups (1-hop + 2-hop).
+        Group: its own companies.
+        """
+        return self._derived.lookup('companies', entity_id)
+    
+    def get_companies_via_group(self, artist_name: str) -> List[str]:
+        """Get companies of an artist's groups (2-hop: Artist → MEMBER_OF → Group → MANAGED_BY → Company)."""
+        return self._derived.lookup('companies_via_group', artist_name)
+    
+    def get_labelmates(self, entity_id: str) -> List[str]:
+        """
+        Get groups under the same companies as an artist/group (3-hop).
+        
+        An artist's companies are taken through its groups; the entity itself is excluded.
+        """
+        return self._derived.lookup('labelmates', entity_id)
+    
+    def get_song_companies(self, song_name: str) -> List[str]:
+        """Get companies of a song's performers (Song → Group / Artist → Company)."""
+        return self._derived.lookup('song_companies', song_name)
+    
+    def get_entity_genres(self, entity_id: str) -> List[str]:
+        """Get genres of an artist/group/song/album (1-hop: Entity → IS_GENRE → Genre)."""
+        return self._derived.lookup('genres', entity_id)
+    
+    def get_genres_via_group(self, artist_name: str) -> List[str]:
+        """Get genres of an artist's groups (2-hop: Artist → MEMBER_OF → Group → IS_GENRE → Genre)."""
+        return self._derived.lookup('genres_via_group', artist_name)
+        
+    def get_all_entity_ids(self) -> List[str]:
+        """Get all entity IDs (cleaned, as stored in graph) in graph order."""
+        if self.mapped is not None:
+            return list(self.csr.node_ids)
+        return list(self.graph.nodes())
+    
+    def get_degree(self, entity_id: str, direction: str = 'out') -> int:
+        """
+        Count distinct neighbors of an entity (0 if it does not exist).
+        
+        Args:
+            entity_id: Entity ID (as stored in graph)
+            direction: 'out', 'in', or 'both'
+        """
+        if not self._has_node(entity_id):
+            return 0
+        if self.csr is not None:
+            i = self.csr.node_index[entity_id]
+            if direction == 'both':
+                return len(set(self.csr._adjacent(i)) | set(self.csr._adjacent(i, reverse=True)))
+            return len(self.csr._adjacent(i, reverse=(direction == 'in')))
+        if direction == 'both':
+            return len(set(self.graph.successors(entity_id)) | set(self.graph.predecessors(entity_id)))
+        if direction == 'in':
+            return self.graph.in_degree(entity_id)
+        return self.graph.out_degree(entity_id)
+    
+    def get_node_features(self) -> NodeFeatures:
+        """
+        Degree / typed degree / PageRank arrays for ranking (see node_features).
+        
+        Built once on first use (under state_lock), then patched per mutation.
+        """
+        self._node_features._ensure_built()
+        return self._node_features
         
     def get_statistics(self) -> Dict:
         """Get graph statistics."""
@@ -791,7 +1449,7 @@ class KpopKnowledgeGraph:
         
         Returns entity info, relationships, and connected entities.
         """
-        if entity_id not in self.graph:
+        if not self._has_node(entity_id):
             return {}
             
         entity_data = self.get_entity(entity_id)
@@ -822,6 +1480,463 @@ class KpopKnowledgeGraph:
             'relationships': relationships,
             'connected_entities': connected_entities
         }
+    
+    def get_entity_context_many(self, entity_ids: List[str], max_depth: int = 2) -> Dict[str, Dict]:
+        """
+        Get get_entity_context() for several entities at once.
+        
+        The BFS levels of all entities advance together: each level fetches
+        the neighbors of the union of their frontiers with one
+        get_neighbors_many call (a node shared by several neighborhoods is
+        expanded once), and connected entity types are looked up in bulk.
+        
+        Returns:
+            Dict entity_id -> context ({} for unknown entities)
+        """
+        contexts = {entity_id: {} for entity_id in entity_ids}
+        starts = [entity_id for entity_id in contexts if self._has_node(entity_id)]
+        
+        # entity -> (visited, current level, connected entities)
+        states = {entity_id: ({entity_id}, [entity_id], {}) for entity_id in starts}
+        neighbor_cache: Dict[str, List[Tuple[str, str, str]]] = {}
+        for depth in range(max_depth):
+            frontier = [node for entity_id in starts for node in states[entity_id][1] if node not in neighbor_cache]
+            if frontier:
+                neighbor_cache.update(self.get_neighbors_many(frontier))
+            for entity_id in starts:
+                visited, current_level, connected_entities = states[entity_id]
+                next_level = []
+                for node in current_level:
+                    for neighbor, rel_type, direction in neighbor_cache[node]:
+                        if neighbor not in visited:
+                            visited.add(neighbor)
+                            next_level.append(neighbor)
+                            connected_entities[neighbor] = {
+                                'type': None,  # Filled in below
+                                'depth': depth + 1,
+                                'relationship': rel_type
+                            }
+                states[entity_id] = (visited, next_level, connected_entities)
+        
+        all_connected = [node for entity_id in starts for node in states[entity_id][2]]
+        types = self.get_entity_types_many(all_connected)
+        for entity_id in starts:
+            connected_entities = states[entity_id][2]
+            for neighbor, info in connected_entities.items():
+                info['type'] = types[neighbor]
+            contexts[entity_id] = {
+                'entity': self.get_entity(entity_id),
+                'relationships': self.get_relationships(entity_id),
+                'connected_entities': connected_entities
+            }
+        return contexts
+        
+    def subscribe(self, callback: Callable[[GraphChange], None]):
+        """Call callback(change) after every applied mutation."""
+        if callback not in self._subscribers:
+            self._subscribers.append(callback)
+    
+    def unsubscribe(self, callback: Callable[[GraphChange], None]):
+        """Stop sending mutation events to callback."""
+        if callback in self._subscribers:
+            self._subscribers.remove(callback)
+    
+    def _emit(self, change: GraphChange, member_groups: Iterable[str] = ()):
+        """
+        Publish an applied mutation: version, built state, then subscribers.
+        
+        Args:
+            change: The mutation
+            member_groups: Groups whose member list the change may alter, found
+                by the caller before the change (see _groups_naming)
+        """
+        self._advance_version(change)
+        self._apply_change(change, set(member_groups))
+        for callback in list(self._subscribers):
+            callback(change)
+    
+    def _apply_change(self, change: GraphChange, member_groups: Set[str]):
+        """Patch the lazily built state (member lists, columns, node features) for one mutation."""
+        if change.is_entity_change:
+            entity_id = change.entity_id
+            member_groups.add(entity_id)  # Its own infobox member list
+            if self._member_name_index is not None:
+                self._index_member_names(entity_id)
+            if change.change_type == ChangeType.ENTITY_ADDED and self._tracks_members():
+                member_groups |= self._groups_naming(entity_id)
+        elif change.rel_type == 'MEMBER_OF':
+            member_groups.add(change.target)
+        for group in member_groups:
+            self._group_members_cache.pop(group, None)
+        self._columns.update(change.entity_ids if change.is_entity_change else (), member_groups)
+        self._node_features.apply(change)
+        self._derived.apply(change)
+    
+    def _tracks_members(self) -> bool:
+        """Whether any member list is cached (member lists / member_count column)."""
+        return bool(self._group_members_cache) or 'member_count' in self._columns.columns
+    
+    def _groups_naming(self, entity_id: str) -> Set[str]:
+        """
+        Entities whose infobox member list has a name that could resolve to entity_id.
+        
+        Over-approximates _infobox_members matching: any shared word or
+        compact key of the entity's name keys (ID, title, aliases).
+        """
+        index = self._get_member_name_index()
+        title = self.graph.nodes[entity_id].get('title', entity_id) if self._has_node(entity_id) else entity_id
+        groups = set()
+        for key in entity_name_keys(entity_id, None, title):
+            for word in key.split() + [compact_key(key)]:
+                groups.update(index.get(word, ()))
+        return groups
+    
+    def _get_member_name_index(self) -> Dict[str, Set[str]]:
+        if self._member_name_index is None:
+            self._member_name_index = defaultdict(set)
+            self._member_name_keys = {}
+            for entity_id, _, _ in self._iter_nodes():
+                self._index_member_names(entity_id)
+        return self._member_name_index
+    
+    def _index_member_names(self, entity_id: str):
+        """(Re-)index the infobox member names of an entity in _member_name_index."""
+        for key in self._member_name_keys.pop(entity_id, ()):
+            self._member_name_index[key].discard(entity_id)
+        if not self._has_node(entity_id):
+            return
+        members_str = (self._node_data(entity_id).get('infobox') or {}).get('Thành viên', '')
+        keys = set()
+        for member_name in (m.strip() for m in members_str.split(',') if m.strip()):
+            key = normalize_name(member_name)
+            keys.update(key.split())
+            keys.add(compact_key(key))
+        for key in keys:
+            self._member_name_index[key].add(entity_id)
+        if keys:
+            self._member_name_keys[entity_id] = keys
+    
+    @property
+    def graph_version(self) -> str:
+        """
+        Content version of the graph (hex digest).
+        
+        The source JSON hash while unchanged; every mutation chains it with
+        the change and the data it wrote. Caches that store this value are
+        current exactly when it still equals kg.graph_version.
+        """
+        if self._version_hash is None:
+            self.source_hash = self.source_hash or file_content_hash(self.data_path)
+            self._version_hash = self.source_hash
+        return self._version_hash
+    
+    def _advance_version(self, change: GraphChange):
+        """Bump version / graph_version and stamp the changed entities."""
+        payload = [self.graph_version, change.change_type.value, change.entity_id, change.source, change.target, change.rel_type]
+        if change.change_type in (ChangeType.ENTITY_ADDED, ChangeType.ENTITY_UPDATED):
+            payload.append(self._node_data(change.entity_id))
+        elif change.change_type == ChangeType.RELATIONSHIP_ADDED:
+            payload.append(dict(self.graph.edges[change.source, change.target]))
+        encoded = json.dumps(payload, ensure_ascii=False, sort_keys=True, default=str).encode('utf-8')
+        self._version_hash = hashlib.sha256(encoded).hexdigest()
+        self.version += 1
+        for entity_id in change.entity_ids:
+            self._entity_versions[entity_id] = self.version
+    
+    def get_entity_version(self, entity_id: str) -> int:
+        """
+        Version at which an entity was last added / updated / removed or had
+        a relationship change (0: unchanged since load).
+        """
+        resolved_id = self._resolve_entity_id(entity_id)
+        return self._entity_versions.get(resolved_id or self._clean_entity_id(entity_id), 0)
+    
+    def get_changed_entities(self, since_version: int) -> Set[str]:
+        """Entities changed after since_version (including removed ones)."""
+        return {entity_id for entity_id, version in self._entity_versions.items() if version > since_version}
+    
+    def _require_entity(self, entity_id: str) -> str:
+        """Resolve an entity ID (original or cleaned) or raise KeyError."""
+        resolved_id = self._resolve_entity_id(entity_id)
+        if resolved_id is None:
+            raise KeyError(f"Entity not found: {entity_id}")
+        return resolved_id
+    
+    def _prepare_mutation(self):
+        """Make the built state writable before changing it."""
+        if self.mapped is not None:
+            # The mapped store is shared and read-only: continue on a per-process copy
+            print("⚠️ Detaching from mapped store for mutations (per-process copy)")
+            for name in self.LAZY_ATTRS:
+                getattr(self, name)
+            self.original_to_cleaned = dict(self.original_to_cleaned)
+            self.cleaned_to_original = dict(self.cleaned_to_original)
+            self.mapped = None
+        # CSR arrays are immutable: traversals use self.graph until refresh_engine()
+        # (columns, node features, derived relations and member lists are patched per change in _apply_change)
+        self.csr = None
+    
+    @_holding_state_lock
+    def refresh_engine(self):
+        """
+        Rebuild CSR arrays after mutations ('csr' and 'mmap' engines).
+        
+        Call once after applying a batch of changes; until then traversals
+        fall back to the NetworkX graph (same results, slower).
+        """
+        if self.engine != 'networkx' and self.csr is None:
+            self._build_csr()
+    
+    def _index_names(self, entity_id: str):
+        """Add / re-index an entity in the search and name indices (if built)."""
+        data = self.graph.nodes[entity_id]
+        label = data.get('label')
+        title = data.get('title', entity_id)
+        if self._search_index is not None:
+            self._search_index.add(entity_id, label, title)
+        if self._name_index is not None:
+            self._name_index.add(entity_id, label, title)
+    
+    def _update_typed_index(self, source: str, target: str, rel_types: List[str], add: bool):
+        """Add or remove one edge's entries in typed_index (both directions)."""
+        for direction, node_id, neighbor in (('out', source, target), ('in', target, source)):
+            neighbor_label = self.graph.nodes[neighbor].get('label')
+            for rel_type in rel_types:
+                for label in (None, neighbor_label):
+                    if add:
+                        by_node = self.typed_index.setdefault((rel_type, direction, label), {})
+                        by_node.setdefault(node_id, []).append(neighbor)
+                        continue
+                    by_node = self.typed_index.get((rel_type, direction, label), {})
+                    neighbors = by_node.get(node_id)
+                    if neighbors and neighbor in neighbors:
+                        neighbors.remove(neighbor)
+                        if not neighbors:
+                            del by_node[node_id]
+    
+    def _drop_edge_entries(self, source: str, target: str, primary: str, removed: List[str]):
+        """Remove types of one edge from typed_index, relationship_index and edges."""
+        self._update_typed_index(source, target, removed, add=False)
+        if primary in removed:
+            self.relationship_index.get(primary, set()).discard((source, target))
+        for rel_type in removed:
+            self.edges.pop((source, rel_type, target), None)
+    
+    def _original_id(self, entity_id: str) -> str:
+        return self.attribute_store.original_id(entity_id)
+    
+    @_holding_state_lock
+    def add_entity(
+        self,
+        entity_id: str,
+        label: str,
+        title: Optional[str] = None,
+        infobox: Optional[Dict] = None,
+        url: str = '',
+        depth: int = 0
+    ) -> str:
+        """
+        Add a new entity.
+        
+        Args:
+            entity_id: Original entity ID (e.g., "Group_BTS"); prefixes are cleaned like in the JSON build
+            label: Entity type (e.g., 'Group', 'Artist')
+            title: Display title (default: entity_id)
+            infobox: Infobox fields
+            url: Source URL
+            depth: Crawl depth
+            
+        Returns:
+            Cleaned entity ID as stored in graph
+        """
+        cleaned_id = self._clean_entity_id(entity_id)
+        if self._has_node(cleaned_id):
+            raise ValueError(f"Entity already exists: {cleaned_id} (use update_entity)")
+        self._prepare_mutation()
+        
+        node_data = {'label': label, 'title': title or entity_id, 'infobox': infobox or {}, 'url': url, 'depth': depth}
+        self.original_to_cleaned[entity_id] = cleaned_id
+        self.cleaned_to_original.setdefault(cleaned_id, entity_id)
+        self._add_node(cleaned_id, self._node_attributes(entity_id, node_data))
+        self.entity_index.setdefault(label, set()).add(cleaned_id)
+        self._index_names(cleaned_id)
+        
+        self._emit(GraphChange(ChangeType.ENTITY_ADDED, entity_id=cleaned_id))
+        return cleaned_id
+    
+    @_holding_state_lock
+    def update_entity(
+        self,
+        entity_id: str,
+        label: Optional[str] = None,
+        title: Optional[str] = None,
+        infobox: Optional[Dict] = None,
+        url: Optional[str] = None,
+        depth: Optional[int] = None
+    ) -> str:
+        """
+        Replace attributes of an existing entity (None keeps the current value).
+        
+        Returns:
+            Cleaned entity ID as stored in graph
+        """
+        cleaned_id = self._require_entity(entity_id)
+        self._prepare_mutation()
+        # A new label / title can change which member lists the entity resolves into
+        renamed = (label is not None or title is not None) and self._tracks_members()
+        member_groups = self._groups_naming(cleaned_id) if renamed else set()
+        
+        updates = {
+            key: value for key, value in (
+                ('label', label), ('title', title), ('infobox', infobox), ('url', url), ('depth', depth)
+            ) if value is not None
+        }
+        attributes = self.graph.nodes[cleaned_id]
+        old_label = attributes.get('label')
+        if label is not None and label != old_label:
+            # typed_index keys neighbors by label: re-index every incident edge
+            incident = list(self.graph.in_edges(cleaned_id, data=True)) + list(self.graph.out_edges(cleaned_id, data=True))
+            for source, target, data in incident:
+                self._update_typed_index(source, target, self._edge_types(data), add=False)
+            self.entity_index.get(old_label, set()).discard(cleaned_id)
+            self.entity_index.setdefault(label, set()).add(cleaned_id)
+            attributes['label'] = label
+            for source, target, data in incident:
+                self._update_typed_index(source, target, self._edge_types(data), add=True)
+        attributes.update((key, value) for key, value in updates.items() if key in GRAPH_ATTRS)
+        self.attribute_store.update(cleaned_id, updates)
+        self._index_names(cleaned_id)
+        if renamed:
+            member_groups |= self._groups_naming(cleaned_id)
+            member_groups.update(self.typed_index.get(('MEMBER_OF', 'out', None), {}).get(cleaned_id, ()))
+        
+        self._emit(GraphChange(ChangeType.ENTITY_UPDATED, entity_id=cleaned_id), member_groups)
+        return cleaned_id
+    
+    @_holding_state_lock
+    def remove_entity(self, entity_id: str) -> str:
+        """
+        Remove an entity and all of its relationships.
+        
+        Incident edges are dropped from the indices in one pass and from the
+        graph together with the node; RELATIONSHIP_REMOVED is then emitted
+        for every type of every incident edge, followed by ENTITY_REMOVED.
+        
+        Returns:
+            Cleaned entity ID that was removed
+        """
+        cleaned_id = self._require_entity(entity_id)
+        self._prepare_mutation()
+        member_groups = self._groups_naming(cleaned_id) if self._tracks_members() else set()
+        
+        # A self-loop is both an in- and an out-edge: one entry per (source, target)
+        incident = {
+            (source, target): data
+            for source, target, data in list(self.graph.in_edges(cleaned_id, data=True)) + list(self.graph.out_edges(cleaned_id, data=True))
+        }
+        removed_edges = []
+        for (source, target), data in incident.items():
+            rel_types = self._edge_types(data)
+            self._drop_edge_entries(source, target, data.get('type', 'RELATED'), rel_types)
+            removed_edges.append((source, target, rel_types))
+        
+        original_id = self._original_id(cleaned_id)
+        self.entity_index.get(self.graph.nodes[cleaned_id].get('label'), set()).discard(cleaned_id)
+        self.graph.remove_node(cleaned_id)
+        self.attribute_store.remove(cleaned_id)
+        self.original_to_cleaned.pop(original_id, None)
+        if self.cleaned_to_original.get(cleaned_id) == original_id:
+            del self.cleaned_to_original[cleaned_id]
+        if self._search_index is not None:
+            self._search_index.remove(cleaned_id)
+        if self._name_index is not None:
+            self._name_index.remove(cleaned_id)
+        
+        for source, target, rel_types in removed_edges:
+            for rel_type in rel_types:
+                self._emit(GraphChange(ChangeType.RELATIONSHIP_REMOVED, source=source, target=target, rel_type=rel_type))
+        self._emit(GraphChange(ChangeType.ENTITY_REMOVED, entity_id=cleaned_id), member_groups)
+        return cleaned_id
+    
+    @_holding_state_lock
+    def add_relationship(
+        self,
+        source: str,
+        target: str,
+        rel_type: str,
+        confidence: float = 1.0,
+        method: str = 'manual'
+    ) -> bool:
+        """
+        Add a relationship between two existing entities.
+        
+        A second type between the same pair is stored in the edge's 'types'
+        list, like multi-type edges from the JSON build.
+        
+        Returns:
+            False if the edge already carries rel_type
+        """
+        source = self._require_entity(source)
+        target = self._require_entity(target)
+        edge_data = self.graph.edges[source, target] if self.graph.has_edge(source, target) else None
+        if edge_data is not None and rel_type in self._edge_types(edge_data):
+            return False
+        self._prepare_mutation()
+        
+        if edge_data is None:
+            self.graph.add_edge(source, target, type=rel_type, confidence=confidence, method=method)
+            self.relationship_index.setdefault(rel_type, set()).add((source, target))
+        else:
+            edge_data['types'] = self._edge_types(edge_data) + [rel_type]
+        self._update_typed_index(source, target, [rel_type], add=True)
+        self.edges[source, rel_type, target] = {
+            'source': self._original_id(source),
+            'target': self._original_id(target),
+            'type': rel_type,
+            'confidence': confidence,
+            'method': method
+        }
+        
+        self._emit(GraphChange(ChangeType.RELATIONSHIP_ADDED, source=source, target=target, rel_type=rel_type))
+        return True
+    
+    @_holding_state_lock
+    def remove_relationship(self, source: str, target: str, rel_type: Optional[str] = None) -> bool:
+        """
+        Remove one relationship type (or the whole edge if rel_type is None).
+        
+        Returns:
+            False if there was nothing to remove
+        """
+        source = self._require_entity(source)
+        target = self._require_entity(target)
+        if not self.graph.has_edge(source, target):
+            return False
+        edge_data = self.graph.edges[source, target]
+        rel_types = self._edge_types(edge_data)
+        if rel_type is not None and rel_type not in rel_types:
+            return False
+        self._prepare_mutation()
+        
+        removed = rel_types if rel_type is None else [rel_type]
+        remaining = [t for t in rel_types if t not in removed]
+        primary = edge_data.get('type', 'RELATED')
+        self._drop_edge_entries(source, target, primary, removed)
+        if not remaining:
+            self.graph.remove_edge(source, target)
+        else:
+            if primary in removed:
+                # Promote the next type to primary, like the JSON build does for the first one
+                edge_data['type'] = remaining[0]
+                self.relationship_index.setdefault(remaining[0], set()).add((source, target))
+            if len(remaining) == 1:
+                edge_data.pop('types', None)
+            else:
+                edge_data['types'] = remaining
+        
+        for removed_type in removed:
+            self._emit(GraphChange(ChangeType.RELATIONSHIP_REMOVED, source=source, target=target, rel_type=removed_type))
+        return True
         
 
 def main():
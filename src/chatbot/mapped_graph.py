@@ -0,0 +1,347 @@
+"""
+Memory-mapped Knowledge Graph Store
+
+Read-only, mmap-backed files for the 'mmap' engine of KpopKnowledgeGraph.
+Every array (CSR adjacency, label codes, string tables, node attribute blobs)
+is a .npy file opened with np.load(mmap_mode='r'), so any number of worker
+processes share the same page-cache pages instead of holding their own
+Python copies of the graph and infobox dicts.
+
+Directory layout (default: data/<name>.kgmap/):
+- meta.json: format version, source JSON hash, name tables, metadata
+- <csr array>.npy: CSR arrays (see csr_graph.CSRGraph)
+- <table>.offsets.npy + <table>.blob.npy: UTF-8 string tables
+- attrs: JSON-encoded node attribute dict per node (label, title, infobox, ...)
+- edge_order.npy: edge insertion order, to rebuild an identical DiGraph
+"""
+
+import bisect
+import json
+import os
+import shutil
+from collections.abc import Mapping
+from collections import defaultdict, deque
+from typing import Dict, List, Optional, Sequence, Iterator, Any
+
+import numpy as np
+import networkx as nx
+
+try:
+    from .csr_graph import CSRGraph
+except ImportError:  # Fallback for no-package context
+    from csr_graph import CSRGraph
+
+# Node attributes kept on graph nodes; the others live in attribute_store.AttributeStore
+GRAPH_ATTRS = ('label', 'title')
+
+# Bump when the file layout changes
+MAPPED_VERSION = 1
+
+CSR_ARRAYS = (
+    'node_labels',
+    'out_indptr', 'out_indices', 'out_types', 'out_eids',
+    'in_indptr', 'in_indices', 'in_types', 'in_eids',
+    'edge_confidence', 'edge_method'
+)
+
+
+def default_mapped_path(data_path: str) -> str:
+    """Mapped store directory for a source JSON (data/x.json -> data/x.kgmap)."""
+    return os.path.splitext(data_path)[0] + '.kgmap'
+
+
+class StringTable(Sequence):
+    """Read-only sequence of strings stored as UTF-8 blob + offsets."""
+
+    def __init__(self, offsets: np.ndarray, blob: np.ndarray):
+        self.offsets = offsets
+        self.blob = blob
+
+    @staticmethod
+    def encode(strings: List[str]):
+        """Encode strings into (offsets, blob) arrays."""
+        encoded = [s.encode('utf-8') for s in strings]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(b) for b in encoded], out=offsets[1:])
+        blob = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+        return offsets, blob
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        start, end = self.offsets[i], self.offsets[i + 1]
+        return self.blob[start:end].tobytes().decode('utf-8')
+
+    def __iter__(self) -> Iterator[str]:
+        for i in range(len(self)):
+            yield self[i]
+
+
+class MappedDict(Mapping):
+    """
+    Read-only str -> value mapping over sorted string keys.
+
+    Lookups bisect the sorted key table, so nothing is loaded into a Python
+    dict. Values are either a StringTable or an integer array.
+    """
+
+    def __init__(self, keys: StringTable, values: Sequence):
+        self.keys_table = keys
+        self.values = values
+
+    def _position(self, key: str) -> int:
+        pos = bisect.bisect_left(self.keys_table, key)
+        if pos < len(self.keys_table) and self.keys_table[pos] == key:
+            return pos
+        return -1
+
+    def __getitem__(self, key):
+        if not isinstance(key, str):
+            raise KeyError(key)
+        pos = self._position(key)
+        if pos < 0:
+            raise KeyError(key)
+        value = self.values[pos]
+        return int(value) if isinstance(value, np.integer) else value
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.keys_table)
+
+    def __len__(self) -> int:
+        return len(self.keys_table)
+
+
+class MappedNodeStore:
+    """Node attributes (titles + JSON attribute blobs) read from mapped files."""
+
+    def __init__(self, titles: StringTable, attrs: StringTable):
+        self.titles = titles
+        self.attrs = attrs
+
+    def attributes(self, i: int) -> Dict[str, Any]:
+        """Full node attribute dict of node index i (decoded on every call)."""
+        return json.loads(self.attrs[i])
+
+
+class MappedGraph:
+    """Everything opened from a mapped store directory."""
+
+    def __init__(
+        self,
+        csr: CSRGraph,
+        node_store: MappedNodeStore,
+        original_to_cleaned: MappedDict,
+        cleaned_to_original: MappedDict,
+        edge_order: np.ndarray,
+        metadata: Dict
+    ):
+        self.csr = csr
+        self.node_store = node_store
+        self.original_to_cleaned = original_to_cleaned
+        self.cleaned_to_original = cleaned_to_original
+        self.edge_order = edge_order
+        self.metadata = metadata
+
+    def to_networkx(self) -> nx.DiGraph:
+        """
+        Materialize a NetworkX DiGraph identical to the one KpopKnowledgeGraph builds.
+
+        This copies everything into process memory; it only runs when a caller
+        touches kg.graph directly.
+        """
+        csr = self.csr
+        graph = nx.DiGraph()
+        for i, node_id in enumerate(csr.node_ids):
+            # Other attributes are read from node_store (see attribute_store.AttributeStore.from_mapped)
+            attributes = self.node_store.attributes(i)
+            graph.add_node(node_id, **{key: attributes[key] for key in GRAPH_ATTRS if key in attributes})
+
+        # Primary type / all types / attributes per edge ID, from forward adjacency
+        edge_source = {}
+        edge_target = {}
+        edge_types = defaultdict(list)
+        for i, node_id in enumerate(csr.node_ids):
+            indices, types, eids = csr._entries(i, reverse=False)
+            for j, code, eid in zip(indices, types, eids):
+                edge_source[eid] = node_id
+                edge_target[eid] = csr.node_ids[j]
+                edge_types[eid].append(csr.rel_type_names[code])
+
+        for eid in self.edge_order.tolist():
+            types = edge_types[eid]
+            attrs = {'type': types[0]}
+            if len(types) > 1:
+                attrs['types'] = types
+            attrs['confidence'] = float(csr.edge_confidence[eid])
+            attrs['method'] = csr.method_names[csr.edge_method[eid]]
+            graph.add_edge(edge_source[eid], edge_target[eid], **attrs)
+        return graph
+
+
+def _edge_insertion_order(csr: CSRGraph) -> List[int]:
+    """
+    Find an edge order that reproduces both successor and predecessor order.
+
+    NetworkX keeps insertion order in graph.succ and graph.pred. Any order
+    that respects every node's successor order and every node's predecessor
+    order rebuilds the same adjacency, so a topological sort of those
+    constraints is enough.
+    """
+    num_edges = csr.number_of_edges()
+    following = defaultdict(list)
+    indegree = [0] * num_edges
+    for reverse in (False, True):
+        for i in range(len(csr)):
+            _, _, eids = csr._entries(i, reverse=reverse)
+            ordered = list(dict.fromkeys(eids))
+            for before, after in zip(ordered, ordered[1:]):
+                following[before].append(after)
+                indegree[after] += 1
+
+    queue = deque(eid for eid in range(num_edges) if indegree[eid] == 0)
+    order = []
+    while queue:
+        eid = queue.popleft()
+        order.append(eid)
+        for after in following[eid]:
+            indegree[after] -= 1
+            if indegree[after] == 0:
+                queue.append(after)
+    return order
+
+
+def _save_table(directory: str, name: str, strings: List[str]):
+    offsets, blob = StringTable.encode(strings)
+    np.save(os.path.join(directory, f"{name}.offsets.npy"), offsets)
+    np.save(os.path.join(directory, f"{name}.blob.npy"), blob)
+
+
+def _load_table(directory: str, name: str) -> StringTable:
+    return StringTable(
+        np.load(os.path.join(directory, f"{name}.offsets.npy"), mmap_mode='r'),
+        np.load(os.path.join(directory, f"{name}.blob.npy"), mmap_mode='r')
+    )
+
+
+def _save_mapping(directory: str, name: str, mapping: Dict[str, str]):
+    keys = sorted(mapping)
+    _save_table(directory, f"{name}.keys", keys)
+    _save_table(directory, f"{name}.values", [mapping[k] for k in keys])
+
+
+def _load_mapping(directory: str, name: str) -> MappedDict:
+    return MappedDict(_load_table(directory, f"{name}.keys"), _load_table(directory, f"{name}.values"))
+
+
+def write_mapped_graph(directory: str, kg, source_hash: str):
+    """
+    Write the mapped store for a fully built KpopKnowledgeGraph.
+
+    Files are written to a temporary directory that replaces the old store,
+    so processes that already mapped the old files keep working.
+
+    Args:
+        directory: Target store directory
+        kg: Built KpopKnowledgeGraph (graph, csr, ID maps)
+        source_hash: Content hash of the source JSON
+    """
+    csr = kg.csr if kg.csr is not None else CSRGraph.from_networkx(kg.graph)
+    tmp_dir = f"{directory}.tmp{os.getpid()}"
+    if os.path.exists(tmp_dir):
+        shutil.rmtree(tmp_dir)
+    os.makedirs(tmp_dir)
+
+    try:
+        state = csr.to_state()
+        for name in CSR_ARRAYS:
+            np.save(os.path.join(tmp_dir, f"{name}.npy"), np.ascontiguousarray(state['arrays'][name]))
+        np.save(os.path.join(tmp_dir, 'edge_order.npy'), np.asarray(_edge_insertion_order(csr), dtype=np.int32))
+
+        node_ids = list(csr.node_ids)
+        _save_table(tmp_dir, 'node_ids', node_ids)
+        sorted_ids = sorted(range(len(node_ids)), key=lambda i: node_ids[i])
+        _save_table(tmp_dir, 'node_index.keys', [node_ids[i] for i in sorted_ids])
+        np.save(os.path.join(tmp_dir, 'node_index.values.npy'), np.asarray(sorted_ids, dtype=np.int32))
+
+        titles, attrs = [], []
+        for node_id in node_ids:
+            data = kg._node_data(node_id)
+            titles.append(str(data.get('title', node_id)))
+            attrs.append(json.dumps(data, ensure_ascii=False))
+        _save_table(tmp_dir, 'titles', titles)
+        _save_table(tmp_dir, 'attrs', attrs)
+
+        _save_mapping(tmp_dir, 'original_to_cleaned', kg.original_to_cleaned)
+        _save_mapping(tmp_dir, 'cleaned_to_original', kg.cleaned_to_original)
+
+        meta = {
+            'version': MAPPED_VERSION,
+            'source_hash': source_hash,
+            'label_names': state['label_names'],
+            'rel_type_names': state['rel_type_names'],
+            'method_names': state['method_names'],
+            'metadata': kg.metadata
+        }
+        with open(os.path.join(tmp_dir, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+
+        if os.path.exists(directory):
+            old_dir = f"{directory}.old{os.getpid()}"
+            os.replace(directory, old_dir)
+            os.replace(tmp_dir, directory)
+            shutil.rmtree(old_dir, ignore_errors=True)
+        else:
+            os.replace(tmp_dir, directory)
+    finally:
+        if os.path.exists(tmp_dir):
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def open_mapped_graph(directory: str, source_hash: str) -> Optional[MappedGraph]:
+    """
+    Open a mapped store read-only.
+
+    Args:
+        directory: Store directory
+        source_hash: Content hash of the current source JSON
+
+    Returns:
+        MappedGraph, or None if the store is missing, stale or unreadable
+    """
+    meta_path = os.path.join(directory, 'meta.json')
+    if not os.path.exists(meta_path):
+        return None
+    try:
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta.get('version') != MAPPED_VERSION or meta.get('source_hash') != source_hash:
+            return None
+
+        arrays = {name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode='r') for name in CSR_ARRAYS}
+        node_index = MappedDict(
+            _load_table(directory, 'node_index.keys'),
+            np.load(os.path.join(directory, 'node_index.values.npy'), mmap_mode='r')
+        )
+        csr = CSRGraph(
+            _load_table(directory, 'node_ids'),
+            meta['label_names'],
+            meta['rel_type_names'],
+            meta['method_names'],
+            arrays,
+            node_index=node_index
+        )
+        return MappedGraph(
+            csr,
+            MappedNodeStore(_load_table(directory, 'titles'), _load_table(directory, 'attrs')),
+            _load_mapping(directory, 'original_to_cleaned'),
+            _load_mapping(directory, 'cleaned_to_original'),
+            np.load(os.path.join(directory, 'edge_order.npy'), mmap_mode='r'),
+            meta.get('metadata', {})
+        )
+    except (OSError, ValueError, KeyError):
+        return None
@@ -24,6 +24,7 @@ from dataclasses import dataclass
 from enum import Enum
 
 from .knowledge_graph import KpopKnowledgeGraph
+from .name_index import strip_name_suffix
 
 
 class ReasoningType(Enum):
@@ -2627,9 +2628,13 @@ class MultiHopReasoner:
                 for j in range(i + 1, len(start_entities)):
                     source = start_entities[i]
                     target = start_entities[j]
-                    paths = self.kg.find_all_paths(source, target, max_hops=max_hops)
+                    # Chỉ lấy 3 path ngắn nhất (lazy, có time budget)
+                    paths = self.kg.find_all_paths(
+                        source, target, max_hops=max_hops,
+                        limit=3, time_budget=self.kg.PATH_TIME_BUDGET
+                    )
                     if paths:
-                        all_paths.extend(paths[:3])  # Limit paths
+                        all_paths.extend(paths)
                         # Add path as reasoning step
                         for path in paths[:1]:  # Use shortest path
                             path_details = self.kg.get_path_details(path)
@@ -2739,9 +2744,10 @@ class MultiHopReasoner:
             
             for hop in range(max_hops):
                 next_level = []
+                # Lấy hàng xóm của cả level trong một lần gọi
+                level_neighbors = self.kg.get_neighbors_many(current_level)
                 for node in current_level:
-                    neighbors = self.kg.get_neighbors(node)
-                    for neighbor, rel_type, _ in neighbors:
+                    for neighbor, rel_type, _ in level_neighbors[node]:
                         if neighbor not in visited:
                             visited.add(neighbor)
                             next_level.append(neighbor)
@@ -2762,8 +2768,9 @@ class MultiHopReasoner:
                 
         # Aggregate by type
         type_counts = defaultdict(list)
+        entity_types = self.kg.get_entity_types_many(list(all_entities))
         for entity in all_entities:
-            entity_type = self.kg.get_entity_type(entity)
+            entity_type = entity_types[entity]
             if entity_type:
                 type_counts[entity_type].append(entity)
                 
@@ -3372,20 +3379,14 @@ class MultiHopReasoner:
                         return variant
                 
                 # Thử tìm case-insensitive với normalize
-                song_name_lower = self._normalize_entity_name(song_name).lower()
-                for node, data in self.kg.graph.nodes(data=True):
-                    if data.get('label') == 'Song':
-                        base_name = self._normalize_entity_name(node)
-                        base_name_lower = base_name.lower()
-                        # Exact match hoặc starts with
-                        if base_name_lower == song_name_lower or base_name_lower.startswith(song_name_lower):
-                            # Ưu tiên exact match
-                            if base_name_lower == song_name_lower:
-                                return node
-                            # Nếu không có exact match, giữ lại để kiểm tra tiếp
-                            elif not any(self._normalize_entity_name(n).lower() == song_name_lower 
-                                       for n, d in self.kg.graph.nodes(data=True) if d.get('label') == 'Song'):
-                                return node
+                # Tra cứu qua name index của KG (đuôi, dấu, gạch nối đã chuẩn hóa)
+                matches = self.kg.lookup_name(song_name, entity_type='Song')
+                if matches:
+                    return matches[0]
+                # Không có exact match → lấy node đầu tiên bắt đầu bằng tên
+                prefixed = self.kg.find_by_prefix(self._normalize_entity_name(song_name), entity_type='Song', limit=1)
+                if prefixed:
+                    return prefixed[0]
         
         return None
     
@@ -3428,17 +3429,14 @@ class MultiHopReasoner:
                         return variant
                 
                 # Thử tìm case-insensitive với normalize, VERIFY TYPE
-                album_name_lower = self._normalize_entity_name(album_name).lower()
-                for node, data in self.kg.graph.nodes(data=True):
-                    if data.get('label') == 'Album':  # CHỈ tìm trong Album nodes
-                        base_name = self._normalize_entity_name(node)
-                        base_name_lower = base_name.lower()
-                        if base_name_lower == album_name_lower or base_name_lower.startswith(album_name_lower):
-                            if base_name_lower == album_name_lower:
-                                return node
-                            elif not any(self._normalize_entity_name(n).lower() == album_name_lower 
-                                       for n, d in self.kg.graph.nodes(data=True) if d.get('label') == 'Album'):
-                                return node
+                # Tra cứu qua name index của KG (đuôi, dấu, gạch nối đã chuẩn hóa)
+                matches = self.kg.lookup_name(album_name, entity_type='Album')
+                if matches:
+                    return matches[0]
+                # Không có exact match → lấy node đầu tiên bắt đầu bằng tên
+                prefixed = self.kg.find_by_prefix(self._normalize_entity_name(album_name), entity_type='Album', limit=1)
+                if prefixed:
+                    return prefixed[0]
         
         return None
     
@@ -3479,13 +3477,10 @@ class MultiHopReasoner:
                         return variant
                 
                 # Thử tìm case-insensitive với normalize, VERIFY TYPE
-                artist_name_lower = self._normalize_entity_name(artist_name).lower()
-                for node, data in self.kg.graph.nodes(data=True):
-                    if data.get('label') == 'Artist':  # CHỈ tìm trong Artist nodes
-                        base_name = self._normalize_entity_name(node)
-                        base_name_lower = base_name.lower()
-                        if base_name_lower == artist_name_lower:
-                            return node
+                # Tra cứu qua name index của KG (đuôi, dấu, gạch nối đã chuẩn hóa)
+                resolved = self.kg.resolve_name(artist_name, entity_type='Artist')
+                if resolved:
+                    return resolved
         
         return None
     
@@ -3523,13 +3518,10 @@ class MultiHopReasoner:
                         return variant
                 
                 # Thử tìm case-insensitive với normalize, VERIFY TYPE
-                group_name_lower = self._normalize_entity_name(group_name).lower()
-                for node, data in self.kg.graph.nodes(data=True):
-                    if data.get('label') == 'Group':  # CHỈ tìm trong Group nodes
-                        base_name = self._normalize_entity_name(node)
-                        base_name_lower = base_name.lower()
-                        if base_name_lower == group_name_lower:
-                            return node
+                # Tra cứu qua name index của KG (đuôi, dấu, gạch nối đã chuẩn hóa)
+                resolved = self.kg.resolve_name(group_name, entity_type='Group')
+                if resolved:
+                    return resolved
         
         return None
     
@@ -3569,13 +3561,13 @@ class MultiHopReasoner:
                         return variant
                 
                 # Thử tìm case-insensitive với normalize, VERIFY TYPE
-                company_name_lower = self._normalize_entity_name(company_name).lower()
-                for node, data in self.kg.graph.nodes(data=True):
-                    if data.get('label') == 'Company':  # CHỈ tìm trong Company nodes
-                        base_name = self._normalize_entity_name(node)
-                        base_name_lower = base_name.lower()
-                        if base_name_lower == company_name_lower or company_name_lower in base_name_lower:
-                            return node
+                # Tra cứu qua name index của KG, rồi substring match qua search index
+                resolved = self.kg.resolve_name(company_name, entity_type='Company')
+                if resolved:
+                    return resolved
+                results = self.kg.search_entities(self._normalize_entity_name(company_name), entity_type='Company', limit=1)
+                if results:
+                    return results[0]['id']
         
         return None
     
@@ -4240,10 +4232,8 @@ class MultiHopReasoner:
         Returns:
             Base name (không có đuôi)
         """
-        import re
-        # Remove suffixes trong parentheses
-        normalized = re.sub(r'\s*\([^)]+\)\s*$', '', entity_name)
-        return normalized.strip()
+        # Remove suffixes trong parentheses (dùng chung với name_index)
+        return strip_name_suffix(entity_name)
     
     def _format_year_natural(self, year_str: str) -> str:
         """
@@ -4522,34 +4512,16 @@ class MultiHopReasoner:
         """Check if two groups/artists are under same company (1-hop or 2-hop comparison)."""
         steps = []
         
-        # Get ALL companies for entity1 (một entity có thể có nhiều companies)
-        if self.kg.get_entity_type(entity1) == 'Artist':
-            # Check direct relationship first (1-hop)
-            companies1 = self.kg.get_artist_companies(entity1)
-            # Then check through groups (2-hop)
-            groups1 = self.kg.get_artist_groups(entity1)
-            for g in groups1:
-                # Lấy TẤT CẢ companies của group này
-                group_companies = self.kg.get_group_companies(g)
-                companies1.extend(group_companies)
-            companies1 = list(set(companies1))  # Remove duplicates
+        # Get ALL companies for entity1 (Artist: trực tiếp + qua group, Group: của chính nó)
+        if self.kg.get_entity_type(entity1) in ('Artist', 'Group'):
+            companies1 = self.kg.get_entity_companies(entity1)
         else:
-            # Group có thể có nhiều companies
             companies1 = self.kg.get_group_companies(entity1)
             
-        # Get ALL companies for entity2 (một entity có thể có nhiều companies)
-        if self.kg.get_entity_type(entity2) == 'Artist':
-            # Check direct relationship first (1-hop)
-            companies2 = self.kg.get_artist_companies(entity2)
-            # Then check through groups (2-hop)
-            groups2 = self.kg.get_artist_groups(entity2)
-            for g in groups2:
-                # Lấy TẤT CẢ companies của group này
-                group_companies = self.kg.get_group_companies(g)
-                companies2.extend(group_companies)
-            companies2 = list(set(companies2))  # Remove duplicates
+        # Get ALL companies for entity2 (Artist: trực tiếp + qua group, Group: của chính nó)
+        if self.kg.get_entity_type(entity2) in ('Artist', 'Group'):
+            companies2 = self.kg.get_entity_companies(entity2)
         else:
-            # Group có thể có nhiều companies
             companies2 = self.kg.get_group_companies(entity2)
             
         steps.append(ReasoningStep(
@@ -4606,16 +4578,10 @@ class MultiHopReasoner:
         steps = []
         
         # Get genres for entity1
-        genres1 = []
-        for _, target, data in self.kg.graph.out_edges(entity1, data=True):
-            if data.get('type') == 'IS_GENRE' and self.kg.get_entity_type(target) == 'Genre':
-                genres1.append(target)
+        genres1 = self.kg.get_entity_genres(entity1)
         
         # Get genres for entity2
-        genres2 = []
-        for _, target, data in self.kg.graph.out_edges(entity2, data=True):
-            if data.get('type') == 'IS_GENRE' and self.kg.get_entity_type(target) == 'Genre':
-                genres2.append(target)
+        genres2 = self.kg.get_entity_genres(entity2)
         
         steps.append(ReasoningStep(
             hop_number=1,
@@ -4676,24 +4642,12 @@ class MultiHopReasoner:
         # Get groups for artist1
         groups1 = self.kg.get_artist_groups(artist1)
         # Get genres of groups1
-        genres1 = []
-        for group in groups1:
-            for _, target, data in self.kg.graph.out_edges(group, data=True):
-                if data.get('type') == 'IS_GENRE' and self.kg.get_entity_type(target) == 'Genre':
-                    genres1.append(target)
+        genres1 = self.kg.get_genres_via_group(artist1)
         
         # Get groups for artist2
         groups2 = self.kg.get_artist_groups(artist2)
         # Get genres of groups2
-        genres2 = []
-        for group in groups2:
-            for _, target, data in self.kg.graph.out_edges(group, data=True):
-                if data.get('type') == 'IS_GENRE' and self.kg.get_entity_type(target) == 'Genre':
-                    genres2.append(target)
-        
-        # Remove duplicates
-        genres1 = list(set(genres1))
-        genres2 = list(set(genres2))
+        genres2 = self.kg.get_genres_via_group(artist2)
         
         steps.append(ReasoningStep(
             hop_number=1,
@@ -4705,21 +4659,12 @@ class MultiHopReasoner:
         ))
         
         if groups1:
-            group_genres_steps1 = []
-            for group in groups1:
-                group_genres = []
-                for _, target, data in self.kg.graph.out_edges(group, data=True):
-                    if data.get('type') == 'IS_GENRE' and self.kg.get_entity_type(target) == 'Genre':
-                        group_genres.append(target)
-                if group_genres:
-                    group_genres_steps1.extend(group_genres)
-            
             steps.append(ReasoningStep(
                 hop_number=2,
                 operation='get_genres_from_group',
                 source_entities=groups1,
                 relationship='IS_GENRE',
-                target_entities=list(set(group_genres_steps1)),
+                target_entities=genres1,
                 explanation=f"Lấy thể loại của nhóm nhạc {', '.join(groups1[:2])}"
             ))
         
@@ -4733,21 +4678,12 @@ class MultiHopReasoner:
         ))
         
         if groups2:
-            group_genres_steps2 = []
-            for group in groups2:
-                group_genres = []
-                for _, target, data in self.kg.graph.out_edges(group, data=True):
-                    if data.get('type') == 'IS_GENRE' and self.kg.get_entity_type(target) == 'Genre':
-                        group_genres.append(target)
-                if group_genres:
-                    group_genres_steps2.extend(group_genres)
-            
             steps.append(ReasoningStep(
                 hop_number=2,
                 operation='get_genres_from_group',
                 source_entities=groups2,
                 relationship='IS_GENRE',
-                target_entities=list(set(group_genres_steps2)),
+                target_entities=genres2,
                 explanation=f"Lấy thể loại của nhóm nhạc {', '.join(groups2[:2])}"
             ))
         
@@ -4805,23 +4741,9 @@ class MultiHopReasoner:
             # Both same type - fallback to direct comparison
             return self.check_same_genre(artist_or_group1, artist_or_group2)
         
-        # Get genres of groups1
-        genres1 = []
-        for group in groups1:
-            for _, target, data in self.kg.graph.out_edges(group, data=True):
-                if data.get('type') == 'IS_GENRE' and self.kg.get_entity_type(target) == 'Genre':
-                    genres1.append(target)
-        
-        # Get genres of groups2
-        genres2 = []
-        for group in groups2:
-            for _, target, data in self.kg.graph.out_edges(group, data=True):
-                if data.get('type') == 'IS_GENRE' and self.kg.get_entity_type(target) == 'Genre':
-                    genres2.append(target)
-        
-        # Remove duplicates
-        genres1 = list(set(genres1))
-        genres2 = list(set(genres2))
+        # Get genres of groups (Artist: qua group, Group: của chính nó)
+        genres1 = list(dict.fromkeys(genre for group in groups1 for genre in self.kg.get_entity_genres(group)))
+        genres2 = list(dict.fromkeys(genre for group in groups2 for genre in self.kg.get_entity_genres(group)))
         
         steps.append(ReasoningStep(
             hop_number=1 if type1 == 'Group' else 2,
@@ -5197,19 +5119,9 @@ class MultiHopReasoner:
         groups1 = self.kg.get_artist_groups(artist1)
         groups2 = self.kg.get_artist_groups(artist2)
         
-        # Get companies of groups1
-        companies1 = []
-        for group in groups1:
-            group_companies = self.kg.get_group_companies(group)
-            companies1.extend(group_companies)
-        companies1 = list(set(companies1))
-        
-        # Get companies of groups2
-        companies2 = []
-        for group in groups2:
-            group_companies = self.kg.get_group_companies(group)
-            companies2.extend(group_companies)
-        companies2 = list(set(companies2))
+        # Get companies of groups (2-hop, materialized)
+        companies1 = self.kg.get_companies_via_group(artist1)
+        companies2 = self.kg.get_companies_via_group(artist2)
         
         steps.append(ReasoningStep(
             hop_number=1,
@@ -5295,18 +5207,9 @@ class MultiHopReasoner:
             # Both same type - use existing check_same_company
             return self.check_same_company(artist_or_group1, artist_or_group2)
         
-        # Get companies of groups
-        companies1 = []
-        for group in groups1:
-            group_companies = self.kg.get_group_companies(group)
-            companies1.extend(group_companies)
-        companies1 = list(set(companies1))
-        
-        companies2 = []
-        for group in groups2:
-            group_companies = self.kg.get_group_companies(group)
-            companies2.extend(group_companies)
-        companies2 = list(set(companies2))
+        # Get companies of groups (Artist: qua group, Group: của chính nó)
+        companies1 = self.kg.get_companies_via_group(artist_or_group1) if type1 == 'Artist' else self.kg.get_entity_companies(artist_or_group1)
+        companies2 = self.kg.get_companies_via_group(artist_or_group2) if type2 == 'Artist' else self.kg.get_entity_companies(artist_or_group2)
         
         common_companies = set(companies1).intersection(set(companies2))
         
@@ -5343,15 +5246,9 @@ class MultiHopReasoner:
         """Get all labelmates (same company) of an artist/group (3-hop)."""
         steps = []
         
-        # Step 1: Get ALL companies (một entity có thể có nhiều companies)
+        # Step 1: Get ALL companies (Artist: qua group, materialized)
         if self.kg.get_entity_type(artist_or_group) == 'Artist':
-            groups = self.kg.get_artist_groups(artist_or_group)
-            companies = []
-            for g in groups:
-                # Lấy TẤT CẢ companies của group này
-                group_companies = self.kg.get_group_companies(g)
-                companies.extend(group_companies)
-            companies = list(set(companies))  # Remove duplicates
+            companies = self.kg.get_companies_via_group(artist_or_group)
         else:
             # Group có thể có nhiều companies
             companies = self.kg.get_group_companies(artist_or_group)
@@ -5365,14 +5262,15 @@ class MultiHopReasoner:
             explanation=f"Lấy công ty của {artist_or_group}"
         ))
         
-        # Step 2: Get all groups under those companies
-        all_groups = set()
-        for company in companies:
-            company_groups = self.kg.get_company_groups(company)
-            all_groups.update(company_groups)
-            
-        # Remove the original group
-        all_groups.discard(artist_or_group)
+        # Step 2: Get all groups under those companies (bảng labelmates đã loại chính entity)
+        if self.kg.get_entity_type(artist_or_group) in ('Artist', 'Group'):
+            all_groups = self.kg.get_labelmates(artist_or_group)
+        else:
+            all_groups = set()
+            for company in companies:
+                all_groups.update(self.kg.get_company_groups(company))
+            all_groups.discard(artist_or_group)
+            all_groups = list(all_groups)
         
         steps.append(ReasoningStep(
             hop_number=2,
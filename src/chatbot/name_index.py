@@ -0,0 +1,321 @@
+"""
+Normalized Name Index
+
+One place for entity name normalization, shared by the knowledge graph,
+GraphRAG, the reasoner and the chatbot:
+
+- prefix stripping: "Group_BTS" -> "BTS"
+- parenthetical suffixes: "Lisa (ca sĩ)" -> "Lisa"
+- Vietnamese diacritic folding: "Nghệ sĩ" -> "nghe si"
+- hyphen / underscore / space variants: "Jang Won-young" -> "jang won young",
+  plus a compact form without spaces ("jangwonyoung")
+- manual aliases: "yg" -> "YG Entertainment", "bp" -> "BLACKPINK"
+
+NameIndex maps every normalized key of every entity (ID, title, aliases) to
+its entities once, so a lookup is one normalize_name() call (memoized) and
+one dict access. A word index over the same keys resolves partial names
+("Sana" -> "Minatozaki Sana") by intersecting short posting sets.
+"""
+
+import re
+import unicodedata
+from collections import defaultdict
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+# ID prefixes added by the crawler (only one is removed)
+NAME_PREFIXES = (
+    'Genre_',
+    'Company_',
+    'Album_',
+    'Song_',
+    'Artist_',
+    'Group_',
+    'Occupation_',
+    'Instrument_'
+)
+
+# Manual aliases for names that are easy to confuse: base name (lowercase) -> aliases
+NAME_ALIASES = {
+    # LOONA / LOOΠΔ
+    "loona": ["loona", "looπδ", "loonα", "loona-loona"],
+    "vi vi": ["vivi", "vi-vi", "vi vi"],
+    "vivi": ["vivi", "vi-vi", "vi vi"],
+    "go won": ["go won", "gowon", "go-won"],
+    "gowon": ["go won", "gowon", "go-won"],
+    # BLACKPINK
+    "blackpink": ["blackpink", "black pink", "black-pink", "bp"],
+}
+
+# Company aliases: canonical company name (lowercase) -> aliases
+COMPANY_ALIASES = {
+    # Big 4
+    "yg entertainment": ["yg", "yg ent", "yg entertainment", "company_yg entertainment", "yg-ent"],
+    "jyp entertainment": ["jyp", "jyp ent", "jyp entertainment", "company_jyp entertainment", "j.y.p"],
+    "sm entertainment": ["sm", "sm ent", "sm entertainment", "company_sm entertainment"],
+    "hybe": ["hybe", "hybe corporation", "big hit", "big hit entertainment", "bighit", "company_hybe", "company_big hit entertainment"],
+    "big hit entertainment": ["big hit", "bighit", "hybe", "hybe corporation", "company_big hit entertainment"],
+
+    # Mid/other
+    "cube entertainment": ["cube", "cube ent", "company_cube", "company_cube entertainment"],
+    "woollim entertainment": ["woollim", "woollim ent", "company_woollim entertainment"],
+    "stone music entertainment": ["stone music", "stone", "company_stone music", "company_stone music entertainment"],
+    "ist entertainment": ["ist", "play m", "fave", "company_ist entertainment", "company_play m", "company_fave"],
+    "core contents media": ["mbk", "mbk entertainment", "core contents media", "company_core contents media", "company_mbk entertainment"],
+    "mbk entertainment": ["mbk", "mbk ent", "mbk entertainment", "company_mbk entertainment", "core contents media"],
+    "source music": ["source music", "company_source music", "source-music"],
+    "pledis entertainment": ["pledis", "pledis ent", "company_pledis entertainment"],
+    "starship entertainment": ["starship", "company_starship entertainment"],
+    "fnc entertainment": ["fnc", "company_fnc entertainment"],
+    "ymc entertainment": ["ymc", "company_ymc", "company_ymc entertainment", "ymc ent"],
+    "emi music japan": ["emi", "emi music japan", "company_emi music japan"],
+    "loen entertainment": ["loen", "kakao m", "kakao entertainment", "company_loen entertainment", "company_kakao m"],
+    "dsp media": ["dsp", "company_dsp media", "dspmedia"],
+    "ist": ["ist", "company_ist"],
+    "woollim": ["woollim", "company_woollim"],
+    "stone music": ["stone music", "company_stone music"],
+    "yuehua entertainment": ["yuehua", "company_yuehua", "company_yuehua entertainment"],
+    "wm entertainment": ["wm", "company_wm entertainment"],
+}
+
+# Match ranks (lower is better)
+RANK_FULL = 0   # full name incl. suffix: "lisa (ca si)"
+RANK_ALIAS = 1  # manual alias
+RANK_BASE = 2   # name without suffix: "lisa"
+
+_SUFFIX_RE = re.compile(r'\s*\([^)]+\)\s*$')
+_SEPARATOR_RE = re.compile(r'[\s\-_‐‑–—]+')
+
+
+def strip_name_prefix(name: str) -> str:
+    """Remove one crawler prefix: "Group_BTS" -> "BTS"."""
+    for prefix in NAME_PREFIXES:
+        if name.startswith(prefix):
+            return name[len(prefix):]
+    return name
+
+
+def strip_name_suffix(name: str) -> str:
+    """Remove a trailing parenthetical suffix: "Lisa (ca sĩ)" -> "Lisa"."""
+    return _SUFFIX_RE.sub('', name).strip()
+
+
+def fold_diacritics(text: str) -> str:
+    """Remove diacritics (incl. Vietnamese đ/Đ): "Nghệ sĩ" -> "Nghe si"."""
+    text = text.replace('đ', 'd').replace('Đ', 'D')
+    decomposed = unicodedata.normalize('NFD', text)
+    return ''.join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+@lru_cache(maxsize=65536)
+def normalize_name(name: str, strip_suffix: bool = True) -> str:
+    """
+    Normalized lookup key of a name.
+
+    "Group_Jang Won-young (ca sĩ)" -> "jang won young"
+
+    Args:
+        name: Entity ID, title or user text
+        strip_suffix: Also remove a trailing parenthetical suffix
+    """
+    key = strip_name_prefix(name.strip())
+    if strip_suffix:
+        key = strip_name_suffix(key)
+    key = fold_diacritics(key).casefold()
+    return _SEPARATOR_RE.sub(' ', key).strip()
+
+
+def compact_key(key: str) -> str:
+    """Key without spaces, so "go won" and "gowon" meet."""
+    return key.replace(' ', '')
+
+
+def normalize_company(company_id: str) -> str:
+    """
+    Canonical company name (lowercase) for robust matching.
+    Handles common aliases / case / spacing.
+    """
+    if not company_id:
+        return ""
+
+    cid = company_id.strip()
+    # Remove prefix if present
+    cid = cid.replace("Company_", "")
+    cid_lower = cid.lower()
+
+    for norm, aliases in COMPANY_ALIASES.items():
+        if cid_lower == norm:
+            return norm
+        if cid_lower in aliases:
+            return norm
+    return cid_lower
+
+
+def entity_name_keys(entity_id: str, label: Optional[str], title: str) -> Dict[str, int]:
+    """Normalized keys an entity is found by (ID, title, aliases) -> best rank."""
+    keys: Dict[str, int] = {}
+
+    def put(key: str, rank: int):
+        if key and rank < keys.get(key, RANK_BASE + 1):
+            keys[key] = rank
+
+    for name in {entity_id, title}:
+        put(normalize_name(name, strip_suffix=False), RANK_FULL)
+        base = normalize_name(name)
+        put(base, RANK_BASE)
+        aliases = NAME_ALIASES.get(base, [])
+        if label == 'Company':
+            aliases = aliases + COMPANY_ALIASES.get(base, [])
+        for alias in aliases:
+            put(normalize_name(alias), RANK_ALIAS)
+    return keys
+
+
+class NameIndex:
+    """
+    Normalized key -> entities index over entity IDs, titles and aliases.
+
+    Candidates for a key come back by rank (full name, alias, base name),
+    then the entity whose ID equals the query, then entities whose lowercase
+    base name equals the query without folding, then graph order.
+    """
+
+    def __init__(self, entities: Iterable[Tuple[str, Optional[str], str]] = ()):
+        """
+        Args:
+            entities: (entity_id, label, title) tuples in graph order
+        """
+        self._keys: Dict[str, Dict[str, int]] = defaultdict(dict)  # key -> entity -> best rank
+        self._compact: Dict[str, Dict[str, int]] = defaultdict(dict)  # compact key -> entity -> best rank
+        self._entity_keys: Dict[str, Set[Tuple[str, str]]] = {}  # entity -> {(key, compact key)}
+        self._words: Dict[str, Set[str]] = defaultdict(set)  # word of any key -> entities
+        self._labels: Dict[str, Optional[str]] = {}
+        self._base_lower: Dict[str, str] = {}
+        self._order: Dict[str, int] = {}
+        self._next_position = 0
+
+        for entity_id, label, title in entities:
+            self.add(entity_id, label, title)
+
+    def __len__(self) -> int:
+        return len(self._labels)
+
+    def __contains__(self, entity_id: str) -> bool:
+        return entity_id in self._labels
+
+    def add(self, entity_id: str, label: Optional[str], title: Optional[str] = None):
+        """Index an entity (re-indexes it if it is already present)."""
+        if entity_id in self._labels:
+            self.remove(entity_id)
+        title = title or entity_id
+        self._labels[entity_id] = label
+        self._base_lower[entity_id] = strip_name_suffix(strip_name_prefix(entity_id)).lower()
+        self._order[entity_id] = self._next_position
+        self._next_position += 1
+
+        entity_keys = set()
+        for key, rank in entity_name_keys(entity_id, label, title).items():
+            compact = compact_key(key)
+            self._keys[key][entity_id] = rank
+            best = self._compact[compact].get(entity_id)
+            if best is None or rank < best:
+                self._compact[compact][entity_id] = rank
+            entity_keys.add((key, compact))
+            for word in key.split():
+                self._words[word].add(entity_id)
+        self._entity_keys[entity_id] = entity_keys
+
+    def remove(self, entity_id: str):
+        """Drop an entity from the index (no-op if it is not indexed)."""
+        if entity_id not in self._labels:
+            return
+        for key, compact in self._entity_keys.pop(entity_id):
+            for index, k in ((self._keys, key), (self._compact, compact)):
+                entities = index.get(k)
+                if entities is not None:
+                    entities.pop(entity_id, None)
+                    if not entities:
+                        del index[k]
+            for word in key.split():
+                entities = self._words.get(word)
+                if entities is not None:
+                    entities.discard(entity_id)
+                    if not entities:
+                        del self._words[word]
+        del self._labels[entity_id]
+        del self._base_lower[entity_id]
+        del self._order[entity_id]
+
+    def lookup(self, name: str, entity_type: Optional[str] = None) -> List[str]:
+        """
+        All entities a name can refer to, best first.
+
+        Args:
+            name: Entity ID, title, alias or user text (any case / diacritics / separators)
+            entity_type: Only return entities with this label
+        """
+        if not name:
+            return []
+        full_key = normalize_name(name, strip_suffix=False)
+        base_key = normalize_name(name)
+        candidates: Dict[str, int] = {}
+        for key in {full_key, base_key}:
+            for entity_id, rank in self._keys.get(key, {}).items():
+                # A query that only matches without its own suffix ranks as a base match
+                rank = rank if key == full_key else max(rank, RANK_BASE)
+                if rank < candidates.get(entity_id, RANK_BASE + 1):
+                    candidates[entity_id] = rank
+
+        matches = [
+            entity_id for entity_id in candidates
+            if not entity_type or self._labels[entity_id] == entity_type
+        ]
+        if not matches:
+            # Separator variants: "gowon" vs "go won"
+            candidates = self._compact.get(compact_key(base_key), {})
+            matches = [
+                entity_id for entity_id in candidates
+                if not entity_type or self._labels[entity_id] == entity_type
+            ]
+        if not matches:
+            return []
+
+        query_id = strip_name_prefix(name.strip())
+        query_base_lower = strip_name_suffix(query_id).lower()
+        matches.sort(key=lambda entity_id: (
+            candidates[entity_id],
+            entity_id != query_id,
+            self._base_lower[entity_id] != query_base_lower,
+            self._order[entity_id]
+        ))
+        return matches
+
+    def lookup_words(self, name: str, entity_type: Optional[str] = None) -> List[str]:
+        """
+        Entities having every word of a name as a whole word of one of their keys, in graph order.
+
+        Used when lookup() finds nothing, e.g. a stage name ("Sana") for an
+        entity stored under the full name ("Minatozaki Sana").
+        """
+        words = normalize_name(name).split()
+        if not words:
+            return []
+        postings = []
+        for word in set(words):
+            entities = self._words.get(word)
+            if not entities:
+                return []
+            postings.append(entities)
+        postings.sort(key=len)
+        candidates = set(postings[0]).intersection(*postings[1:])
+        matches = [
+            entity_id for entity_id in candidates
+            if (not entity_type or self._labels[entity_id] == entity_type)
+            and any(set(words) <= set(key.split()) for key, _ in self._entity_keys[entity_id])
+        ]
+        return sorted(matches, key=self._order.__getitem__)
+
+    def resolve(self, name: str, entity_type: Optional[str] = None) -> Optional[str]:
+        """Best entity for a name, or None."""
+        matches = self.lookup(name, entity_type)
+        return matches[0] if matches else None
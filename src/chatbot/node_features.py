@@ -0,0 +1,274 @@
+"""
+Node Ranking Features
+
+Per-node features of the K-pop knowledge graph for context ranking, as numpy
+arrays indexed like the graph's nodes:
+
+- out_degree / in_degree: distinct neighbors per direction (= get_degree)
+- typed_out / typed_in: (nodes, relationship types) counts of edges carrying
+  each type, so "how many MEMBER_OF edges" is one array lookup
+- pagerank: global PageRank (damping 0.85, like networkx.pagerank), computed
+  on first access by power iteration over the edge arrays
+
+Features are built once (on first use) from the CSR arrays when available,
+else from NetworkX, then patched per GraphChange: a mutation adds or removes
+one row / one edge, and PageRank is recomputed on its next access.
+Builds, lookups and invalidation hold the graph's state_lock, since retrieval
+stages read the features from worker threads.
+"""
+
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+try:
+    from .graph_changes import ChangeType, GraphChange
+except ImportError:
+    from graph_changes import ChangeType, GraphChange
+
+PAGERANK_ALPHA = 0.85
+PAGERANK_MAX_ITER = 100
+PAGERANK_TOL = 1.0e-6  # L1 change per node, like networkx.pagerank
+
+
+def top_k_indices(scores: np.ndarray, k: int, min_score: float = -np.inf) -> np.ndarray:
+    """
+    Indices of the k highest scores above min_score, best first.
+
+    Equal scores keep input order (same result as a stable descending sort);
+    argpartition selects the k first, so only those are sorted.
+    """
+    candidates = np.flatnonzero(scores > min_score)
+    if len(candidates) > k:
+        values = scores[candidates]
+        kth = values[np.argpartition(-values, k - 1)[k - 1]]
+        above = candidates[values > kth]
+        ties = candidates[values == kth][:k - len(above)]
+        candidates = np.sort(np.concatenate([above, ties]))
+    return candidates[np.argsort(-scores[candidates], kind='stable')]
+
+
+class NodeFeatures:
+    """Degree / typed degree / PageRank arrays of a KpopKnowledgeGraph."""
+
+    def __init__(self, kg):
+        """
+        Args:
+            kg: KpopKnowledgeGraph providing the graph (CSR or NetworkX)
+        """
+        self.kg = kg
+        self.version: Optional[str] = None  # kg.graph_version the arrays were built for
+        self.node_index: Dict[str, int] = {}
+        self.rel_types: List[str] = []
+        self.out_degree: Optional[np.ndarray] = None
+        self.in_degree: Optional[np.ndarray] = None
+        self.typed_out: Optional[np.ndarray] = None
+        self.typed_in: Optional[np.ndarray] = None
+        self._edge_src: Optional[np.ndarray] = None  # Distinct (source, target) edges
+        self._edge_dst: Optional[np.ndarray] = None
+        self._alive: Optional[np.ndarray] = None  # False for rows of removed entities
+        self._pagerank: Optional[np.ndarray] = None
+        self._lock = kg.state_lock  # Same lock as mutations: builds never see a half-applied change
+
+    @property
+    def is_built(self) -> bool:
+        return self.out_degree is not None
+
+    def invalidate(self):
+        """Drop all arrays; they are rebuilt on the next lookup."""
+        with self._lock:
+            self.version = None
+            self.out_degree = self.in_degree = self.typed_out = self.typed_in = None
+            self._edge_src = self._edge_dst = self._alive = self._pagerank = None
+
+    def build(self):
+        """Build degree arrays from the current graph."""
+        kg = self.kg
+        if kg.csr is not None:
+            csr = kg.csr
+            node_ids = csr.node_ids
+            rel_types = list(csr.rel_type_names)
+            n = len(node_ids)
+            # One entry per (edge, type); entries of an edge are consecutive
+            entry_src = np.repeat(np.arange(n), np.diff(csr.out_indptr))
+            entry_dst = csr.out_indices.astype(np.int64)
+            entry_types = csr.out_types.astype(np.int64)
+            first = np.ones(len(csr.out_eids), dtype=bool)
+            first[1:] = csr.out_eids[1:] != csr.out_eids[:-1]
+            edge_src, edge_dst = entry_src[first], entry_dst[first]
+            # Own dict: lookups in the mapped store's index decode strings each time
+            node_index = self._index_nodes(node_ids)
+        else:
+            graph = kg.graph
+            node_ids = list(graph.nodes())
+            n = len(node_ids)
+            node_index = self._index_nodes(node_ids)
+            type_codes: Dict[str, int] = {}
+            sources, targets, entries = [], [], []
+            for src, tgt, data in graph.edges(data=True):
+                edge_types = data.get('types', [data.get('type', 'RELATED')])
+                if not isinstance(edge_types, list):
+                    edge_types = [edge_types]
+                sources.append(node_index[src])
+                targets.append(node_index[tgt])
+                for rel_type in edge_types:
+                    entries.append((node_index[src], node_index[tgt], type_codes.setdefault(rel_type, len(type_codes))))
+            rel_types = list(type_codes)
+            edge_src = np.asarray(sources, dtype=np.int64)
+            edge_dst = np.asarray(targets, dtype=np.int64)
+            entry_array = np.asarray(entries, dtype=np.int64).reshape(-1, 3)
+            entry_src, entry_dst, entry_types = entry_array[:, 0], entry_array[:, 1], entry_array[:, 2]
+
+        self.node_index = node_index
+        self.rel_types = rel_types
+        self.out_degree = np.bincount(edge_src, minlength=n).astype(np.int32)
+        self.in_degree = np.bincount(edge_dst, minlength=n).astype(np.int32)
+        shape = (n, max(len(rel_types), 1))
+        self.typed_out = np.zeros(shape, dtype=np.int32)
+        self.typed_in = np.zeros(shape, dtype=np.int32)
+        np.add.at(self.typed_out, (entry_src, entry_types), 1)
+        np.add.at(self.typed_in, (entry_dst, entry_types), 1)
+        self._edge_src, self._edge_dst = edge_src, edge_dst
+        self._alive = np.ones(n, dtype=bool)
+        self._pagerank = None
+        self.version = kg.graph_version
+
+    def apply(self, change: GraphChange):
+        """Patch built arrays for one applied mutation (no-op before the first build)."""
+        with self._lock:
+            if not self.is_built:
+                return
+            if change.change_type == ChangeType.ENTITY_ADDED:
+                self._add_row(change.entity_id)
+            elif change.change_type == ChangeType.ENTITY_REMOVED:
+                # Incident edges were removed by earlier events: the row only goes out of use
+                row = self.node_index.pop(change.entity_id, None)
+                if row is not None:
+                    self._alive[row] = False
+            elif not change.is_entity_change:
+                self._apply_edge(change)
+            else:
+                return  # Attribute updates do not touch degrees
+            self._pagerank = None
+            self.version = self.kg.graph_version
+
+    def _add_row(self, entity_id: str):
+        self.node_index[entity_id] = len(self.out_degree)
+        self.out_degree = np.append(self.out_degree, np.int32(0))
+        self.in_degree = np.append(self.in_degree, np.int32(0))
+        self.typed_out = np.vstack([self.typed_out, np.zeros((1, self.typed_out.shape[1]), dtype=np.int32)])
+        self.typed_in = np.vstack([self.typed_in, np.zeros((1, self.typed_in.shape[1]), dtype=np.int32)])
+        self._alive = np.append(self._alive, True)
+
+    def _apply_edge(self, change: GraphChange):
+        src, dst = self.node_index[change.source], self.node_index[change.target]
+        added = change.change_type == ChangeType.RELATIONSHIP_ADDED
+        if change.rel_type not in self.rel_types:
+            self.rel_types.append(change.rel_type)
+        if len(self.rel_types) > self.typed_out.shape[1]:
+            column = np.zeros((len(self.out_degree), 1), dtype=np.int32)
+            self.typed_out = np.hstack([self.typed_out, column])
+            self.typed_in = np.hstack([self.typed_in, column])
+        type_code = self.rel_types.index(change.rel_type)
+        step = 1 if added else -1
+        self.typed_out[src, type_code] += step
+        self.typed_in[dst, type_code] += step
+        # Degrees / edge arrays count distinct (source, target) pairs: only the
+        # first type added to a pair or the last one removed changes them
+        has_edge = self.kg.graph.has_edge(change.source, change.target)
+        at = np.flatnonzero((self._edge_src == src) & (self._edge_dst == dst))
+        if added and has_edge and not len(at):
+            self._edge_src = np.append(self._edge_src, src)
+            self._edge_dst = np.append(self._edge_dst, dst)
+        elif not added and not has_edge and len(at):
+            self._edge_src = np.delete(self._edge_src, at)
+            self._edge_dst = np.delete(self._edge_dst, at)
+        else:
+            return
+        self.out_degree[src] += step
+        self.in_degree[dst] += step
+
+    @staticmethod
+    def _index_nodes(node_ids) -> Dict[str, int]:
+        return {node_id: i for i, node_id in enumerate(node_ids)}
+
+    def _ensure_built(self):
+        with self._lock:
+            if not self.is_built:
+                self.build()
+
+    def indices(self, entity_ids: Sequence[str]) -> np.ndarray:
+        """Node indices of entities as stored in graph (-1 if missing)."""
+        with self._lock:
+            self._ensure_built()
+            index = self.node_index
+        return np.fromiter((index.get(entity_id, -1) for entity_id in entity_ids), dtype=np.int64, count=len(entity_ids))
+
+    def _gather(self, values: np.ndarray, entity_ids: Sequence[str]) -> np.ndarray:
+        rows = self.indices(entity_ids)
+        found = rows >= 0
+        result = np.zeros(len(rows), dtype=values.dtype)
+        result[found] = values[rows[found]]
+        return result
+
+    def degrees(self, entity_ids: Sequence[str], direction: str = 'out') -> np.ndarray:
+        """
+        Distinct neighbor counts (same as get_degree for 'out' / 'in'; 0 if missing).
+
+        Args:
+            entity_ids: Entity IDs as stored in graph
+            direction: 'out' or 'in'
+        """
+        with self._lock:
+            self._ensure_built()
+            return self._gather(self.in_degree if direction == 'in' else self.out_degree, entity_ids)
+
+    def typed_degrees(self, entity_ids: Sequence[str], rel_type: str, direction: str = 'out') -> np.ndarray:
+        """Counts of edges carrying rel_type per entity (0 if missing)."""
+        with self._lock:
+            self._ensure_built()
+            if rel_type not in self.rel_types:
+                return np.zeros(len(entity_ids), dtype=np.int32)
+            column = (self.typed_in if direction == 'in' else self.typed_out)[:, self.rel_types.index(rel_type)]
+            return self._gather(column, entity_ids)
+
+    @property
+    def pagerank(self) -> np.ndarray:
+        """Global PageRank per node (sums to 1), computed on first access."""
+        with self._lock:
+            self._ensure_built()
+            if self._pagerank is None:
+                self._pagerank = self._compute_pagerank()
+            return self._pagerank
+
+    def pageranks(self, entity_ids: Sequence[str]) -> np.ndarray:
+        """PageRank of entities (0.0 if missing)."""
+        with self._lock:
+            return self._gather(self.pagerank, entity_ids)
+
+    def pagerank_ratios(self, entity_ids: Sequence[str]) -> np.ndarray:
+        """PageRank of entities relative to the average node (1.0 = uniform share, 0.0 if missing)."""
+        with self._lock:
+            return self.pageranks(entity_ids) * len(self.node_index)
+
+    def _compute_pagerank(self) -> np.ndarray:
+        rows = len(self.out_degree)
+        # Rows of removed entities (no edges left) take no part: same ranks as a fresh build
+        alive = self._alive
+        n = int(alive.sum())
+        if n == 0:
+            return np.zeros(rows)
+        src, dst = self._edge_src, self._edge_dst
+        out_degree = self.out_degree.astype(np.float64)
+        dangling = alive & (out_degree == 0)
+        # Share of a node's rank sent along each of its edges
+        edge_weight = 1.0 / out_degree[src]
+        rank = np.where(alive, 1.0 / n, 0.0)
+        for _ in range(PAGERANK_MAX_ITER):
+            previous = rank
+            spread = np.bincount(dst, weights=rank[src] * edge_weight, minlength=rows)
+            # Dangling nodes (no out-edges) spread their rank uniformly
+            rank = np.where(alive, PAGERANK_ALPHA * (spread + previous[dangling].sum() / n) + (1.0 - PAGERANK_ALPHA) / n, 0.0)
+            if np.abs(rank - previous).sum() < n * PAGERANK_TOL:
+                break
+        return rank
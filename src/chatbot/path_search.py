@@ -0,0 +1,205 @@
+"""
+Path Search
+
+Graph-agnostic path algorithms used by both KpopKnowledgeGraph engines.
+Algorithms only see neighbor functions (node -> neighbors in adjacency
+order), so the NetworkX engine passes dict views and the CSR engine passes
+integer index lists; relationship-type filters and undirected traversal
+are applied by the neighbor functions themselves.
+"""
+
+import time
+from collections import defaultdict
+from typing import Callable, Dict, Hashable, Iterable, Iterator, List, Optional, Tuple
+
+Node = Hashable
+NeighborFn = Callable[[Node], Iterable[Node]]
+
+
+def bidirectional_shortest_path(
+    source: Node,
+    target: Node,
+    successors: NeighborFn,
+    predecessors: NeighborFn,
+    max_hops: Optional[int] = None,
+    allowed: Optional[Callable[[Node], bool]] = None
+) -> Optional[List[Node]]:
+    """
+    Shortest path by bidirectional BFS, bounded by max_hops.
+
+    Expands the smaller fringe one level at a time, exactly like
+    nx.shortest_path on an unweighted graph (same tie-breaking). Each level
+    adds one hop to the shortest possible path, so the search stops after
+    max_hops levels instead of exploring the whole graph.
+
+    Args:
+        source: Start node
+        target: End node
+        successors: Out-neighbors of a node
+        predecessors: In-neighbors of a node
+        max_hops: Maximum path length in edges (None = unbounded)
+        allowed: Predicate for intermediate nodes (endpoints always allowed)
+
+    Returns:
+        Node list from source to target, or None if no path within max_hops
+    """
+    if source == target:
+        return [source]
+
+    pred: Dict[Node, Optional[Node]] = {source: None}
+    succ: Dict[Node, Optional[Node]] = {target: None}
+    forward_fringe = [source]
+    reverse_fringe = [target]
+    hops = 0
+    meet = None
+    while forward_fringe and reverse_fringe and meet is None:
+        if max_hops is not None and hops >= max_hops:
+            return None
+        hops += 1
+        if len(forward_fringe) <= len(reverse_fringe):
+            this_level = forward_fringe
+            forward_fringe = []
+            for v in this_level:
+                for w in successors(v):
+                    if w not in pred and (w in succ or allowed is None or allowed(w)):
+                        forward_fringe.append(w)
+                        pred[w] = v
+                    if w in succ:
+                        meet = w
+                        break
+                if meet is not None:
+                    break
+        else:
+            this_level = reverse_fringe
+            reverse_fringe = []
+            for v in this_level:
+                for w in predecessors(v):
+                    if w not in succ and (w in pred or allowed is None or allowed(w)):
+                        succ[w] = v
+                        reverse_fringe.append(w)
+                    if w in pred:
+                        meet = w
+                        break
+                if meet is not None:
+                    break
+
+    if meet is None:
+        return None
+
+    path = []
+    w = meet
+    while w is not None:
+        path.append(w)
+        w = pred[w]
+    path.reverse()
+    w = succ[meet]
+    while w is not None:
+        path.append(w)
+        w = succ[w]
+    return path
+
+
+class _BudgetExceeded(Exception):
+    """Raised inside walk generators when the time budget runs out."""
+
+
+def _walks(
+    start: Node,
+    depth: int,
+    neighbors: NeighborFn,
+    avoid: Node,
+    deadline: Optional[float]
+) -> Iterator[List[Node]]:
+    """Simple walks with exactly depth edges from start that never visit avoid (DFS order)."""
+    if depth == 0:
+        yield [start]
+        return
+    path = [start]
+    on_path = {start, avoid}
+    stack = [iter(neighbors(start))]
+    steps = 0
+    while stack:
+        steps += 1
+        if deadline is not None and steps % 256 == 0 and time.monotonic() > deadline:
+            raise _BudgetExceeded
+        next_node = next((w for w in stack[-1] if w not in on_path), None)
+        if next_node is None:
+            stack.pop()
+            on_path.discard(path.pop())
+            continue
+        if len(path) == depth:
+            yield path + [next_node]
+        else:
+            path.append(next_node)
+            on_path.add(next_node)
+            stack.append(iter(neighbors(next_node)))
+
+
+def iter_simple_paths(
+    source: Node,
+    target: Node,
+    successors: NeighborFn,
+    predecessors: NeighborFn,
+    max_hops: int,
+    limit: Optional[int] = None,
+    time_budget: Optional[float] = None
+) -> Iterator[List[Node]]:
+    """
+    Lazily yield simple paths from source to target in increasing length.
+
+    Paths of each length L are built meet-in-the-middle: forward walks of
+    ceil(L/2) edges from source are joined with backward walks of floor(L/2)
+    edges into target (grouped by their middle node), so the work grows
+    with the branching factor to the power L/2 instead of L. A bounded
+    bidirectional BFS first finds the shortest length, so pairs without a
+    path within max_hops return immediately.
+
+    Args:
+        source: Start node
+        target: End node
+        successors: Out-neighbors of a node
+        predecessors: In-neighbors of a node
+        max_hops: Maximum path length in edges
+        limit: Stop after this many paths (None = all)
+        time_budget: Stop after this many seconds (None = no budget)
+
+    Yields:
+        Node lists from source to target; within a length, in forward
+        depth-first order
+    """
+    if max_hops < 0 or (limit is not None and limit <= 0):
+        return
+    if source == target:
+        yield [source]
+        return
+
+    shortest = bidirectional_shortest_path(source, target, successors, predecessors, max_hops=max_hops)
+    if shortest is None:
+        return
+
+    deadline = time.monotonic() + time_budget if time_budget is not None else None
+    found = 0
+    # depth -> middle node -> [(walk from middle to target, nodes after middle)]
+    backward_halves: Dict[int, Dict[Node, List[Tuple[List[Node], frozenset]]]] = {}
+    try:
+        for length in range(len(shortest) - 1, max_hops + 1):
+            forward_depth = (length + 1) // 2
+            backward_depth = length - forward_depth
+            if backward_depth not in backward_halves:
+                halves = defaultdict(list)
+                for walk in _walks(target, backward_depth, predecessors, source, deadline):
+                    walk.reverse()
+                    halves[walk[0]].append((walk, frozenset(walk[1:])))
+                backward_halves[backward_depth] = halves
+            halves = backward_halves[backward_depth]
+
+            avoid = target if backward_depth > 0 else None
+            for forward in _walks(source, forward_depth, successors, avoid, deadline):
+                for backward, rest in halves.get(forward[-1], ()):
+                    if rest.isdisjoint(forward):
+                        yield forward + backward[1:]
+                        found += 1
+                        if limit is not None and found >= limit:
+                            return
+    except _BudgetExceeded:
+        return
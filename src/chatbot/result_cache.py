@@ -0,0 +1,215 @@
+"""
+Retrieval Result Cache
+
+Bounded LRU + TTL cache for GraphRAG.retrieve_context results, with an
+optional on-disk tier shared across restarts and processes.
+
+Values are stored pickled, and every hit unpickles a fresh copy, so callers
+can modify a returned context without corrupting the cache. Keys contain the
+graph version: entries from before a graph mutation are never returned and
+age out of the LRU / TTL instead of being scanned for.
+
+On-disk tier: one file per key, <directory>/<sha256 of key>.pkl, holding
+(key, created timestamp, pickled value). A file's mtime is its last use (set on
+write and on every disk hit). At startup and every PRUNE_INTERVAL puts, files
+unused for longer than the TTL are removed, then the least recently used ones
+until the tier fits max_disk_bytes. Entries of old graph versions are never
+read again, so this is what removes them.
+"""
+
+import hashlib
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+# Puts between two sweeps of the on-disk tier
+PRUNE_INTERVAL = 64
+
+
+class ResultCache:
+    """Thread-safe LRU + TTL cache of picklable values with an optional disk tier."""
+
+    def __init__(
+        self,
+        max_size: int = 512,
+        ttl: Optional[float] = 3600.0,
+        directory: Optional[str] = None,
+        max_disk_bytes: Optional[int] = 256 * 1024 * 1024
+    ):
+        """
+        Args:
+            max_size: Entries kept in memory (0 disables the memory tier)
+            ttl: Seconds an entry stays valid (None: until evicted)
+            directory: On-disk tier directory (None: memory only)
+            max_disk_bytes: Size cap of the on-disk tier (None: no cap, only TTL sweeps)
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.directory = directory
+        self.max_disk_bytes = max_disk_bytes
+        self._puts_since_prune = 0
+        self._entries: "OrderedDict[Hashable, Tuple[float, bytes]]" = OrderedDict()  # key -> (created, pickled value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            self.prune_disk()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _expired(self, created: float) -> bool:
+        return self.ttl is not None and time.time() - created > self.ttl
+
+    def _disk_path(self, key: Hashable) -> str:
+        return os.path.join(self.directory, hashlib.sha256(repr(key).encode('utf-8')).hexdigest() + '.pkl')
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Fresh copy of the cached value, or None on a miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if not self._expired(entry[0]):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return pickle.loads(entry[1])
+                del self._entries[key]
+
+        entry = self._read_disk(key) if self.directory else None
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._remember(key, entry)
+        return pickle.loads(entry[1])
+
+    def put(self, key: Hashable, value: Any):
+        """Store a copy of value (later changes to value are not seen by the cache)."""
+        entry = (time.time(), pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+        with self._lock:
+            self._remember(key, entry)
+        if self.directory:
+            self._write_disk(key, entry)
+            with self._lock:
+                self._puts_since_prune += 1
+                prune = self._puts_since_prune >= PRUNE_INTERVAL
+                if prune:
+                    self._puts_since_prune = 0
+            if prune:
+                self.prune_disk()
+
+    def _remember(self, key: Hashable, entry: Tuple[float, bytes]):
+        if self.max_size <= 0:
+            return
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _read_disk(self, key: Hashable) -> Optional[Tuple[float, bytes]]:
+        path = self._disk_path(key)
+        try:
+            with open(path, 'rb') as f:
+                stored_key, created, blob = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError, ValueError):
+            return None
+        if stored_key != key:
+            return None
+        if self._expired(created):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        try:
+            os.utime(path)  # Last use, for the LRU sweep
+        except OSError:
+            pass
+        return created, blob
+
+    def _write_disk(self, key: Hashable, entry: Tuple[float, bytes]):
+        path = self._disk_path(key)
+        tmp_path = f"{path}.tmp{os.getpid()}.{threading.get_ident()}"
+        try:
+            with open(tmp_path, 'wb') as f:
+                pickle.dump((key, entry[0], entry[1]), f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"⚠️ Could not write result cache entry: {e}")
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def prune_disk(self) -> int:
+        """
+        Remove on-disk entries unused for longer than the TTL, then the least
+        recently used ones while the tier is larger than max_disk_bytes.
+        
+        Returns:
+            Number of files removed
+        """
+        if not self.directory:
+            return 0
+        files = []  # (last use, size, path)
+        try:
+            with os.scandir(self.directory) as entries:
+                for entry in entries:
+                    if entry.name.endswith('.pkl'):
+                        try:
+                            stat = entry.stat()
+                        except OSError:
+                            continue  # Removed by another process
+                        files.append((stat.st_mtime, stat.st_size, entry.path))
+        except OSError as e:
+            print(f"⚠️ Could not scan result cache directory: {e}")
+            return 0
+        
+        # Last use is after creation: unused for a TTL means expired
+        oldest_valid = time.time() - self.ttl if self.ttl is not None else None
+        files.sort()
+        total = sum(size for _, size, _ in files)
+        removed = 0
+        for last_use, size, path in files:
+            expired = oldest_valid is not None and last_use < oldest_valid
+            over_cap = self.max_disk_bytes is not None and total > self.max_disk_bytes
+            if not (expired or over_cap):
+                break
+            try:
+                os.remove(path)
+                removed += 1
+            except OSError:
+                pass
+            total -= size
+        return removed
+    
+    def clear(self, disk: bool = False):
+        """Drop memory entries (and disk entries if disk) and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.disk_hits = self.misses = self.evictions = 0
+        if disk and self.directory:
+            for name in os.listdir(self.directory):
+                if name.endswith('.pkl'):
+                    os.remove(os.path.join(self.directory, name))
+
+    def info(self) -> Dict[str, Any]:
+        """Hit / miss counters, hit rate and current size."""
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+                'size': len(self._entries),
+                'max_size': self.max_size
+            }
@@ -0,0 +1,158 @@
+"""
+Entity Search Index
+
+Sub-linear name lookup for KpopKnowledgeGraph.search_entities. Each entity
+is indexed by the lowercase form of its ID and title:
+
+- exact map: key -> entities whose ID or title equals the key
+- n-gram index: character 1/2/3-gram -> entities containing it; a substring
+  query intersects the posting lists of its grams, and only those candidates
+  are verified with a real substring test
+- sorted key table: bisect over sorted keys for prefix lookups
+
+Entities keep their graph insertion order, so results come back in the same
+order a full scan over graph.nodes() would produce.
+"""
+
+import bisect
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+# Longest indexed gram; longer queries intersect all of their trigrams
+GRAM_SIZE = 3
+
+
+def _grams(text: str, size: int) -> Set[str]:
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+def _indexed_grams(text: str) -> Set[str]:
+    grams = set()
+    for size in range(1, GRAM_SIZE + 1):
+        grams |= _grams(text, size)
+    return grams
+
+
+class EntitySearchIndex:
+    """Exact / substring / prefix index over entity IDs and titles."""
+
+    def __init__(self, entities: Iterable[Tuple[str, Optional[str], str]] = ()):
+        """
+        Args:
+            entities: (entity_id, label, title) tuples in graph order
+        """
+        self._order: Dict[str, int] = {}  # entity -> insertion position
+        self._entries: Dict[str, Tuple[Optional[str], str, str, str]] = {}  # entity -> (label, title, id_lower, title_lower)
+        self._exact: Dict[str, Set[str]] = defaultdict(set)
+        self._grams: Dict[str, Set[str]] = defaultdict(set)
+        self._sorted_keys: List[str] = []
+        self._key_entities: Dict[str, Set[str]] = defaultdict(set)
+        self._next_position = 0
+
+        for entity_id, label, title in entities:
+            self._index(entity_id, label, title)
+        self._sorted_keys = sorted(self._key_entities)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, entity_id: str) -> bool:
+        return entity_id in self._entries
+
+    def _index(self, entity_id: str, label: Optional[str], title: str):
+        id_lower = entity_id.lower()
+        title_lower = title.lower()
+        self._order[entity_id] = self._next_position
+        self._next_position += 1
+        self._entries[entity_id] = (label, title, id_lower, title_lower)
+        for key in (id_lower, title_lower):
+            self._exact[key].add(entity_id)
+            self._key_entities[key].add(entity_id)
+        for gram in _indexed_grams(id_lower) | _indexed_grams(title_lower):
+            self._grams[gram].add(entity_id)
+
+    def add(self, entity_id: str, label: Optional[str], title: str):
+        """Index a new entity (or re-index an existing one) at the end of the order."""
+        if entity_id in self._entries:
+            self.remove(entity_id)
+        self._index(entity_id, label, title)
+        for key in {entity_id.lower(), title.lower()}:
+            pos = bisect.bisect_left(self._sorted_keys, key)
+            if pos == len(self._sorted_keys) or self._sorted_keys[pos] != key:
+                self._sorted_keys.insert(pos, key)
+
+    def remove(self, entity_id: str):
+        """Drop an entity from every index (no-op if it is not indexed)."""
+        entry = self._entries.pop(entity_id, None)
+        if entry is None:
+            return
+        del self._order[entity_id]
+        _, _, id_lower, title_lower = entry
+        for key in (id_lower, title_lower):
+            self._discard(self._exact, key, entity_id)
+            self._discard(self._key_entities, key, entity_id)
+            if key not in self._key_entities:
+                pos = bisect.bisect_left(self._sorted_keys, key)
+                if pos < len(self._sorted_keys) and self._sorted_keys[pos] == key:
+                    del self._sorted_keys[pos]
+        for gram in _indexed_grams(id_lower) | _indexed_grams(title_lower):
+            self._discard(self._grams, gram, entity_id)
+
+    @staticmethod
+    def _discard(index: Dict[str, Set[str]], key: str, entity_id: str):
+        entities = index.get(key)
+        if entities is not None:
+            entities.discard(entity_id)
+            if not entities:
+                del index[key]
+
+    def exact(self, text: str) -> Set[str]:
+        """Entities whose lowercase ID or title equals text (lowercased)."""
+        return set(self._exact.get(text.lower(), ()))
+
+    def containing(self, text: str) -> Set[str]:
+        """Entities whose lowercase ID or title contains text (lowercased)."""
+        text = text.lower()
+        if not text:
+            return set(self._entries)
+        grams = _grams(text, min(len(text), GRAM_SIZE))
+        postings = []
+        for gram in grams:
+            entities = self._grams.get(gram)
+            if not entities:
+                return set()
+            postings.append(entities)
+        postings.sort(key=len)
+        candidates = set(postings[0])
+        for entities in postings[1:]:
+            candidates &= entities
+            if not candidates:
+                return candidates
+        if len(text) <= GRAM_SIZE:
+            return candidates
+        # Grams only prove co-occurrence; confirm the contiguous substring
+        return {
+            entity_id for entity_id in candidates
+            if text in self._entries[entity_id][2] or text in self._entries[entity_id][3]
+        }
+
+    def with_prefix(self, prefix: str, limit: Optional[int] = None) -> List[str]:
+        """Entities whose lowercase ID or title starts with prefix, in graph order."""
+        prefix = prefix.lower()
+        matches = set()
+        pos = bisect.bisect_left(self._sorted_keys, prefix)
+        while pos < len(self._sorted_keys) and self._sorted_keys[pos].startswith(prefix):
+            matches |= self._key_entities[self._sorted_keys[pos]]
+            pos += 1
+        ordered = self.ordered(matches)
+        return ordered[:limit] if limit is not None else ordered
+
+    def ordered(self, entity_ids: Iterable[str]) -> List[str]:
+        """Sort entity IDs by graph insertion order."""
+        return sorted(entity_ids, key=self._order.__getitem__)
+
+    def label(self, entity_id: str) -> Optional[str]:
+        return self._entries[entity_id][0]
+
+    def title(self, entity_id: str) -> str:
+        return self._entries[entity_id][1]
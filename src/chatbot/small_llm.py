@@ -292,6 +292,10 @@ QUAN TRỌNG - TẤT CẢ THÔNG TIN ĐỀU TỪ ĐỒ THỊ TRI THỨC:
         else:
             return f"{param_count} parameters"
             
+    def count_tokens(self, text: str) -> int:
+        """Number of tokens of text with this model's tokenizer (no special tokens)."""
+        return len(self.tokenizer.encode(text, add_special_tokens=False))
+        
     def format_prompt(
         self,
         query: str,
@@ -0,0 +1,310 @@
+"""
+Vector Index for GraphRAG Semantic Search
+
+Nearest-neighbour indexes over unit-normalized entity embeddings (inner
+product = cosine similarity):
+
+- 'flat': exact search (faiss IndexFlatIP)
+- 'hnsw': faiss IndexHNSWFlat graph index, sub-linear search time
+- 'ivfpq': faiss IndexIVFPQ, clustered + product-quantized (least memory)
+
+Without faiss every type falls back to an exact numpy index that keeps the
+normalized matrix, so vectors are normalized once instead of on every query.
+
+Indexes are saved next to the embedding cache (data/entity_embeddings.<type>.*)
+together with a key of the embedded content, and memory-mapped on load while
+the key still matches, so a restart does not rebuild them.
+
+Recall@k vs latency of every type against exact search:
+
+    python -m src.chatbot.vector_index --scale 50000
+"""
+
+import argparse
+import json
+import os
+import time
+from typing import Dict, Sequence, Tuple
+
+import numpy as np
+
+try:
+    import faiss
+    FAISS_AVAILABLE = True
+except ImportError:
+    FAISS_AVAILABLE = False
+    print("⚠️ faiss not installed. Using numpy-based similarity search.")
+
+INDEX_TYPES = ('flat', 'hnsw', 'ivfpq')
+
+# Bump when the saved index layout changes
+INDEX_VERSION = 1
+
+# HNSW: neighbours per node, build / search beam width
+HNSW_M = 32
+HNSW_EF_CONSTRUCTION = 200
+HNSW_EF_SEARCH = 128
+
+# IVF-PQ: vectors per trained centroid needed by k-means, probed lists, code size
+IVF_MIN_POINTS_PER_LIST = 39
+IVF_NPROBE = 16
+PQ_BITS = 8
+PQ_MIN_VECTORS = 1000  # Below this IVF-PQ cannot be trained well: use exact search
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """Unit-normalized float32 copy of a (n, dim) matrix."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.clip(norms, 1e-12, None)
+
+
+class NumpyIndex:
+    """Exact inner-product search over a pre-normalized matrix."""
+
+    kind = 'numpy'
+
+    def __init__(self, vectors: np.ndarray, index_type: str = 'flat'):
+        self.vectors = vectors
+        self.index_type = index_type
+
+    def __len__(self) -> int:
+        return len(self.vectors)
+
+    def search(self, queries: np.ndarray, top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """(scores, indices), each (len(queries), top_k); missing results have index -1."""
+        scores = np.asarray(queries, dtype=np.float32) @ self.vectors.T
+        k = min(top_k, len(self.vectors))
+        result_scores = np.full((len(scores), top_k), -np.inf, dtype=np.float32)
+        result_indices = np.full((len(scores), top_k), -1, dtype=np.int64)
+        if k == 0:
+            return result_scores, result_indices
+        # Partial selection of the top k, then sort only those
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1, kind='stable')
+        result_indices[:, :k] = np.take_along_axis(top, order, axis=1)
+        result_scores[:, :k] = np.take_along_axis(top_scores, order, axis=1)
+        return result_scores, result_indices
+
+    def save(self, path: str):
+        with open(path, 'wb') as f:
+            np.save(f, np.ascontiguousarray(self.vectors))
+
+    @classmethod
+    def load(cls, path: str, index_type: str) -> 'NumpyIndex':
+        return cls(np.load(path, mmap_mode='r'), index_type)
+
+
+class FaissIndex:
+    """faiss index of any INDEX_TYPES (inner-product metric)."""
+
+    kind = 'faiss'
+
+    def __init__(self, index, index_type: str):
+        self.index = index
+        self.index_type = index_type
+        self._set_search_params()
+
+    def __len__(self) -> int:
+        return self.index.ntotal
+
+    def _set_search_params(self):
+        if self.index_type == 'hnsw':
+            self.index.hnsw.efSearch = HNSW_EF_SEARCH
+        elif self.index_type == 'ivfpq':
+            self.index.nprobe = min(IVF_NPROBE, self.index.nlist)
+
+    @classmethod
+    def build(cls, vectors: np.ndarray, index_type: str) -> 'FaissIndex':
+        dim = vectors.shape[1]
+        if index_type == 'hnsw':
+            index = faiss.IndexHNSWFlat(dim, HNSW_M, faiss.METRIC_INNER_PRODUCT)
+            index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+        elif index_type == 'ivfpq':
+            nlist = max(1, min(int(np.sqrt(len(vectors))), len(vectors) // IVF_MIN_POINTS_PER_LIST))
+            # Largest sub-quantizer count <= dim / 4 that divides dim
+            pq_m = max(m for m in range(1, dim // 4 + 1) if dim % m == 0)
+            quantizer = faiss.IndexFlatIP(dim)
+            index = faiss.IndexIVFPQ(quantizer, dim, nlist, pq_m, PQ_BITS, faiss.METRIC_INNER_PRODUCT)
+            index.train(vectors)
+        else:
+            index = faiss.IndexFlatIP(dim)
+        index.add(vectors)
+        return cls(index, index_type)
+
+    def search(self, queries: np.ndarray, top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """(scores, indices), each (len(queries), top_k); missing results have index -1."""
+        return self.index.search(np.ascontiguousarray(queries, dtype=np.float32), top_k)
+
+    def save(self, path: str):
+        faiss.write_index(self.index, path)
+
+    @classmethod
+    def load(cls, path: str, index_type: str) -> 'FaissIndex':
+        try:
+            index = faiss.read_index(path, faiss.IO_FLAG_MMAP)
+        except RuntimeError:
+            # Not every index type can be memory-mapped
+            index = faiss.read_index(path)
+        return cls(index, index_type)
+
+
+def build_vector_index(vectors: np.ndarray, index_type: str = 'flat'):
+    """
+    Build an index over unit-normalized vectors.
+
+    Args:
+        vectors: (n, dim) normalized float32 matrix
+        index_type: One of INDEX_TYPES
+
+    Returns:
+        FaissIndex, or NumpyIndex (exact) without faiss / with too few vectors for IVF-PQ
+    """
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown vector index type: {index_type} (expected one of {INDEX_TYPES})")
+    if not FAISS_AVAILABLE:
+        if index_type != 'flat':
+            print(f"⚠️ faiss not installed: {index_type} index falls back to exact numpy search")
+        return NumpyIndex(vectors, 'flat')
+    if index_type == 'ivfpq' and len(vectors) < PQ_MIN_VECTORS:
+        print(f"⚠️ {len(vectors)} vectors are too few to train IVF-PQ, using exact search")
+        return FaissIndex.build(vectors, 'flat')
+    return FaissIndex.build(vectors, index_type)
+
+
+def vector_index_base(cache_path: str, index_type: str) -> str:
+    """Saved index path prefix next to an embedding cache (x.npz -> x.<type>)."""
+    return f"{os.path.splitext(cache_path)[0]}.{index_type}"
+
+
+def _index_file(base: str, kind: str) -> str:
+    return f"{base}.{'faiss' if kind == 'faiss' else 'npy'}"
+
+
+def save_vector_index(index, base: str, key: str):
+    """
+    Save an index and its content key (temp files + rename).
+
+    Args:
+        index: FaissIndex or NumpyIndex
+        base: Path prefix (see vector_index_base)
+        key: Content key of the indexed vectors
+    """
+    meta = {'version': INDEX_VERSION, 'key': key, 'index_type': index.index_type, 'kind': index.kind, 'size': len(index)}
+
+    def write_meta(path: str):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+
+    # Index first: the meta file (with the key) only points at a complete index
+    for path, write in ((_index_file(base, index.kind), index.save), (f"{base}.json", write_meta)):
+        tmp_path = f"{path}.tmp{os.getpid()}"
+        try:
+            write(tmp_path)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+
+def load_vector_index(base: str, key: str, index_type: str):
+    """
+    Load a saved index (memory-mapped) if it was built from the same content.
+
+    Returns:
+        FaissIndex / NumpyIndex, or None if missing, stale or unreadable here
+    """
+    meta_path = f"{base}.json"
+    if not os.path.exists(meta_path):
+        return None
+    try:
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta.get('version') != INDEX_VERSION or meta.get('key') != key:
+            return None
+        kind = meta.get('kind')
+        if kind == 'faiss':
+            if not FAISS_AVAILABLE:
+                return None
+            index = FaissIndex.load(_index_file(base, kind), meta.get('index_type', index_type))
+        else:
+            index = NumpyIndex.load(_index_file(base, kind), meta.get('index_type', index_type))
+        return index if len(index) == meta.get('size') else None
+    except (OSError, ValueError, RuntimeError):
+        return None
+
+
+def benchmark_recall(
+    vectors: np.ndarray,
+    queries: np.ndarray,
+    index_types: Sequence[str] = INDEX_TYPES,
+    k: int = 10
+) -> Dict[str, Dict[str, float]]:
+    """
+    Recall@k and latency of each index type against exact numpy search.
+
+    Args:
+        vectors: (n, dim) normalized vectors to index
+        queries: (q, dim) normalized queries
+        index_types: Types to measure
+        k: Neighbours per query
+
+    Returns:
+        index_type -> {'recall_at_k', 'ms_per_query', 'build_seconds'}
+    """
+    _, exact = NumpyIndex(vectors).search(queries, k)
+    results = {}
+    for index_type in index_types:
+        start = time.perf_counter()
+        index = build_vector_index(vectors, index_type)
+        build_seconds = time.perf_counter() - start
+
+        index.search(queries[:1], k)  # Warm-up
+        start = time.perf_counter()
+        for query in queries:
+            _, found = index.search(query.reshape(1, -1), k)
+        ms_per_query = (time.perf_counter() - start) * 1000 / len(queries)
+
+        _, found = index.search(queries, k)
+        hits = sum(len(set(row_found[row_found >= 0]) & set(row_exact)) for row_found, row_exact in zip(found, exact))
+        results[index_type] = {
+            'recall_at_k': hits / (len(queries) * k),
+            'ms_per_query': ms_per_query,
+            'build_seconds': build_seconds,
+            'backend': index.kind
+        }
+    return results
+
+
+def main():
+    """Recall@k vs latency benchmark on the entity embedding cache (optionally scaled up)."""
+    parser = argparse.ArgumentParser(description="Vector index recall / latency benchmark")
+    parser.add_argument('--cache', default='data/entity_embeddings.npz', help="Entity embedding cache")
+    parser.add_argument('--scale', type=int, default=0, help="Add synthetic vectors up to this many (0: cache only)")
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--k', type=int, default=10)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    if os.path.exists(args.cache):
+        with np.load(args.cache) as data:
+            vectors = normalize_rows(data['embeddings'])
+    else:
+        print(f"⚠️ {args.cache} not found, using random vectors")
+        vectors = normalize_rows(rng.standard_normal((5000, 384)))
+    if args.scale > len(vectors):
+        # Perturbed copies of real vectors keep the cluster structure
+        extra = vectors[rng.integers(0, len(vectors), args.scale - len(vectors))]
+        extra = extra + rng.normal(scale=0.05, size=extra.shape).astype(np.float32)
+        vectors = np.vstack([vectors, normalize_rows(extra)])
+    queries = normalize_rows(vectors[rng.integers(0, len(vectors), args.queries)] + rng.normal(scale=0.05, size=(args.queries, vectors.shape[1])))
+
+    print(f"📊 {len(vectors)} vectors, {len(queries)} queries, k={args.k}")
+    for index_type, stats in benchmark_recall(vectors, queries, k=args.k).items():
+        print(f"  {index_type:6s} ({stats['backend']}): recall@{args.k} {stats['recall_at_k']:.3f}, "
+              f"{stats['ms_per_query']:.3f} ms/query, build {stats['build_seconds']:.2f}s")
+
+
+if __name__ == "__main__":
+    main()